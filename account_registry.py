@@ -0,0 +1,164 @@
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from requests.adapters import HTTPAdapter
+
+import config
+import flight_recorder
+from request_coalescer import RequestCoalescer
+
+DEFAULT_ACCOUNT = 'default'
+
+
+def parse_accounts(env=os.environ):
+    """Extra accounts from BINANCE_ACCOUNTS ('name1,name2') with keys in
+    BINANCE_API_KEY_<NAME> / BINANCE_SECRET_KEY_<NAME>. Returns {name: (api_key, api_secret)}.
+    """
+    accounts = {}
+    for name in (n.strip() for n in env.get('BINANCE_ACCOUNTS', '').split(',')):
+        if not name or name == DEFAULT_ACCOUNT:
+            continue
+        suffix = name.upper().replace('-', '_')
+        api_key = env.get(f'BINANCE_API_KEY_{suffix}')
+        api_secret = env.get(f'BINANCE_SECRET_KEY_{suffix}')
+        if not api_key or not api_secret:
+            logging.error(f"Account '{name}' is missing BINANCE_API_KEY_{suffix} or BINANCE_SECRET_KEY_{suffix}")
+            continue
+        accounts[name] = (api_key, api_secret)
+    return accounts
+
+
+class RequestBudget:
+    """Token bucket limiting the signed (account) request rate of one account.
+    Also remembers the last used request weight Binance reported for the account's connections.
+    """
+
+    def __init__(self, rate, burst=None):
+        self.rate = rate
+        self.burst = burst or rate
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+        self.used_weight_1m = None
+        self.waited_seconds = 0.0
+
+    def acquire(self):
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            # Reserve the token now; callers over budget wait for their turn outside the lock
+            self._tokens -= 1
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0.0
+            self.waited_seconds += wait
+        if wait:
+            flight_recorder.sleep(wait, reason='rate_limit')
+
+
+def is_signed(request):
+    """Whether a request carries an account signature (orders, balances, account config)"""
+    body = request.body or ''
+    if isinstance(body, bytes):
+        body = body.decode('utf-8', errors='replace')
+    return 'signature=' in (request.url or '') or 'signature=' in body
+
+
+class BudgetedAdapter(HTTPAdapter):
+    """Connection-pooling adapter that spends from a RequestBudget before every signed request.
+    Public market data shares the session but is only bound by Binance's IP weight limit.
+    """
+
+    def __init__(self, budget, pool_size):
+        self.budget = budget
+        super().__init__(pool_connections=pool_size, pool_maxsize=pool_size)
+
+    def send(self, request, **kwargs):
+        if is_signed(request):
+            self.budget.acquire()
+        response = super().send(request, **kwargs)
+        weight = response.headers.get('x-mbx-used-weight-1m')
+        if weight:
+            self.budget.used_weight_1m = int(weight)
+        return response
+
+
+class Account:
+    """One Binance account: its trader (own client, session and clock offset),
+    request budget and coalescer for balance and other account reads.
+    """
+
+    def __init__(self, name, trader, coalescer=None):
+        self.name = name
+        self.trader = trader
+        self.coalescer = coalescer or RequestCoalescer()
+        self.budget = RequestBudget(config.ACCOUNT_MAX_REQUESTS_PER_SECOND)
+        adapter = BudgetedAdapter(self.budget, config.ACCOUNT_POOL_SIZE)
+        trader.client.session.mount('https://', adapter)
+        trader.client.session.mount('http://', adapter)
+
+    def get_balance(self, asset):
+        return self.coalescer.call(('balance', asset), self.trader.get_account_balance,
+                                   asset, ttl=config.COALESCE_TTL_SECONDS['balance'])
+
+    def status(self):
+        return {
+            'account': self.name,
+            'timestamp_offset_ms': self.trader.client.timestamp_offset,
+            'used_weight_1m': self.budget.used_weight_1m,
+            'rate_limit_wait_seconds': round(self.budget.waited_seconds, 3),
+        }
+
+
+class AccountRegistry:
+    """Named Binance accounts. The default account wraps the server's existing trader;
+    the others are connected on first use so startup does not wait on every account.
+    """
+
+    def __init__(self, default_trader=None, default_coalescer=None, credentials=None, trader_factory=None):
+        self._credentials = parse_accounts() if credentials is None else credentials
+        self._trader_factory = trader_factory
+        self._accounts = {}
+        self._lock = threading.Lock()
+        if default_trader:
+            self._accounts[DEFAULT_ACCOUNT] = Account(DEFAULT_ACCOUNT, default_trader, default_coalescer)
+
+    def names(self):
+        names = [DEFAULT_ACCOUNT] if DEFAULT_ACCOUNT in self._accounts else []
+        return names + sorted(self._credentials)
+
+    def get(self, name=''):
+        """The account called `name` ('' for the default account); raises KeyError if unknown"""
+        name = name or DEFAULT_ACCOUNT
+        with self._lock:
+            account = self._accounts.get(name)
+        if account:
+            return account
+        if name not in self._credentials:
+            raise KeyError(f"Unknown account '{name}'. Configured: {', '.join(self.names()) or 'none'}")
+        api_key, api_secret = self._credentials[name]
+        # Connecting pings Binance and syncs the clock, so it runs outside the lock;
+        # if two callers race, the first registered account wins
+        account = Account(name, self._trader_factory(api_key, api_secret))
+        with self._lock:
+            account = self._accounts.setdefault(name, account)
+        logging.info(f"Connected Binance account '{name}'")
+        return account
+
+    def fan_out(self, fn, names=None, max_workers=8):
+        """Run fn(account) for every account concurrently; returns {name: result}.
+        An account that fails to connect or raises gets an 'Error: ...' string instead.
+        """
+        names = names or self.names()
+
+        def run(name):
+            try:
+                return fn(self.get(name))
+            except Exception as e:
+                logging.error(f"Error running fan-out for account '{name}': {e}")
+                return f"Error: {e}"
+
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(names)) or 1) as pool:
+            return dict(zip(names, pool.map(flight_recorder.bind(run), names)))
@@ -0,0 +1,257 @@
+import bisect
+import fcntl
+import logging
+import os
+import threading
+import time
+
+import numpy as np
+
+import config
+
+# One on-disk record per aggregate trade; 'maker' is True when the buyer was the maker (a taker sell)
+TRADE_DTYPE = np.dtype([('id', '<i8'), ('time', '<i8'), ('price', '<f8'), ('qty', '<f8'), ('maker', '?')])
+PAGE_SIZE = 1000
+HOUR_MS = 60 * 60 * 1000
+
+
+def trades_to_records(trades):
+    """Convert an aggTrades API page to structured records"""
+    records = np.empty(len(trades), dtype=TRADE_DTYPE)
+    records['id'] = [t['a'] for t in trades]
+    records['time'] = [t['T'] for t in trades]
+    records['price'] = np.array([t['p'] for t in trades], dtype=np.float64)
+    records['qty'] = np.array([t['q'] for t in trades], dtype=np.float64)
+    records['maker'] = [t['m'] for t in trades]
+    return records
+
+
+def window_slice(trades, start_time=None, end_time=None):
+    """Rows of time-ordered trades with start_time <= time <= end_time.
+    bisect reads the strided time column element by element, so only a few pages
+    of a memory-mapped file are touched (np.searchsorted would copy the column first).
+    """
+    times = trades['time']
+    lo = bisect.bisect_left(times, start_time) if start_time else 0
+    hi = bisect.bisect_right(times, end_time) if end_time else len(trades)
+    return trades[lo:hi]
+
+
+def iter_chunks(trades, chunk_size=None):
+    """Copy trades into memory chunk by chunk, so a scan holds at most chunk_size rows"""
+    chunk_size = chunk_size or config.AGG_TRADES_CHUNK_SIZE
+    for start in range(0, len(trades), chunk_size):
+        yield np.asarray(trades[start:start + chunk_size])
+
+
+def vwap(trades, chunk_size=None):
+    """VWAP, volume and taker buy/sell split over the given trades"""
+    notional = volume = sell_volume = 0.0
+    count = 0
+    for chunk in iter_chunks(trades, chunk_size):
+        qty = chunk['qty']
+        notional += float(np.dot(chunk['price'], qty))
+        volume += float(qty.sum())
+        sell_volume += float(qty[chunk['maker']].sum())
+        count += len(chunk)
+    if not count:
+        return None
+    buy_volume = volume - sell_volume
+    return {
+        'trades': count,
+        'vwap': notional / volume if volume else None,
+        'volume': volume,
+        'quote_volume': notional,
+        'buy_volume': buy_volume,
+        'sell_volume': sell_volume,
+        'imbalance': (buy_volume - sell_volume) / volume if volume else None,
+        'start': int(trades['time'][0]),
+        'end': int(trades['time'][-1]),
+    }
+
+
+def volume_profile(trades, buckets=50, bucket_size=0.0, chunk_size=None):
+    """Traded volume per price bucket, split into taker buys and sells.
+    bucket_size > 0 fixes the bucket width; otherwise the window's range is split into `buckets`.
+    Returns (bucket_low_prices, buy_volume, sell_volume).
+    Raises ValueError above AGG_TRADES_MAX_BUCKETS buckets.
+    """
+    if not len(trades):
+        return None
+    low, high = np.inf, -np.inf
+    for chunk in iter_chunks(trades, chunk_size):
+        low = min(low, float(chunk['price'].min()))
+        high = max(high, float(chunk['price'].max()))
+    if bucket_size > 0:
+        low = np.floor(low / bucket_size) * bucket_size
+        buckets = int((high - low) // bucket_size) + 1
+    else:
+        bucket_size = (high - low) / buckets or 1.0
+    if buckets > config.AGG_TRADES_MAX_BUCKETS:
+        raise ValueError(f"{buckets} price buckets exceeds the maximum of {config.AGG_TRADES_MAX_BUCKETS}; "
+                         f"use a larger bucket_size")
+
+    buy = np.zeros(buckets)
+    sell = np.zeros(buckets)
+    for chunk in iter_chunks(trades, chunk_size):
+        index = np.minimum(((chunk['price'] - low) / bucket_size).astype(np.int64), buckets - 1)
+        maker = chunk['maker']
+        buy += np.bincount(index[~maker], weights=chunk['qty'][~maker], minlength=buckets)
+        sell += np.bincount(index[maker], weights=chunk['qty'][maker], minlength=buckets)
+    return low + np.arange(buckets) * bucket_size, buy, sell
+
+
+def imbalance_series(trades, resolution_ms, chunk_size=None):
+    """Taker buy/sell volume per resolution_ms time bucket over the given trades.
+    Returns (bucket_open_times, buy_volume, sell_volume, vwap).
+    Raises ValueError above AGG_TRADES_MAX_BUCKETS buckets.
+    """
+    if not len(trades):
+        return None
+    first = int(trades['time'][0]) // resolution_ms * resolution_ms
+    buckets = (int(trades['time'][-1]) - first) // resolution_ms + 1
+    if buckets > config.AGG_TRADES_MAX_BUCKETS:
+        raise ValueError(f"{buckets} time buckets exceeds the maximum of {config.AGG_TRADES_MAX_BUCKETS}; "
+                         f"use a coarser resolution or a shorter window")
+    buy = np.zeros(buckets)
+    sell = np.zeros(buckets)
+    notional = np.zeros(buckets)
+    for chunk in iter_chunks(trades, chunk_size):
+        index = (chunk['time'] - first) // resolution_ms
+        maker = chunk['maker']
+        qty = chunk['qty']
+        buy += np.bincount(index[~maker], weights=qty[~maker], minlength=buckets)
+        sell += np.bincount(index[maker], weights=qty[maker], minlength=buckets)
+        notional += np.bincount(index, weights=chunk['price'] * qty, minlength=buckets)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        bucket_vwap = notional / (buy + sell)
+    return first + np.arange(buckets) * resolution_ms, buy, sell, bucket_vwap
+
+
+class AggTradeStore:
+    """Aggregate trades per symbol in an append-only file of TRADE_DTYPE records.
+
+    ingest() pages the aggTrades endpoint forward from the last stored trade id
+    (or backfills a time range for a new symbol) and appends each page to disk.
+    Reads memory-map the file, so analysis over millions of trades never loads
+    the whole history. Appends take an exclusive file lock, so several server
+    workers can share the directory.
+
+    Trades older than max_age_hours are dropped during ingest. The file is
+    rewritten and swapped in once the expired part reaches a tenth of the
+    retention period, so open memory maps keep reading the old copy.
+    """
+
+    def __init__(self, client, directory=config.AGG_TRADES_DIR, max_age_hours=config.AGG_TRADES_MAX_AGE_HOURS):
+        self.client = client
+        self.directory = directory
+        self.max_age_hours = max_age_hours
+        self._locks = {}
+        self._locks_guard = threading.Lock()
+
+    def path(self, symbol):
+        return os.path.join(self.directory, f"{symbol.upper()}.trades")
+
+    def load(self, symbol):
+        """Memory-mapped view of all stored trades for a symbol (empty array if none)"""
+        try:
+            f = open(self.path(symbol), 'rb')
+        except FileNotFoundError:
+            return np.empty(0, dtype=TRADE_DTYPE)
+        # Size and map the same open file, which a concurrent prune may replace
+        with f:
+            count = os.fstat(f.fileno()).st_size // TRADE_DTYPE.itemsize
+            if not count:
+                return np.empty(0, dtype=TRADE_DTYPE)
+            return np.memmap(f, dtype=TRADE_DTYPE, mode='r', shape=(count,))
+
+    def _thread_lock(self, symbol):
+        with self._locks_guard:
+            return self._locks.setdefault(symbol, threading.Lock())
+
+    def _open_locked(self, symbol):
+        """Open a symbol's file for appending under its exclusive lock, reopening if a prune replaced it meanwhile"""
+        path = self.path(symbol)
+        while True:
+            f = open(path, 'ab+')
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                if os.fstat(f.fileno()).st_ino == os.stat(path).st_ino:
+                    return f
+            except FileNotFoundError:
+                pass
+            f.close()
+
+    def _prune(self, symbol):
+        """Drop trades older than max_age_hours; called with the symbol's file lock held"""
+        if not self.max_age_hours:
+            return 0
+        trades = self.load(symbol)
+        max_age_ms = self.max_age_hours * HOUR_MS
+        cutoff = int(time.time() * 1000) - max_age_ms
+        if not len(trades) or trades['time'][0] >= cutoff - max_age_ms // 10:
+            return 0
+        kept = window_slice(trades, start_time=cutoff)
+        tmp_path = f"{self.path(symbol)}.tmp"
+        with open(tmp_path, 'wb') as tmp:
+            for chunk in iter_chunks(kept):
+                chunk.tofile(tmp)
+        os.replace(tmp_path, self.path(symbol))
+        return len(trades) - len(kept)
+
+    def ingest(self, symbol, backfill_minutes=60, max_pages=None):
+        """Append trades newer than the last stored one; a new symbol starts backfill_minutes ago.
+        Stops after max_pages requests. Returns the number of trades added.
+        """
+        symbol = symbol.upper()
+        max_pages = max_pages or config.AGG_TRADES_MAX_PAGES
+        added = 0
+        os.makedirs(self.directory, exist_ok=True)
+        with self._thread_lock(symbol), self._open_locked(symbol) as f:
+            try:
+                # Drop a partial record left by an interrupted write
+                size = f.seek(0, os.SEEK_END)
+                if size % TRADE_DTYPE.itemsize:
+                    f.truncate(size - size % TRADE_DTYPE.itemsize)
+                    size = f.seek(0, os.SEEK_END)
+                last_id = None
+                if size:
+                    f.seek(size - TRADE_DTYPE.itemsize)
+                    last_id = int(np.frombuffer(f.read(TRADE_DTYPE.itemsize), dtype=TRADE_DTYPE)['id'][0])
+                f.seek(0, os.SEEK_END)
+
+                since = int(time.time() * 1000) - backfill_minutes * 60 * 1000
+                for _ in range(max_pages):
+                    from_id = last_id is not None
+                    if from_id:
+                        page = self.client.get_aggregate_trades(symbol=symbol, fromId=last_id + 1, limit=PAGE_SIZE)
+                    else:
+                        # Time-bounded requests may span at most one hour
+                        now = int(time.time() * 1000)
+                        page = self.client.get_aggregate_trades(symbol=symbol, startTime=since,
+                                                                endTime=min(since + HOUR_MS - 1, now),
+                                                                limit=PAGE_SIZE)
+                        if not page:
+                            if since + HOUR_MS > now:
+                                break
+                            since += HOUR_MS
+                            continue
+                    if not page:
+                        break
+                    records = trades_to_records(page)
+                    records = records[records['id'] > (last_id if last_id is not None else -1)]
+                    records.tofile(f)
+                    f.flush()
+                    added += len(records)
+                    last_id = int(page[-1]['a'])
+                    # A short time-bounded page only ends its hour; paging by id continues from there
+                    if from_id and len(page) < PAGE_SIZE:
+                        break
+                pruned = self._prune(symbol)
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+        if added:
+            logging.info(f"Stored {added} aggregate trades for {symbol}")
+        if pruned:
+            logging.info(f"Dropped {pruned} aggregate trades older than {self.max_age_hours}h for {symbol}")
+        return added
@@ -1,26 +1,32 @@
 from binance.client import Client
 from binance.exceptions import BinanceAPIException
+from futures_trader import FuturesTrader
+import flight_recorder
 import config
 import logging
 import time
 import math
 
 class BinanceTrader:
-    def __init__(self):
+    def __init__(self, api_key=None, api_secret=None):
+        # Keys default to the main account in config.py; account_registry.py passes sub-account keys
         self.client = Client(
-            config.BINANCE_API_KEY, 
-            config.BINANCE_SECRET_KEY,
+            api_key or config.BINANCE_API_KEY,
+            api_secret or config.BINANCE_SECRET_KEY,
             {"verify": True, "timeout": 20}
         )
         self.recv_window = 5000  # 5 seconds
         # Force initial time sync
         self._force_time_sync()
+        # USD-M futures share this client and its clock offset
+        self.futures = FuturesTrader(self)
         
     def _force_time_sync(self):
         """Force the client to sync its time with the server"""
         try:
             # Get server time
-            server_time = self.client.get_server_time()
+            with flight_recorder.span('time_sync', kind='time_sync'):
+                server_time = self.client.get_server_time()
             # Set the timestamp offset in the client
             self.client.timestamp_offset = server_time['serverTime'] - int(time.time() * 1000)
             logging.info(f"Set timestamp offset to {self.client.timestamp_offset}ms")
@@ -94,7 +100,7 @@ class BinanceTrader:
                 last_error = e
                 retry_count += 1
                 if retry_count < max_retries:
-                    time.sleep(1)
+                    flight_recorder.sleep(1)
                     continue
             except Exception as e:
                 logging.error(f"Unexpected error getting balance: {e}")
@@ -104,7 +110,7 @@ class BinanceTrader:
             logging.error(f"Error getting balance after {max_retries} retries: {last_error}")
         return None
 
-    def get_market_data(self, symbol, interval='1h', limit=100):
+    def get_market_data(self, symbol, interval='1h', limit=100, end_time=None, start_time=None):
         max_retries = 2
         retry_count = 0
         last_error = None
@@ -115,18 +121,19 @@ class BinanceTrader:
                     # Force time sync before retry
                     self._force_time_sync()
                     
-                klines = self.client.get_klines(
-                    symbol=symbol,
-                    interval=interval,
-                    limit=limit
-                )
+                params = {'symbol': symbol, 'interval': interval, 'limit': limit}
+                if start_time is not None:
+                    params['startTime'] = start_time
+                if end_time is not None:
+                    params['endTime'] = end_time
+                klines = self.client.get_klines(**params)
                 
                 # Validate the response
                 if not klines or not isinstance(klines, list) or len(klines) == 0:
                     logging.error(f"Received invalid market data for {symbol}: {klines}")
                     retry_count += 1
                     if retry_count < max_retries:
-                        time.sleep(1)
+                        flight_recorder.sleep(1)
                         continue
                     return None
                     
@@ -136,7 +143,7 @@ class BinanceTrader:
                         logging.error(f"Invalid kline data structure for {symbol}")
                         retry_count += 1
                         if retry_count < max_retries:
-                            time.sleep(1)
+                            flight_recorder.sleep(1)
                             continue
                         return None
                         
@@ -146,7 +153,7 @@ class BinanceTrader:
                 last_error = e
                 retry_count += 1
                 if retry_count < max_retries:
-                    time.sleep(1)
+                    flight_recorder.sleep(1)
                     continue
             except Exception as e:
                 logging.error(f"Unexpected error getting market data: {e}")
@@ -156,6 +163,28 @@ class BinanceTrader:
             logging.error(f"Error getting market data after {max_retries} retries: {last_error}")
         return None
 
+    def get_market_history(self, symbol, interval='1h', limit=100):
+        """Get up to `limit` most recent klines, paging backwards past the 1000-candle request cap.
+        Limits above MAX_KLINE_LIMIT are refused rather than issuing hundreds of sequential requests.
+        """
+        if limit > config.MAX_KLINE_LIMIT:
+            logging.error(f"Kline limit {limit} exceeds MAX_KLINE_LIMIT ({config.MAX_KLINE_LIMIT})")
+            return None
+        if limit <= 1000:
+            return self.get_market_data(symbol, interval, limit)
+
+        klines = []
+        end_time = None
+        while len(klines) < limit:
+            page = self.get_market_data(symbol, interval, min(1000, limit - len(klines)), end_time=end_time)
+            if not page:
+                break
+            klines = page + klines
+            if len(page) < 1000:
+                break  # Reached the start of the symbol's history
+            end_time = page[0][0] - 1
+        return klines or None
+
     def _calculate_max_sell_quantity(self, balance, fee_percentage):
         """Calculate maximum quantity that can be sold accounting for fees"""
         # If we want to sell X BTC, we need X * (1 + fee) available
@@ -164,7 +193,18 @@ class BinanceTrader:
         return balance / (1 + fee_percentage)
 
     def place_order(self, symbol, side, quantity):
-        """Place a market order"""
+        """Place a market order and wait until balances reflect the fill"""
+        order, expectation = self.submit_order(symbol, side, quantity)
+        if order and expectation:
+            self.reconcile_balances(expectation)
+        return order
+
+    def submit_order(self, symbol, side, quantity):
+        """Place a market order and return as soon as the exchange acknowledges it.
+        Returns (order, expectation) where expectation holds the balances the fill
+        should produce, for use with reconcile_balances(). expectation is None when
+        the order did not fill immediately.
+        """
         max_retries = 3
         retry_count = 0
         last_error = None
@@ -174,12 +214,12 @@ class BinanceTrader:
             balance = self.get_account_balance('BTC')
             if not balance:
                 logging.error(f"Could not get BTC balance")
-                return None
+                return None, None
                 
             # Skip if balance is too small
             if balance['free'] < 1e-5:  # Minimum tradeable amount
                 logging.info(f"BTC balance {balance['free']:.8f} is too small to trade (min: 0.00001)")
-                return None
+                return None, None
                 
             fee_percentage = config.TRADING_FEE_PERCENTAGE / 100
             max_sell_qty = self._calculate_max_sell_quantity(balance['free'], fee_percentage)
@@ -191,13 +231,13 @@ class BinanceTrader:
         # Format the quantity
         formatted_qty = self._format_quantity(symbol, quantity)
         if not formatted_qty:
-            return None
+            return None, None
             
         # Get current price to verify order value
         ticker = self.client.get_symbol_ticker(symbol=symbol)
         if not ticker:
             logging.error("Could not get current price")
-            return None
+            return None, None
             
         current_price = float(ticker['price'])
         order_value = float(formatted_qty) * current_price
@@ -217,7 +257,7 @@ class BinanceTrader:
         # Check minimum notional
         if order_value < min_notional:
             logging.error(f"Order value {order_value:.2f} USDT is below minimum required {min_notional} USDT")
-            return None
+            return None, None
             
         while retry_count < max_retries:
             try:
@@ -231,11 +271,11 @@ class BinanceTrader:
                     balance = self.get_account_balance('USDT')
                     if not balance:
                         logging.error(f"Could not get USDT balance")
-                        return None
+                        return None, None
                         
                     if balance['free'] < required_usdt:
                         logging.error(f"Insufficient USDT balance. Required (incl. {fee_percentage*100}% fee): {required_usdt:.2f}, Available: {balance['free']:.2f}")
-                        return None
+                        return None, None
                 
                 # Get initial balances before order
                 initial_base_balance = self.get_account_balance('BTC')
@@ -243,7 +283,7 @@ class BinanceTrader:
                 
                 if not initial_base_balance or not initial_quote_balance:
                     logging.error("Could not get initial balances")
-                    return None
+                    return None, None
                     
                 logging.info(f"Initial balances - BTC: {initial_base_balance['total']:.12f}, USDT: {initial_quote_balance['total']:.12f}")
                 
@@ -288,31 +328,49 @@ class BinanceTrader:
                         
                     logging.info(f"Expected balances - BTC: {expected_btc:.12f}, USDT: {expected_usdt:.12f}")
                     
-                    # Add small tolerance for floating point comparison
-                    balance_tolerance = 1e-8
-                    
-                    # Wait for balance updates with expected values
-                    if side == 'SELL':
-                        self.wait_for_balance_update('BTC', 'decrease', expected_value=expected_btc, balance_tolerance=balance_tolerance)
-                        self.wait_for_balance_update('USDT', 'increase', expected_value=expected_usdt, balance_tolerance=balance_tolerance)
-                    else:  # BUY
-                        self.wait_for_balance_update('USDT', 'decrease', expected_value=expected_usdt, balance_tolerance=balance_tolerance)
-                        self.wait_for_balance_update('BTC', 'increase', expected_value=expected_btc, balance_tolerance=balance_tolerance)
+                    return order, {
+                        'side': side,
+                        'price': current_price,
+                        'initial_btc': initial_base_balance['total'],
+                        'initial_usdt': initial_quote_balance['total'],
+                        'expected_btc': expected_btc,
+                        'expected_usdt': expected_usdt,
+                        'commission': total_commission,
+                        'commission_asset': commission_asset,
+                    }
                         
-                return order
+                return order, None
                 
             except BinanceAPIException as e:
                 last_error = e
                 retry_count += 1
                 if retry_count < max_retries:
-                    time.sleep(1)
+                    flight_recorder.sleep(1)
                     continue
                 logging.error(f"Error placing order after {retry_count} retries: {e}")
             except Exception as e:
                 logging.error(f"Unexpected error placing order: {e}")
-                return None
+                return None, None
                 
-        return None
+        return None, None
+
+    def reconcile_balances(self, expectation, balance_tolerance=1e-8, progress_callback=None):
+        """Wait for BTC/USDT balances to match the expectation returned by submit_order.
+        Returns a dict mapping asset to whether its balance update was detected.
+        """
+        if expectation['side'] == 'SELL':
+            checks = [('BTC', 'decrease', expectation['expected_btc']),
+                      ('USDT', 'increase', expectation['expected_usdt'])]
+        else:  # BUY
+            checks = [('USDT', 'decrease', expectation['expected_usdt']),
+                      ('BTC', 'increase', expectation['expected_btc'])]
+
+        results = {}
+        for asset, operation, expected_value in checks:
+            results[asset] = self.wait_for_balance_update(asset, operation, expected_value=expected_value,
+                                                          balance_tolerance=balance_tolerance,
+                                                          progress_callback=progress_callback)
+        return results
 
     def get_symbol_info(self, symbol):
         max_retries = 2
@@ -335,7 +393,7 @@ class BinanceTrader:
                 last_error = e
                 retry_count += 1
                 if retry_count < max_retries:
-                    time.sleep(1)
+                    flight_recorder.sleep(1)
                     continue
             except Exception as e:
                 logging.error(f"Unexpected error getting symbol info: {e}")
@@ -345,16 +403,17 @@ class BinanceTrader:
             logging.error(f"Error getting symbol info after {max_retries} retries: {last_error}")
         return None
 
-    def wait_for_balance_update(self, asset, expected_operation, timeout=30, max_retries=3, expected_value=None, balance_tolerance=1e-8):
+    def wait_for_balance_update(self, asset, expected_operation, timeout=30, max_retries=3, expected_value=None, balance_tolerance=1e-8, progress_callback=None):
         """Wait for balance to update after an order with retries
         expected_operation: 'increase' or 'decrease'
         expected_value: if provided, wait for balance to match this value within tolerance
         balance_tolerance: tolerance for balance comparison (default 1e-8)
+        progress_callback: optional callable receiving a short status message per attempt/outcome
         """
         retry_count = 0
         while retry_count < max_retries:
             # Add initial delay before first check to allow balance to update
-            time.sleep(5)  # Increased from 3s to 5s
+            flight_recorder.sleep(5, reason='balance_settle')  # Increased from 3s to 5s
             
             start_time = time.time()
             initial_balance = self.get_account_balance(asset)
@@ -365,6 +424,9 @@ class BinanceTrader:
             initial_free = initial_balance['free']
             initial_total = initial_balance['total']
             
+            if progress_callback:
+                progress_callback(f"{asset}: attempt {retry_count + 1}/{max_retries} waiting for balance to {expected_operation}")
+            
             if expected_value is not None:
                 logging.info(f"[Attempt {retry_count + 1}] Waiting for {asset} balance to reach {expected_value:.12f} ±{balance_tolerance:.12f} "
                            f"(current: Free: {initial_free:.12f}, Total: {initial_total:.12f})")
@@ -378,11 +440,11 @@ class BinanceTrader:
             
             while time.time() - start_time < timeout:
                 # Add a small delay between checks
-                time.sleep(1)  # Increased from 0.5s to 1s
+                flight_recorder.sleep(1, reason='balance_poll')  # Increased from 0.5s to 1s
                 
                 current_balance = self.get_account_balance(asset)
                 if not current_balance:
-                    time.sleep(1)
+                    flight_recorder.sleep(1, reason='balance_poll')
                     continue
                     
                 current_free = current_balance['free']
@@ -411,6 +473,8 @@ class BinanceTrader:
                     if abs(current_total - expected_value) <= balance_tolerance:
                         logging.info(f"{asset} balance matched expected value - Current: {current_total:.12f}, Expected: {expected_value:.12f} "
                                    f"(diff: {abs(current_total - expected_value):.12f} ≤ {balance_tolerance:.12f})")
+                        if progress_callback:
+                            progress_callback(f"{asset}: balance matched expected value {expected_value:.8f}")
                         return True
                 # Otherwise check for directional change
                 else:
@@ -439,35 +503,15 @@ class BinanceTrader:
             retry_count += 1
             if retry_count < max_retries:
                 logging.info(f"Retrying balance check in 5 seconds...")
-                time.sleep(5)
+                flight_recorder.sleep(5)
     
         logging.error(f"Failed to detect {asset} balance update after {max_retries} attempts")
+        if progress_callback:
+            progress_callback(f"{asset}: no balance update detected after {max_retries} attempts")
         return False
 
     def change_leverage(self, symbol, leverage):
-        """Change the leverage for a symbol (Futures only)"""
-        try:
-            # Note: This will only work if the account is a Futures account
-            # and the client is initialized for Futures, or if using Spot, 
-            # this call might fail or require a different client method.
-            # Assuming we are using the standard client which supports futures calls via extensions.
-            
-            # Since standard Client is mixed, we can try to access the futures endpoint directly
-            # or check if a futures method exists.
-            
-            # For python-binance, futures methods are usually directly on the client 
-            # (e.g., client.futures_change_leverage).
-            # If we are in Spot mode (which we seem to be), this call will fail 
-            # unless we have a Futures account linked and use the right endpoint.
-            
-            # Let's try to invoke the futures method.
-            response = self.client.futures_change_leverage(symbol=symbol, leverage=leverage)
-            logging.info(f"Leverage changed for {symbol}: {response}")
-            return response
-            
-        except BinanceAPIException as e:
-            logging.error(f"Binance API Error changing leverage: {e}")
-            return None
-        except Exception as e:
-            logging.error(f"Unexpected error changing leverage: {e}")
-            return None
+        """Change the leverage for a symbol (Futures only).
+        Delegates to FuturesTrader, which skips the request when the cached leverage already matches.
+        """
+        return self.futures.change_leverage(symbol, leverage)
@@ -0,0 +1,398 @@
+import fcntl
+import json
+import logging
+import os
+import queue
+import threading
+import time
+import uuid
+from collections import deque
+from contextlib import contextmanager
+
+import pandas as pd
+
+import config
+import traffic_recorder
+from indicators import IndicatorEngine
+from kline_resampler import INTERVAL_MS, INTERVAL_OFFSET_MS
+
+# condition -> whether it needs `value`
+CONDITIONS = {
+    'price_crosses_above': True,
+    'price_crosses_below': True,
+    'rsi_above': True,
+    'rsi_below': True,
+    'candle_close': False,
+}
+
+
+class ConditionWatcher:
+    """Resident trigger engine evaluated on streamed 1m klines.
+
+    Agents register triggers (price crossing a level, RSI beyond a threshold
+    on an interval's candle close, or any candle close). Every kline update
+    is pushed into the shared KlineResampler and only the triggers for that
+    symbol are evaluated: price crosses on every tick, RSI and candle-close
+    triggers when a candle of their interval closes. Fired triggers become
+    events (and optional queued actions). Stream messages are handled on a
+    separate thread, so REST fetches made while evaluating never stall the
+    websocket. A symbol's socket is closed once it has no triggers left.
+
+    The trigger file is the shared state: triggers and recent events are
+    loaded on first use and read-modify-written under a file lock, so several server processes
+    (multi_worker.py) see the same triggers and events. Only the process
+    holding the owner lock streams and evaluates, so each trigger fires (and
+    its action runs) once; the others stand by and take over if it exits.
+    """
+
+    def __init__(self, resampler, path=config.TRIGGERS_PATH, max_events=config.WATCHER_MAX_EVENTS):
+        self.resampler = resampler
+        self.path = path
+        self.max_events = max_events
+        self.events = deque(maxlen=max_events)
+        self.listeners = []
+        self.action_handler = None
+        self._triggers = {}
+        self._file_version = None
+        self._last_price = {}
+        self._lock = threading.RLock()
+        self._stream = None
+        self._sockets = {}
+        self._messages = queue.Queue()
+        self._owner_file = None
+        self._thread = None
+        self._evaluator = None
+        self._stopped = threading.Event()
+
+    # --- Trigger registry ---
+
+    def add_trigger(self, symbol, condition, value=None, interval='1m', period=14, repeat=False, action=None):
+        if condition not in CONDITIONS:
+            raise ValueError(f"Unknown condition '{condition}'. Available: {', '.join(CONDITIONS)}")
+        if CONDITIONS[condition] and value is None:
+            raise ValueError(f"Condition '{condition}' requires a value")
+        if interval not in INTERVAL_MS:
+            raise ValueError(f"Unsupported interval '{interval}'")
+        trigger = {
+            'id': uuid.uuid4().hex[:8],
+            'symbol': symbol.upper(),
+            'condition': condition,
+            'value': value,
+            'interval': interval,
+            'period': period,
+            'repeat': repeat,
+            'action': action,
+            'created_at': int(time.time() * 1000),
+            'fired_count': 0,
+        }
+        self._update(lambda triggers, events: triggers.__setitem__(trigger['id'], trigger))
+        self._sync_sockets()
+        return trigger
+
+    def remove_trigger(self, trigger_id):
+        removed = self._update(lambda triggers, events: triggers.pop(trigger_id, None))
+        self._sync_sockets()
+        return removed
+
+    def list_triggers(self):
+        self._refresh()
+        with self._lock:
+            return [dict(t) for t in self._triggers.values()]
+
+    def get_events(self, after_id=0, limit=50):
+        """Fired events with id greater than after_id, oldest first"""
+        self._refresh()
+        with self._lock:
+            return [e for e in self.events if e['id'] > after_id][:limit]
+
+    # --- Shared trigger file ---
+
+    @contextmanager
+    def _file_lock(self):
+        with open(f"{self.path}.lock", 'a') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def _version(self):
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        # Every write replaces the file, so the inode changes even within one mtime tick
+        return stat.st_ino, stat.st_mtime_ns
+
+    def _read_file(self):
+        if not os.path.exists(self.path):
+            return {}, []
+        try:
+            with open(self.path, 'r') as f:
+                data = json.load(f)
+        except Exception as e:
+            logging.error(f"Error loading triggers from {self.path}: {e}")
+            return {}, []
+        if isinstance(data, list):  # Files written before events were shared
+            data = {'triggers': data, 'events': []}
+        return {t['id']: t for t in data['triggers']}, data['events']
+
+    def _apply(self, triggers, events, version):
+        with self._lock:
+            self._triggers = triggers
+            self.events = deque(events, maxlen=self.max_events)
+            self._file_version = version
+
+    def _refresh(self):
+        """Reload the shared file if another process (or thread) changed it"""
+        version = self._version()
+        if version == self._file_version:
+            return
+        with self._file_lock():
+            version = self._version()
+            triggers, events = self._read_file()
+        self._apply(triggers, events, version)
+
+    def _update(self, mutate):
+        """Apply mutate(triggers, events) to the shared file under its lock and return its result"""
+        with self._file_lock():
+            triggers, events = self._read_file()
+            result = mutate(triggers, events)
+            del events[:-self.max_events]
+            # Write-then-rename so a crash never leaves a truncated trigger file
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, 'w') as f:
+                json.dump({'triggers': list(triggers.values()), 'events': events}, f)
+            os.replace(tmp_path, self.path)
+            self._apply(triggers, events, self._version())
+        return result
+
+    # --- Streaming ---
+
+    def start(self):
+        """Start watching. The process that gets the owner lock opens one 1m kline stream per
+        symbol with triggers; other processes stand by and retry every WATCHER_SYNC_SECONDS.
+        Returns the role of this process: 'owner' or 'standby'.
+        """
+        with self._lock:
+            if self._thread is None:
+                self._stopped.clear()
+                self._messages = queue.Queue()
+                self._evaluator = threading.Thread(target=self._process_messages, args=(self._messages,),
+                                                   name="condition-evaluator", daemon=True)
+                self._evaluator.start()
+                self._step()
+                self._thread = threading.Thread(target=self._run, name="condition-watcher", daemon=True)
+                self._thread.start()
+        return self.role()
+
+    def role(self):
+        return 'owner' if self._owner_file else 'standby'
+
+    @property
+    def streaming(self):
+        return self._stream is not None
+
+    def stop(self):
+        self._stopped.set()
+        with self._lock:
+            if self._stream:
+                self._stream.stop()
+            self._stream = None
+            self._sockets.clear()
+            if self._owner_file:
+                self._owner_file.close()  # Releases the owner lock
+            self._owner_file = None
+            self._thread = None
+            if self._evaluator:
+                self._messages.put(None)
+            self._evaluator = None
+
+    def _run(self):
+        while not self._stopped.wait(config.WATCHER_SYNC_SECONDS):
+            try:
+                self._step()
+            except Exception as e:
+                logging.error(f"Condition watcher sync failed: {e}")
+
+    def _step(self):
+        """Take ownership if it is free, open the stream, and subscribe symbols added by any process"""
+        if not self._owner_file and not self._acquire_ownership():
+            return
+        self._refresh()
+        if not self._stream and not self._open_stream():
+            return
+        self._sync_sockets()
+
+    def _acquire_ownership(self):
+        owner_file = open(f"{self.path}.owner", 'a')
+        try:
+            fcntl.flock(owner_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            owner_file.close()
+            return False
+        self._owner_file = owner_file
+        logging.info(f"Condition watcher owner is pid {os.getpid()}")
+        return True
+
+    def _open_stream(self):
+        if traffic_recorder.replaying():
+            logging.info("Replaying upstream traffic; condition watcher streams are not opened")
+            return False
+        try:
+            from binance import ThreadedWebsocketManager
+            self._stream = ThreadedWebsocketManager(config.BINANCE_API_KEY, config.BINANCE_SECRET_KEY)
+            self._stream.start()
+            logging.info("Condition watcher stream started")
+            return True
+        except Exception as e:
+            logging.error(f"Could not start condition watcher stream: {e}")
+            self._stream = None
+            return False
+
+    def _sync_sockets(self):
+        """Open a kline socket for each symbol with triggers and close the rest"""
+        symbols = {t['symbol'] for t in self.list_triggers()}
+        with self._lock:
+            if not self._stream:
+                return
+            for symbol in symbols - set(self._sockets):
+                self._sockets[symbol] = self._stream.start_kline_socket(callback=self._messages.put,
+                                                                        symbol=symbol, interval='1m')
+            for symbol in set(self._sockets) - symbols:
+                self._stream.stop_socket(self._sockets.pop(symbol))
+                # A price from before the gap must not count as the previous tick of a later cross
+                self._last_price.pop(symbol, None)
+
+    def _process_messages(self, messages):
+        """Handle queued stream messages until stop() posts None"""
+        while True:
+            msg = messages.get()
+            if msg is None:
+                return
+            try:
+                self.on_kline(msg)
+            except Exception as e:
+                logging.error(f"Error handling condition watcher message: {e}")
+
+    def on_kline(self, msg):
+        """Handle a 1m kline stream message (on the evaluator thread)"""
+        if msg.get('e') != 'kline':
+            if msg.get('e') == 'error':
+                logging.error(f"Condition watcher stream error: {msg}")
+            return
+        k = msg['k']
+        symbol = msg['s']
+        self._refresh()
+        self.resampler.ingest(symbol, [[k['t'], k['o'], k['h'], k['l'], k['c'], k['v'], k['T'],
+                                        k['q'], k['n'], k['V'], k['Q'], '0']])
+        self.evaluate(symbol, float(k['c']), k['T'] if k['x'] else None, msg.get('E'))
+
+    # --- Evaluation ---
+
+    def evaluate(self, symbol, price, closed_candle_close_time=None, event_time=None):
+        """Evaluate the symbol's triggers for a new price.
+        closed_candle_close_time is the close time of a 1m candle that just closed, if any.
+        """
+        with self._lock:
+            previous = self._last_price.get(symbol)
+            self._last_price[symbol] = price
+            triggers = [t for t in self._triggers.values() if t['symbol'] == symbol]
+
+        for trigger in triggers:
+            condition = trigger['condition']
+            observed = None
+            if condition == 'price_crosses_above':
+                if previous is not None and previous < trigger['value'] <= price:
+                    observed = price
+            elif condition == 'price_crosses_below':
+                if previous is not None and previous > trigger['value'] >= price:
+                    observed = price
+            elif closed_candle_close_time is not None and self._closes_interval(closed_candle_close_time, trigger['interval']):
+                if condition == 'candle_close':
+                    observed = price
+                else:
+                    rsi = self._latest_rsi(symbol, trigger['interval'], trigger['period'], closed_candle_close_time)
+                    if isinstance(rsi, float) and ((condition == 'rsi_above' and rsi > trigger['value']) or
+                                                   (condition == 'rsi_below' and rsi < trigger['value'])):
+                        observed = rsi
+            if observed is not None:
+                self._fire(trigger, observed, event_time)
+
+    @staticmethod
+    def _closes_interval(close_time, interval):
+        """Whether a 1m candle closing at close_time also closes a candle of `interval`"""
+        return (close_time + 1 - INTERVAL_OFFSET_MS.get(interval, 0)) % INTERVAL_MS[interval] == 0
+
+    def _latest_rsi(self, symbol, interval, period, close_time):
+        """RSI of the candles closed at or before close_time.
+        Intervals too long to derive from the 1m base window (e.g. 4h, 1d) are fetched over REST.
+        """
+        limit = period * 3
+        klines = self.resampler.get_klines(symbol, interval, limit)
+        if klines is None and not self.resampler.can_derive(interval, limit):
+            klines = self.resampler.trader.get_market_history(symbol, interval, limit + 1)
+        # Drop the candle that opened at the boundary, which REST may already return
+        klines = [k for k in klines or [] if k[6] <= close_time]
+        if not klines:
+            logging.warning(f"No {interval} candles for {symbol}; RSI trigger not evaluated")
+            return None
+        df = pd.DataFrame({'close': [float(k[4]) for k in klines]})
+        return IndicatorEngine(df).latest(f"rsi:{period}")[1]
+
+    def _fire(self, trigger, observed, event_time):
+        now = int(time.time() * 1000)
+
+        def record(triggers, events):
+            current = triggers.get(trigger['id'])
+            if current is None:
+                return None  # Removed or already fired by a concurrent evaluation
+            event = {
+                'id': events[-1]['id'] + 1 if events else 1,
+                'trigger_id': trigger['id'],
+                'symbol': trigger['symbol'],
+                'condition': trigger['condition'],
+                'value': trigger['value'],
+                'interval': trigger['interval'],
+                'observed': observed,
+                'fired_at': now,
+                'latency_ms': now - event_time if event_time else None,
+                'repeat': trigger['repeat'],
+                'action': trigger['action'],
+            }
+            events.append(event)
+            current['fired_count'] += 1
+            current['last_fired'] = now
+            if not current['repeat']:
+                del triggers[trigger['id']]
+            return event
+
+        event = self._update(record)
+        if event is None:
+            return
+        if not trigger['repeat']:
+            self._sync_sockets()
+
+        logging.info(f"Trigger {trigger['id']} fired: {trigger['symbol']} {trigger['condition']} "
+                     f"{trigger['value']} (observed {observed})")
+        for listener in list(self.listeners):
+            try:
+                listener(event)
+            except Exception as e:
+                logging.debug(f"Trigger listener failed: {e}")
+        if trigger['action'] and self.action_handler:
+            threading.Thread(target=self._run_action, args=(event,), daemon=True).start()
+
+    def _run_action(self, event):
+        try:
+            result = str(self.action_handler(event))
+        except Exception as e:
+            logging.error(f"Error running action for trigger {event['trigger_id']}: {e}")
+            result = f"Error: {e}"
+        event['action_result'] = result
+
+        def store(triggers, events):
+            for stored in events:
+                if stored['id'] == event['id']:
+                    stored['action_result'] = result
+        self._update(store)
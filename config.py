@@ -21,3 +21,75 @@ STOP_LOSS_PERCENTAGE = 1  # Tighter stop loss for safer testing
 TAKE_PROFIT_PERCENTAGE = 2  # Tighter take profit for faster testing
 POLLING_INTERVAL = 1800  # Time in seconds between trading checks (30 minutes) - Set for Gemini 1.5 Pro free tier limit (50 RPD)
 TRADING_FEE_PERCENTAGE = 0.1  # Binance trading fee percentage (0.1% = 0.001 in decimal)
+
+# Market Data
+MAX_KLINE_LIMIT = 20000  # Most klines one request may page in (1000 per REST call); covers the 1m resampling base
+
+# Request Coalescing
+# Seconds an identical read result may be reused across tool calls (0 = only share in-flight calls)
+COALESCE_TTL_SECONDS = {
+    'price': 1.0,
+    'klines': 2.0,
+    'symbol_info': 60.0,
+    'balance': 0,
+    'ticker_24h': 5.0,
+    'portfolio': 30.0,
+}
+
+# Order Tracking
+ORDER_TRACKER_MAX_ORDERS = 200  # Recent orders kept in memory for get_order_status
+ORDER_TRACKER_MAX_EVENTS = 50  # Progress messages kept per tracked order
+TRADE_JOURNAL_PATH = os.getenv('TRADE_JOURNAL_PATH', 'trade_journal.db')  # SQLite journal of placed orders
+
+# Upstream Traffic Record/Replay
+# UPSTREAM_TRAFFIC_MODE: unset for live traffic, 'record' to capture, 'replay' to serve from the cassette
+UPSTREAM_TRAFFIC_MODE = os.getenv('UPSTREAM_TRAFFIC_MODE', '')
+UPSTREAM_CASSETTE = os.getenv('UPSTREAM_CASSETTE', 'upstream_cassette.jsonl.gz')
+UPSTREAM_REPLAY_LATENCY = os.getenv('UPSTREAM_REPLAY_LATENCY', 'original')  # 'original' or 'zero'
+
+# Multi-Worker Server (multi_worker.py)
+MCP_WORKERS = int(os.getenv('MCP_WORKERS', os.cpu_count() or 1))
+MCP_HOST = os.getenv('MCP_HOST', '127.0.0.1')
+MCP_PORT = int(os.getenv('MCP_PORT', '8080'))
+SHARED_CACHE_MAX_ENTRIES = 10000  # Entries kept in the cache shared by all workers
+
+# Local Resampling (kline_resampler.py)
+RESAMPLE_FROM_1M = True  # Derive higher intervals from one 1m series per symbol when it fits in the base window
+RESAMPLE_BASE_MAX_CANDLES = 10080  # 1m candles kept per symbol (7 days); longer requests use the REST interval directly
+RESAMPLE_REFRESH_SECONDS = 2.0  # Minimum time between incremental 1m refreshes for a symbol
+RESAMPLE_MAX_SYMBOLS = 200  # 1m base series kept in memory (~0.9 MB each), least recently used evicted first
+
+# Strategy Optimizer
+OPTIMIZER_WORKERS = int(os.getenv('OPTIMIZER_WORKERS', '0')) or None  # Process pool size (None = all cores)
+
+# USD-M Futures
+FUTURES_CONFIG_TTL = 3600  # Seconds to cache leverage brackets, symbol leverage/margin type and futures exchange filters
+FUTURES_USER_STREAM = os.getenv('FUTURES_USER_STREAM', 'true').lower() == 'true'  # Keep positions current from the user data stream
+
+# Condition Watcher (condition_watcher.py)
+TRIGGERS_PATH = os.getenv('TRIGGERS_PATH', 'triggers.json')  # Registered triggers and recent events, shared by all workers
+WATCHER_MAX_EVENTS = 500  # Fired trigger events kept for get_trigger_events
+WATCHER_SYNC_SECONDS = 1.0  # How often the watcher picks up other workers' triggers and retries ownership
+WATCHER_EXECUTE_ACTIONS = os.getenv('WATCHER_EXECUTE_ACTIONS', 'false').lower() == 'true'  # Let triggers place orders
+
+# Flight Recorder (flight_recorder.py)
+SLOW_CALL_THRESHOLD_MS = float(os.getenv('SLOW_CALL_THRESHOLD_MS', '1000'))  # Tool calls at least this slow are kept
+SLOW_CALL_BUFFER_SIZE = 100  # Slow calls kept in the ring buffer
+SLOW_CALL_MAX_SPANS = 500  # Spans recorded per call; further spans are only counted
+PROFILER_ENABLED = os.getenv('PROFILER_ENABLED', 'false').lower() == 'true'  # Allow the run_profiler admin tool
+PROFILER_MAX_SECONDS = 60
+
+# Multiple Accounts (account_registry.py)
+# BINANCE_ACCOUNTS: comma-separated names of extra accounts, with keys in BINANCE_API_KEY_<NAME> / BINANCE_SECRET_KEY_<NAME>
+ACCOUNT_POOL_SIZE = 10  # Pooled HTTP connections per account
+ACCOUNT_MAX_REQUESTS_PER_SECOND = 10  # Client-side budget for signed (account) requests per account
+
+# Portfolio Analytics (portfolio_analytics.py)
+PORTFOLIO_FETCH_WORKERS = 8  # Symbols whose klines are fetched concurrently
+
+# Aggregate Trades (agg_trades.py)
+AGG_TRADES_DIR = os.getenv('AGG_TRADES_DIR', 'agg_trades')  # One append-only binary file per symbol
+AGG_TRADES_MAX_AGE_HOURS = int(os.getenv('AGG_TRADES_MAX_AGE_HOURS', '168'))  # Trades kept per symbol (~33 bytes each; 0 = keep all)
+AGG_TRADES_MAX_PAGES = 50  # aggTrades requests (1000 trades each) per ingest call
+AGG_TRADES_CHUNK_SIZE = 1_000_000  # Trades held in memory at once while scanning
+AGG_TRADES_MAX_BUCKETS = 100_000  # Price or time buckets a volume profile / imbalance series may allocate
@@ -0,0 +1,77 @@
+import numpy as np
+
+
+def klines_to_array(klines):
+    """Convert raw Binance klines to a float64 array with columns time, open, high, low, close, volume"""
+    return np.array([k[:6] for k in klines], dtype=np.float64)
+
+
+def _bucket_edges(n, buckets):
+    """Start indices of `buckets` contiguous, near-equal slices of range(n)"""
+    return np.linspace(0, n, buckets + 1).astype(np.int64)[:-1]
+
+
+def ohlc_buckets(data, max_points):
+    """Aggregate consecutive candles into at most max_points OHLCV candles.
+    Each bucket keeps the first open/time, the highest high, the lowest low,
+    the last close and the summed volume, so wicks and ranges survive.
+    """
+    n = len(data)
+    if max_points <= 0 or n <= max_points:
+        return data
+    starts = _bucket_edges(n, max_points)
+    ends = np.append(starts[1:], n) - 1
+
+    out = np.empty((len(starts), 6), dtype=np.float64)
+    out[:, 0] = data[starts, 0]
+    out[:, 1] = data[starts, 1]
+    out[:, 2] = np.maximum.reduceat(data[:, 2], starts)
+    out[:, 3] = np.minimum.reduceat(data[:, 3], starts)
+    out[:, 4] = data[ends, 4]
+    out[:, 5] = np.add.reduceat(data[:, 5], starts)
+    return out
+
+
+def lttb(data, max_points, column=4):
+    """Largest-Triangle-Three-Buckets downsampling of one column (close by default).
+    Returns the selected rows of `data` unchanged, so every point is a real candle.
+    The first and last candles are always kept.
+    """
+    n = len(data)
+    if max_points <= 0 or n <= max_points:
+        return data
+    if max_points < 3:
+        return data[[0, n - 1]][:max_points]
+
+    x = data[:, 0]
+    y = data[:, column]
+    # Interior points are split into max_points - 2 buckets
+    edges = np.linspace(1, n - 1, max_points - 1).astype(np.int64)
+    selected = np.empty(max_points, dtype=np.int64)
+    selected[0] = 0
+    selected[-1] = n - 1
+
+    # Averages of every bucket, precomputed in one pass; bucket i uses the average of bucket i + 1
+    sums_x = np.add.reduceat(x[1:n - 1], edges[:-1] - 1)
+    sums_y = np.add.reduceat(y[1:n - 1], edges[:-1] - 1)
+    counts = np.diff(edges)
+    avg_x = np.append(sums_x / counts, x[n - 1])
+    avg_y = np.append(sums_y / counts, y[n - 1])
+
+    a = 0
+    for i in range(max_points - 2):
+        lo, hi = edges[i], edges[i + 1]
+        # Twice the triangle area between point a, each candidate and the next bucket's average
+        areas = np.abs((x[a] - avg_x[i + 1]) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (avg_y[i + 1] - y[a]))
+        a = lo + int(np.argmax(areas))
+        selected[i + 1] = a
+    return data[selected]
+
+
+def downsample(data, max_points, method='ohlc'):
+    """Reduce a kline array to at most max_points rows using 'ohlc' buckets or 'lttb'"""
+    if method == 'lttb':
+        return lttb(data, max_points)
+    if method == 'ohlc':
+        return ohlc_buckets(data, max_points)
+    raise ValueError(f"Unknown downsampling method: {method}")
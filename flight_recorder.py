@@ -0,0 +1,204 @@
+import contextvars
+import functools
+import inspect
+import logging
+import sys
+import threading
+import time
+from collections import Counter, deque
+from contextlib import contextmanager
+from urllib.parse import urlsplit
+
+import requests
+
+import config
+
+_current = contextvars.ContextVar('flight_recorder_span', default=None)
+_slow_calls = deque(maxlen=config.SLOW_CALL_BUFFER_SIZE)
+_lock = threading.Lock()
+_original_send = None
+
+
+class Span:
+    __slots__ = ('name', 'kind', 'attrs', 'start', 'duration_ms', 'children', 'root', 'error')
+
+    def __init__(self, name, kind, attrs, root=None):
+        self.name = name
+        self.kind = kind
+        self.attrs = attrs
+        self.start = time.perf_counter()
+        self.duration_ms = None
+        self.children = []
+        self.root = root or self
+        self.error = None
+
+    def to_dict(self, origin=None):
+        origin = self.start if origin is None else origin
+        data = {
+            'name': self.name,
+            'kind': self.kind,
+            'offset_ms': round((self.start - origin) * 1000, 3),
+            'duration_ms': round(self.duration_ms, 3) if self.duration_ms is not None else None,
+        }
+        if self.attrs:
+            data['attrs'] = self.attrs
+        if self.error:
+            data['error'] = self.error
+        if self.children:
+            data['children'] = [c.to_dict(origin) for c in list(self.children)]
+        return data
+
+
+@contextmanager
+def span(name, kind='compute', **attrs):
+    """Record a child span of the running tool call; a no-op outside of traced calls"""
+    parent = _current.get()
+    if parent is None:
+        yield None
+        return
+    root = parent.root
+    # Bound the tree: a runaway loop must not grow one call's record without limit
+    if root.attrs.get('spans', 0) >= config.SLOW_CALL_MAX_SPANS:
+        root.attrs['dropped_spans'] = root.attrs.get('dropped_spans', 0) + 1
+        yield None
+        return
+    root.attrs['spans'] = root.attrs.get('spans', 0) + 1
+    child = Span(name, kind, attrs, root)
+    parent.children.append(child)
+    token = _current.set(child)
+    try:
+        yield child
+    except Exception as e:
+        child.error = repr(e)
+        raise
+    finally:
+        child.duration_ms = (time.perf_counter() - child.start) * 1000
+        _current.reset(token)
+
+
+def sleep(seconds, reason='retry'):
+    """time.sleep that shows up in the flight record"""
+    with span('sleep', kind='sleep', seconds=seconds, reason=reason):
+        time.sleep(seconds)
+
+
+def _finish(root):
+    root.duration_ms = (time.perf_counter() - root.start) * 1000
+    if root.duration_ms >= config.SLOW_CALL_THRESHOLD_MS:
+        record = root.to_dict()
+        record['finished_at'] = time.time()
+        with _lock:
+            _slow_calls.append(record)
+
+
+def traced(fn):
+    """Record a span tree for every call of an MCP tool (sync or async).
+    Calls slower than SLOW_CALL_THRESHOLD_MS are kept for get_slow_calls.
+    """
+    if inspect.iscoroutinefunction(fn):
+        @functools.wraps(fn)
+        async def wrapper(*args, **kwargs):
+            root = Span(fn.__name__, 'tool', {})
+            token = _current.set(root)
+            try:
+                return await fn(*args, **kwargs)
+            except Exception as e:
+                root.error = repr(e)
+                raise
+            finally:
+                _current.reset(token)
+                _finish(root)
+    else:
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            root = Span(fn.__name__, 'tool', {})
+            token = _current.set(root)
+            try:
+                return fn(*args, **kwargs)
+            except Exception as e:
+                root.error = repr(e)
+                raise
+            finally:
+                _current.reset(token)
+                _finish(root)
+    return wrapper
+
+
+def slow_calls(limit=20, tool=None):
+    """Recorded slow calls, slowest first"""
+    with _lock:
+        calls = [c for c in _slow_calls if tool is None or c['name'] == tool]
+    return sorted(calls, key=lambda c: c['duration_ms'], reverse=True)[:limit]
+
+
+def clear():
+    with _lock:
+        _slow_calls.clear()
+
+
+def install():
+    """Record an 'upstream' span for every requests.Session request made inside a traced call.
+    Wraps whatever Session.send is current, so install after traffic_recorder.install().
+    """
+    global _original_send
+    if _original_send is not None:
+        return
+    _original_send = requests.Session.send
+
+    def send(session, request, **kwargs):
+        if _current.get() is None:
+            return _original_send(session, request, **kwargs)
+        url = urlsplit(request.url)
+        with span(f"{request.method} {url.path}", kind='upstream', host=url.hostname) as s:
+            response = _original_send(session, request, **kwargs)
+            if s is not None:
+                s.attrs['status'] = response.status_code
+            return response
+
+    requests.Session.send = send
+
+
+def uninstall():
+    global _original_send
+    if _original_send is not None:
+        requests.Session.send = _original_send
+        _original_send = None
+
+
+def _frame_label(frame):
+    code = frame.f_code
+    return f"{code.co_filename.rsplit('/', 1)[-1]}:{code.co_name}"
+
+
+def profile(seconds, interval=0.005):
+    """Sample the stacks of all other threads for `seconds` and return collapsed stack counts
+    ('outer;inner' -> samples), the format flame graph tools read.
+    """
+    stacks = Counter()
+    own = threading.get_ident()
+    names = {t.ident: t.name for t in threading.enumerate()}
+    deadline = time.monotonic() + seconds
+    samples = 0
+    while time.monotonic() < deadline:
+        for ident, frame in sys._current_frames().items():
+            if ident == own:
+                continue
+            labels = []
+            while frame is not None:
+                labels.append(_frame_label(frame))
+                frame = frame.f_back
+            labels.append(names.get(ident, str(ident)))
+            stacks[';'.join(reversed(labels))] += 1
+        samples += 1
+        time.sleep(interval)
+    logging.info(f"Profiler took {samples} samples over {seconds}s")
+    return stacks, samples
+
+
+def bind(fn):
+    """Wrap fn to run in a copy of the caller's context, so spans from pool threads join this call"""
+    context = contextvars.copy_context()
+
+    def run(*args, **kwargs):
+        return context.copy().run(fn, *args, **kwargs)
+    return run
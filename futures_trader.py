@@ -0,0 +1,362 @@
+from binance.exceptions import BinanceAPIException
+import config
+import flight_recorder
+import logging
+import traffic_recorder
+import threading
+import time
+import math
+
+
+class FuturesTrader:
+    """USD-M futures trading on top of a BinanceTrader's client.
+
+    Leverage brackets, per-symbol leverage/margin type and exchange filters are
+    cached, so leverage or margin changes that would not change anything are
+    answered locally. Positions are kept current from the futures user data
+    stream once start_user_stream() has been called, and fetched over REST
+    otherwise.
+    """
+
+    def __init__(self, trader):
+        self.trader = trader
+        self.client = trader.client
+        self._lock = threading.Lock()
+        self._brackets = {}
+        self._symbol_config = {}
+        self._symbol_config_loaded = {}
+        self._positions = {}
+        self._orders = {}
+        self._filters = {}
+        self._filters_loaded = 0
+        self._stream = None
+        self._stream_ready = False
+        self._stream_lock = threading.Lock()
+
+    # --- Cached account configuration ---
+
+    def get_leverage_brackets(self, symbol):
+        """Notional brackets for a symbol, cached for FUTURES_CONFIG_TTL seconds"""
+        with self._lock:
+            cached = self._brackets.get(symbol)
+        if cached and time.time() - cached[0] < config.FUTURES_CONFIG_TTL:
+            return cached[1]
+        try:
+            response = self.client.futures_leverage_bracket(symbol=symbol)
+            # A single-symbol request still returns a list on some API versions
+            entry = response[0] if isinstance(response, list) else response
+            brackets = entry['brackets']
+            with self._lock:
+                self._brackets[symbol] = (time.time(), brackets)
+            return brackets
+        except BinanceAPIException as e:
+            logging.error(f"Binance API Error getting leverage brackets for {symbol}: {e}")
+            return None
+
+    def get_symbol_config(self, symbol, refresh=False):
+        """Current leverage and margin type for a symbol, re-read after FUTURES_CONFIG_TTL seconds
+        so changes made outside the server (and missed by the user stream) are picked up
+        """
+        with self._lock:
+            cached = self._symbol_config.get(symbol)
+            loaded = self._symbol_config_loaded.get(symbol, 0)
+        if cached and time.time() - loaded < config.FUTURES_CONFIG_TTL and not refresh:
+            return cached
+        try:
+            response = self.client.futures_symbol_config(symbol=symbol)
+            entry = response[0] if isinstance(response, list) else response
+            state = {'leverage': int(entry['leverage']), 'marginType': entry['marginType'].upper()}
+            with self._lock:
+                self._symbol_config[symbol] = state
+                self._symbol_config_loaded[symbol] = time.time()
+            return state
+        except BinanceAPIException as e:
+            logging.error(f"Binance API Error getting symbol config for {symbol}: {e}")
+            return None
+
+    def change_leverage(self, symbol, leverage):
+        """Set leverage for a symbol, skipping the request if it is already set"""
+        try:
+            brackets = self.get_leverage_brackets(symbol)
+            if brackets:
+                max_leverage = max(int(b['initialLeverage']) for b in brackets)
+                if not 1 <= leverage <= max_leverage:
+                    logging.error(f"Leverage {leverage}x is outside 1-{max_leverage}x for {symbol}")
+                    return None
+
+            current = self.get_symbol_config(symbol)
+            if current and current['leverage'] == leverage:
+                logging.info(f"Leverage for {symbol} already {leverage}x; skipping request")
+                return {'symbol': symbol, 'leverage': leverage, 'unchanged': True}
+
+            response = self.client.futures_change_leverage(symbol=symbol, leverage=leverage)
+            with self._lock:
+                self._symbol_config.setdefault(symbol, {'marginType': None})['leverage'] = int(response['leverage'])
+            logging.info(f"Leverage changed for {symbol}: {response}")
+            return response
+        except BinanceAPIException as e:
+            logging.error(f"Binance API Error changing leverage: {e}")
+            return None
+        except Exception as e:
+            logging.error(f"Unexpected error changing leverage: {e}")
+            return None
+
+    def change_margin_type(self, symbol, margin_type):
+        """Set margin type ('ISOLATED' or 'CROSSED'), skipping the request if it is already set"""
+        margin_type = 'CROSSED' if margin_type.upper() in ('CROSS', 'CROSSED') else margin_type.upper()
+        if margin_type not in ('ISOLATED', 'CROSSED'):
+            logging.error(f"Invalid margin type: {margin_type}")
+            return None
+        try:
+            current = self.get_symbol_config(symbol)
+            if current and current['marginType'] == margin_type:
+                logging.info(f"Margin type for {symbol} already {margin_type}; skipping request")
+                return {'symbol': symbol, 'marginType': margin_type, 'unchanged': True}
+
+            response = self.client.futures_change_margin_type(symbol=symbol, marginType=margin_type)
+            with self._lock:
+                self._symbol_config.setdefault(symbol, {'leverage': None})['marginType'] = margin_type
+            logging.info(f"Margin type changed for {symbol}: {response}")
+            return response
+        except BinanceAPIException as e:
+            logging.error(f"Binance API Error changing margin type: {e}")
+            return None
+        except Exception as e:
+            logging.error(f"Unexpected error changing margin type: {e}")
+            return None
+
+    # --- Positions and the user data stream ---
+
+    def start_user_stream(self):
+        """Subscribe to the futures user data stream to keep positions and symbol config current"""
+        with self._stream_lock:
+            if self._stream:
+                return True
+            if traffic_recorder.replaying():
+                logging.info("Replaying upstream traffic; futures positions are read over REST")
+                return False
+            try:
+                from binance import ThreadedWebsocketManager
+                self._stream = ThreadedWebsocketManager(self.client.API_KEY, self.client.API_SECRET)
+                self._stream.start()
+                self._stream.start_futures_user_socket(callback=self._handle_user_event)
+                # Seed the cache over REST; the stream then applies deltas
+                self._refresh_positions()
+                self._stream_ready = True
+                logging.info("Futures user data stream started")
+                return True
+            except Exception as e:
+                logging.error(f"Could not start futures user data stream: {e}")
+                self._stream = None
+                return False
+
+    def stop_user_stream(self):
+        if self._stream:
+            self._stream.stop()
+        self._stream = None
+        self._stream_ready = False
+
+    def _handle_user_event(self, msg):
+        event = msg.get('e')
+        with self._lock:
+            if event == 'ACCOUNT_UPDATE':
+                for p in msg['a'].get('P', []):
+                    position = {
+                        'symbol': p['s'],
+                        'positionSide': p.get('ps', 'BOTH'),
+                        'positionAmt': float(p['pa']),
+                        'entryPrice': float(p['ep']),
+                        'unRealizedProfit': float(p['up']),
+                        'marginType': 'ISOLATED' if p.get('mt') == 'isolated' else 'CROSSED',
+                        'updateTime': msg.get('E'),
+                    }
+                    self._positions[(position['symbol'], position['positionSide'])] = position
+                    if position['symbol'] in self._symbol_config:
+                        self._symbol_config[position['symbol']]['marginType'] = position['marginType']
+            elif event == 'ACCOUNT_CONFIG_UPDATE' and 'ac' in msg:
+                symbol = msg['ac']['s']
+                self._symbol_config.setdefault(symbol, {'marginType': None})['leverage'] = int(msg['ac']['l'])
+            elif event == 'ORDER_TRADE_UPDATE':
+                order = msg['o']
+                self._orders[order['i']] = {
+                    'symbol': order['s'],
+                    'orderId': order['i'],
+                    'side': order['S'],
+                    'type': order['o'],
+                    'status': order['X'],
+                    'executedQty': order['z'],
+                    'avgPrice': order['ap'],
+                    'updateTime': msg.get('E'),
+                }
+            elif event == 'listenKeyExpired':
+                logging.warning("Futures listen key expired; positions fall back to REST until the stream restarts")
+                self._stream_ready = False
+                # Detach the stream so the next start_user_stream() opens a new one with a fresh listen key.
+                # This runs on the stream's own thread, so it is stopped from another one.
+                stream, self._stream = self._stream, None
+                if stream:
+                    threading.Thread(target=stream.stop, daemon=True).start()
+
+    def _refresh_positions(self, symbol=None):
+        params = {'symbol': symbol} if symbol else {}
+        positions = self.client.futures_position_information(**params)
+        with self._lock:
+            for p in positions:
+                self._positions[(p['symbol'], p.get('positionSide', 'BOTH'))] = {
+                    'symbol': p['symbol'],
+                    'positionSide': p.get('positionSide', 'BOTH'),
+                    'positionAmt': float(p['positionAmt']),
+                    'entryPrice': float(p['entryPrice']),
+                    'unRealizedProfit': float(p['unRealizedProfit']),
+                    'updateTime': p.get('updateTime'),
+                }
+
+    def get_positions(self, symbol=None, include_flat=False):
+        """Open positions from the stream-fed cache, or over REST when no stream is running"""
+        try:
+            if not self._stream_ready:
+                self._refresh_positions(symbol)
+            with self._lock:
+                positions = [dict(p) for p in self._positions.values()
+                             if (symbol is None or p['symbol'] == symbol)
+                             and (include_flat or p['positionAmt'] != 0)]
+            return positions
+        except BinanceAPIException as e:
+            logging.error(f"Binance API Error getting futures positions: {e}")
+            return None
+        except Exception as e:
+            logging.error(f"Unexpected error getting futures positions: {e}")
+            return None
+
+    def get_order(self, order_id):
+        """Latest state of a futures order seen on the user stream"""
+        with self._lock:
+            order = self._orders.get(order_id)
+            return dict(order) if order else None
+
+    # --- Orders ---
+
+    def get_symbol_filters(self, symbol):
+        """Futures exchange filters for a symbol, from a cached exchangeInfo"""
+        if time.time() - self._filters_loaded >= config.FUTURES_CONFIG_TTL:
+            info = self.client.futures_exchange_info()
+            with self._lock:
+                self._filters = {s['symbol']: {f['filterType']: f for f in s['filters']} for s in info['symbols']}
+                self._filters_loaded = time.time()
+        return self._filters.get(symbol)
+
+    def _format_quantity(self, symbol, quantity, order_type):
+        """Format a quantity to the symbol's step size and check min/max (MARKET_LOT_SIZE for market orders)"""
+        filters = self.get_symbol_filters(symbol)
+        if not filters:
+            logging.error(f"No futures symbol info for {symbol}")
+            return None
+        lot = filters.get('MARKET_LOT_SIZE') if order_type == 'MARKET' else None
+        lot = lot or filters.get('LOT_SIZE')
+        step_size = float(lot['stepSize'])
+        min_qty = float(lot['minQty'])
+        max_qty = float(lot['maxQty'])
+
+        precision = int(round(-math.log(step_size, 10), 0))
+        formatted_qty = math.floor(quantity * 10**precision) / 10**precision
+        if formatted_qty < min_qty:
+            logging.error(f"Quantity {formatted_qty} is below minimum {min_qty}")
+            return None
+        if formatted_qty > max_qty:
+            logging.error(f"Quantity {formatted_qty} is above maximum {max_qty}")
+            return None
+        return str(formatted_qty)
+
+    def _format_price(self, symbol, price):
+        """Check a limit price against the symbol's PRICE_FILTER (tick size, min/max price)"""
+        price_filter = self.get_symbol_filters(symbol).get('PRICE_FILTER')
+        if not price_filter:
+            return str(price)
+        tick_size = float(price_filter['tickSize'])
+        min_price = float(price_filter['minPrice'])
+        max_price = float(price_filter['maxPrice'])
+        # Binance disables a bound (or the tick check) by setting it to 0
+        if min_price and price < min_price:
+            logging.error(f"Price {price} is below minimum {min_price}")
+            return None
+        if max_price and price > max_price:
+            logging.error(f"Price {price} is above maximum {max_price}")
+            return None
+        if not tick_size:
+            return str(price)
+        ticks = price / tick_size
+        if abs(ticks - round(ticks)) > 1e-6:
+            logging.error(f"Price {price} is not a multiple of tick size {tick_size}")
+            return None
+        precision = max(0, int(round(-math.log(tick_size, 10), 0)))
+        return f"{round(ticks) * tick_size:.{precision}f}"
+
+    def place_order(self, symbol, side, quantity, order_type='MARKET', price=None, reduce_only=False):
+        """Place a futures order after the same local checks as spot: step size, min/max quantity,
+        minimum notional, plus the tick size of limit prices and the notional cap of the current
+        leverage bracket.
+        """
+        max_retries = 3
+        retry_count = 0
+
+        try:
+            formatted_qty = self._format_quantity(symbol, quantity, order_type)
+            if not formatted_qty:
+                return None
+            formatted_price = self._format_price(symbol, float(price)) if order_type == 'LIMIT' else None
+            if order_type == 'LIMIT' and not formatted_price:
+                return None
+
+            reference_price = float(price) if price else float(self.client.futures_mark_price(symbol=symbol)['markPrice'])
+            notional = float(formatted_qty) * reference_price
+            filters = self.get_symbol_filters(symbol)
+            min_notional = float(filters.get('MIN_NOTIONAL', {}).get('notional', config.MIN_ORDER_VALUE))
+            if notional < min_notional and not reduce_only:
+                logging.error(f"Order value {notional:.2f} USDT is below minimum required {min_notional} USDT")
+                return None
+
+            symbol_config = self.get_symbol_config(symbol)
+            brackets = self.get_leverage_brackets(symbol)
+            if symbol_config and brackets:
+                allowed = [b for b in brackets if int(b['initialLeverage']) >= symbol_config['leverage']]
+                cap = max(float(b['notionalCap']) for b in allowed) if allowed else 0
+                if notional > cap:
+                    logging.error(f"Order value {notional:.2f} USDT exceeds the {cap} USDT cap at {symbol_config['leverage']}x")
+                    return None
+        except Exception as e:
+            logging.error(f"Unexpected error validating futures order: {e}")
+            return None
+
+        params = {
+            'symbol': symbol,
+            'side': side,
+            'type': order_type,
+            'quantity': formatted_qty,
+            'newOrderRespType': 'RESULT',
+            'recvWindow': self.trader.recv_window,
+        }
+        if order_type == 'LIMIT':
+            params['price'] = formatted_price
+            params['timeInForce'] = 'GTC'
+        if reduce_only:
+            params['reduceOnly'] = 'true'
+
+        logging.info(f"Attempting futures {side} {formatted_qty} {symbol} ({order_type}) at ~{reference_price}")
+        while retry_count < max_retries:
+            try:
+                if retry_count > 0:
+                    self.trader._force_time_sync()
+                order = self.client.futures_create_order(**params)
+                logging.info(f"Futures order placed: {order}")
+                return order
+            except BinanceAPIException as e:
+                retry_count += 1
+                # Only clock/timestamp errors are worth retrying; everything else is a rejection
+                if e.code != -1021 or retry_count >= max_retries:
+                    logging.error(f"Error placing futures order: {e}")
+                    return None
+                flight_recorder.sleep(1)
+            except Exception as e:
+                logging.error(f"Unexpected error placing futures order: {e}")
+                return None
+        return None
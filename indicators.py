@@ -0,0 +1,222 @@
+import numpy as np
+import pandas as pd
+
+# name -> Indicator; filled by the @register decorator below
+REGISTRY = {}
+
+
+class Indicator:
+    """A registered indicator or shared intermediate.
+
+    fn(engine, *params) returns a Series (or a dict of Series) and asks the
+    engine for anything it depends on, so requesting several indicators only
+    computes each shared intermediate (EMAs, true range, rolling std...) once.
+    """
+
+    def __init__(self, name, fn, inputs, defaults, windows, label, decimals, public, description):
+        self.name = name
+        self.fn = fn
+        self.inputs = inputs
+        self.defaults = defaults
+        self.windows = windows
+        self.label = label
+        self.decimals = decimals
+        self.public = public
+        self.description = description
+
+
+def register(name, inputs=('close',), defaults=(), windows=None, label=None, decimals=2, public=True):
+    """Register fn as indicator `name`. label(params) builds the result key.
+    windows lists the positions of parameters that are candle counts (default: all of them).
+    """
+    def decorator(fn):
+        REGISTRY[name] = Indicator(name, fn, inputs, tuple(defaults),
+                                   range(len(defaults)) if windows is None else windows,
+                                   label or (lambda p: name.upper()), decimals, public, (fn.__doc__ or '').strip())
+        return fn
+    return decorator
+
+
+def parse_spec(spec):
+    """Parse 'name' or 'name:p1,p2' into (name, params), filling in defaults.
+    Window parameters must be positive integers (0 only where it is the default, e.g. vwap);
+    other parameters positive numbers.
+    """
+    name, _, raw = spec.strip().lower().partition(':')
+    indicator = REGISTRY.get(name)
+    if not indicator or not indicator.public:
+        raise ValueError(f"Unknown indicator '{name}'. Available: {', '.join(available())}")
+    raw_params = [p.strip() for p in raw.split(',') if p.strip()]
+    if len(raw_params) > len(indicator.defaults):
+        raise ValueError(f"Indicator '{name}' takes at most {len(indicator.defaults)} parameter(s)")
+    params = []
+    for i, p in enumerate(raw_params):
+        try:
+            value = int(p) if i in indicator.windows or '.' not in p else float(p)
+        except ValueError:
+            kind = 'an integer window' if i in indicator.windows else 'a number'
+            raise ValueError(f"Parameter {i + 1} of '{name}' must be {kind}, got '{p}'") from None
+        if value < 0 or (value == 0 and indicator.defaults[i] != 0):
+            raise ValueError(f"Parameter {i + 1} of '{name}' must be positive, got '{p}'")
+        params.append(value)
+    return name, tuple(params) + indicator.defaults[len(params):]
+
+
+def available():
+    """Public indicator specs with their default parameters"""
+    return [
+        f"{name}:{','.join(str(p) for p in ind.defaults)}" if ind.defaults else name
+        for name, ind in REGISTRY.items() if ind.public
+    ]
+
+
+class IndicatorEngine:
+    """Resolves indicators over one OHLCV DataFrame, memoizing every node it computes"""
+
+    def __init__(self, df):
+        self.df = df
+        self._cache = {}
+        self.computed = []
+
+    def get(self, name, *params):
+        key = (name, params)
+        if key not in self._cache:
+            indicator = REGISTRY[name]
+            missing = [c for c in indicator.inputs if c not in self.df.columns]
+            if missing:
+                raise ValueError(f"Indicator '{name}' needs columns {missing}")
+            self._cache[key] = indicator.fn(self, *params)
+            self.computed.append(key)
+        return self._cache[key]
+
+    def latest(self, spec):
+        """Compute a spec and return (label, latest values rounded for display)"""
+        name, params = parse_spec(spec)
+        indicator = REGISTRY[name]
+        value = self.get(name, *params)
+        label = indicator.label(params)
+        if isinstance(value, dict):
+            return label, {k: _round(v.iloc[-1], indicator.decimals) for k, v in value.items()}
+        return label, _round(value.iloc[-1], indicator.decimals)
+
+
+def _round(value, decimals):
+    if value is None or np.isnan(value):
+        return "Not enough data"
+    return round(float(value), decimals)
+
+
+# --- Shared intermediates ---
+
+@register('delta', public=False)
+def delta(engine):
+    return engine.df['close'].diff()
+
+
+@register('std', defaults=(20,), public=False)
+def std(engine, window):
+    return engine.df['close'].rolling(window=window).std()
+
+
+@register('tr', inputs=('high', 'low', 'close'), public=False)
+def true_range(engine):
+    df = engine.df
+    prev_close = df['close'].shift(1)
+    return pd.concat([df['high'] - df['low'],
+                      (df['high'] - prev_close).abs(),
+                      (df['low'] - prev_close).abs()], axis=1).max(axis=1)
+
+
+@register('dm', inputs=('high', 'low'), public=False)
+def directional_movement(engine):
+    up = engine.df['high'].diff()
+    down = -engine.df['low'].diff()
+    return {
+        'plus': up.where((up > down) & (up > 0), 0.0),
+        'minus': down.where((down > up) & (down > 0), 0.0),
+    }
+
+
+@register('typical_price', inputs=('high', 'low', 'close'), public=False)
+def typical_price(engine):
+    df = engine.df
+    return (df['high'] + df['low'] + df['close']) / 3
+
+
+# --- Public indicators ---
+
+@register('ema', defaults=(50,), label=lambda p: f"EMA_{p[0]}")
+def ema(engine, span):
+    """Exponential moving average of close"""
+    return engine.df['close'].ewm(span=span, adjust=False).mean()
+
+
+@register('sma', defaults=(200,), label=lambda p: f"SMA_{p[0]}")
+def sma(engine, window):
+    """Simple moving average of close"""
+    return engine.df['close'].rolling(window=window).mean()
+
+
+@register('rsi', defaults=(14,), label=lambda p: f"RSI_{p[0]}")
+def rsi(engine, period):
+    """Relative Strength Index (simple moving average of gains/losses)"""
+    change = engine.get('delta')
+    gain = change.where(change > 0, 0).rolling(window=period).mean()
+    loss = (-change.where(change < 0, 0)).rolling(window=period).mean()
+    return 100 - (100 / (1 + gain / loss))
+
+
+@register('macd', defaults=(12, 26, 9), decimals=4,
+          label=lambda p: "MACD" if p == (12, 26, 9) else f"MACD_{p[0]}_{p[1]}_{p[2]}")
+def macd(engine, fast, slow, signal):
+    """MACD line, signal line and histogram"""
+    line = engine.get('ema', fast) - engine.get('ema', slow)
+    signal_line = line.ewm(span=signal, adjust=False).mean()
+    return {'macd': line, 'signal': signal_line, 'hist': line - signal_line}
+
+
+@register('bbands', defaults=(20, 2), windows=(0,),
+          label=lambda p: "Bollinger_Bands" if p == (20, 2) else f"Bollinger_Bands_{p[0]}_{p[1]}")
+def bollinger_bands(engine, window, width):
+    """Bollinger Bands around the SMA of close"""
+    middle = engine.get('sma', window)
+    band = engine.get('std', window) * width
+    return {'upper': middle + band, f'middle_sma{window}': middle, 'lower': middle - band}
+
+
+@register('atr', inputs=('high', 'low', 'close'), defaults=(14,), label=lambda p: f"ATR_{p[0]}")
+def atr(engine, period):
+    """Average True Range (Wilder smoothing)"""
+    return engine.get('tr').ewm(alpha=1 / period, adjust=False).mean()
+
+
+@register('adx', inputs=('high', 'low', 'close'), defaults=(14,), label=lambda p: f"ADX_{p[0]}")
+def adx(engine, period):
+    """Average Directional Index with +DI/-DI (Wilder smoothing)"""
+    dm = engine.get('dm')
+    average_range = engine.get('atr', period)
+    plus_di = 100 * dm['plus'].ewm(alpha=1 / period, adjust=False).mean() / average_range
+    minus_di = 100 * dm['minus'].ewm(alpha=1 / period, adjust=False).mean() / average_range
+    dx = 100 * (plus_di - minus_di).abs() / (plus_di + minus_di)
+    return {'adx': dx.ewm(alpha=1 / period, adjust=False).mean(), 'plus_di': plus_di, 'minus_di': minus_di}
+
+
+@register('vwap', inputs=('high', 'low', 'close', 'volume'), defaults=(0,),
+          label=lambda p: "VWAP" if p[0] == 0 else f"VWAP_{p[0]}")
+def vwap(engine, window):
+    """Volume-weighted average price over the loaded candles (or a rolling window of N candles)"""
+    weighted = engine.get('typical_price') * engine.df['volume']
+    if window:
+        return weighted.rolling(window=window).sum() / engine.df['volume'].rolling(window=window).sum()
+    return weighted.cumsum() / engine.df['volume'].cumsum()
+
+
+@register('stoch', inputs=('high', 'low', 'close'), defaults=(14, 3, 3),
+          label=lambda p: "Stochastic" if p == (14, 3, 3) else f"Stochastic_{p[0]}_{p[1]}_{p[2]}")
+def stochastic(engine, period, smooth_k, smooth_d):
+    """Slow stochastic oscillator %K/%D"""
+    df = engine.df
+    lowest = df['low'].rolling(window=period).min()
+    highest = df['high'].rolling(window=period).max()
+    k = (100 * (df['close'] - lowest) / (highest - lowest)).rolling(window=smooth_k).mean()
+    return {'k': k, 'd': k.rolling(window=smooth_d).mean()}
@@ -0,0 +1,245 @@
+import threading
+import time
+import logging
+from collections import OrderedDict
+
+import numpy as np
+
+import config
+
+MINUTE_MS = 60_000
+
+# Intervals that can be derived from 1m candles, in milliseconds.
+# 3d and 1M candles are not derived: their boundaries don't follow a fixed UTC grid we can rely on.
+INTERVAL_MS = {
+    '1m': MINUTE_MS,
+    '3m': 3 * MINUTE_MS,
+    '5m': 5 * MINUTE_MS,
+    '15m': 15 * MINUTE_MS,
+    '30m': 30 * MINUTE_MS,
+    '1h': 60 * MINUTE_MS,
+    '2h': 120 * MINUTE_MS,
+    '4h': 240 * MINUTE_MS,
+    '6h': 360 * MINUTE_MS,
+    '8h': 480 * MINUTE_MS,
+    '12h': 720 * MINUTE_MS,
+    '1d': 1440 * MINUTE_MS,
+    '1w': 10080 * MINUTE_MS,
+}
+
+# Candle grids start at the Unix epoch (UTC), except weekly candles which open on Monday
+# (1970-01-01 was a Thursday, so the first Monday is 4 days later)
+INTERVAL_OFFSET_MS = {'1w': 4 * 1440 * MINUTE_MS}
+
+# Column layout of the numeric kline arrays (Binance kline order, without the trailing 'ignore')
+OPEN_TIME, OPEN, HIGH, LOW, CLOSE, VOLUME, CLOSE_TIME, QUOTE_VOLUME, TRADES, TAKER_BASE, TAKER_QUOTE = range(11)
+
+
+def klines_to_numeric(klines):
+    """Convert raw Binance klines to an (N, 11) float64 array"""
+    return np.array([k[:11] for k in klines], dtype=np.float64).reshape(-1, 11)
+
+
+def numeric_to_klines(rows):
+    """Convert an (N, 11) array back to Binance-style kline lists"""
+    return [
+        [int(r[0]), r[1], r[2], r[3], r[4], r[5], int(r[6]), r[7], int(r[8]), r[9], r[10], "0"]
+        for r in rows.tolist()
+    ]
+
+
+def bucket_open_times(open_times, interval_ms, offset_ms=0):
+    """Open time of the candle of the given interval containing each 1m open time"""
+    return (open_times - offset_ms) // interval_ms * interval_ms + offset_ms
+
+
+def aggregate(base, interval_ms, offset_ms=0):
+    """Aggregate consecutive 1m rows into candles of interval_ms, aligned to the UTC grid"""
+    if len(base) == 0:
+        return np.empty((0, 11), dtype=np.float64)
+    buckets = bucket_open_times(base[:, OPEN_TIME], interval_ms, offset_ms)
+    starts = np.flatnonzero(np.r_[True, buckets[1:] != buckets[:-1]])
+    ends = np.r_[starts[1:], len(base)] - 1
+
+    out = np.empty((len(starts), 11), dtype=np.float64)
+    out[:, OPEN_TIME] = buckets[starts]
+    out[:, OPEN] = base[starts, OPEN]
+    out[:, HIGH] = np.maximum.reduceat(base[:, HIGH], starts)
+    out[:, LOW] = np.minimum.reduceat(base[:, LOW], starts)
+    out[:, CLOSE] = base[ends, CLOSE]
+    out[:, CLOSE_TIME] = buckets[starts] + interval_ms - 1
+    for column in (VOLUME, QUOTE_VOLUME, TRADES, TAKER_BASE, TAKER_QUOTE):
+        out[:, column] = np.add.reduceat(base[:, column], starts)
+    return out
+
+
+class KlineResampler:
+    """Keeps one 1m base series per symbol and derives higher intervals from it.
+
+    Derived series are cached per (symbol, interval). When new 1m candles
+    arrive, through refresh() or pushed in with ingest() by a stream, only the
+    last (partial) candle of each derived series is rebuilt and any new
+    candles are appended. REST refreshes still run every refresh_seconds
+    while a stream is feeding the series, so missed candles are backfilled.
+
+    Upstream fetches hold only a per-symbol lock, so different symbols load
+    concurrently; the shared lock only guards the in-memory series. At most
+    max_symbols base series are kept, least recently used evicted first.
+    """
+
+    def __init__(self, trader, max_base_candles=config.RESAMPLE_BASE_MAX_CANDLES,
+                 refresh_seconds=config.RESAMPLE_REFRESH_SECONDS, max_symbols=config.RESAMPLE_MAX_SYMBOLS):
+        self.trader = trader
+        self.max_base_candles = max_base_candles
+        self.refresh_seconds = refresh_seconds
+        self.max_symbols = max_symbols
+        self._base = OrderedDict()
+        self._derived = {}
+        self._lock = threading.RLock()
+        self._symbol_locks = {}
+
+    def can_derive(self, interval, limit):
+        interval_ms = INTERVAL_MS.get(interval)
+        if not interval_ms:
+            return False
+        # One extra candle's worth of 1m data so the oldest requested candle is complete
+        return (limit + 1) * (interval_ms // MINUTE_MS) <= self.max_base_candles
+
+    def get_klines(self, symbol, interval, limit):
+        """Return the latest `limit` klines for interval, or None if it can't be derived locally"""
+        if not self.can_derive(interval, limit):
+            return None
+        factor = INTERVAL_MS[interval] // MINUTE_MS
+        with self._symbol_lock(symbol):
+            if not self._ensure_base(symbol, (limit + 1) * factor):
+                return None
+        with self._lock:
+            if symbol not in self._base:
+                return None  # Evicted by other symbols in the meantime
+            self._base.move_to_end(symbol)
+            rows = self._derived_rows(symbol, interval)
+            return numeric_to_klines(rows[-limit:])
+
+    def ingest(self, symbol, klines):
+        """Merge streamed 1m klines (oldest first) into a symbol's existing base series.
+
+        Symbols without a base series are ignored; it is loaded on first read.
+        Klines that don't continue the series (e.g. after a stream reconnect)
+        are dropped and the base is marked stale, so the next read backfills
+        the gap over REST. Stream updates don't count as a refresh.
+        """
+        if not klines:
+            return
+        new = klines_to_numeric(klines)
+        with self._lock:
+            state = self._base.get(symbol)
+            if state is None:
+                return
+            if new[0, OPEN_TIME] > state['data'][-1, OPEN_TIME] + MINUTE_MS:
+                logging.info(f"Gap in streamed 1m candles for {symbol}; backfilling on next read")
+                state['refreshed'] = float('-inf')
+                return
+            self._merge(symbol, state, new)
+
+    def refresh(self, symbol):
+        """Fetch 1m candles since the last one held, including the still-open candle.
+        A series idle for longer than the base window is reloaded instead of paged forward.
+        """
+        with self._lock:
+            state = self._base.get(symbol)
+            if state is None:
+                return False
+            last_open = int(state['data'][-1, OPEN_TIME])
+            requested = state['requested']
+        if time.time() * 1000 - last_open > self.max_base_candles * MINUTE_MS:
+            klines = self.trader.get_market_history(symbol, '1m', requested)
+            if not klines:
+                return False
+            with self._lock:
+                self._store_base(symbol, {'data': klines_to_numeric(klines), 'requested': requested,
+                                          'refreshed': time.monotonic()})
+            return True
+        while True:
+            page = self.trader.get_market_data(symbol, '1m', 1000, start_time=last_open)
+            if not page:
+                return False
+            with self._lock:
+                state = self._base.get(symbol)
+                if state is None:
+                    return False
+                self._merge(symbol, state, klines_to_numeric(page))
+                if len(page) < 1000:
+                    state['refreshed'] = time.monotonic()
+                    return True
+            last_open = page[-1][0]
+
+    def _merge(self, symbol, state, new):
+        """Merge 1m rows into a base series and update its derived series; called with the shared lock held"""
+        self._base.move_to_end(symbol)
+        base = state['data']
+        # Rows at or after the first incoming open time are replaced (the last 1m candle may be partial)
+        keep = np.searchsorted(base[:, OPEN_TIME], new[0, OPEN_TIME])
+        base = np.concatenate([base[:keep], new])[-self.max_base_candles:]
+        state['data'] = base
+
+        for (derived_symbol, interval), rows in list(self._derived.items()):
+            if derived_symbol == symbol:
+                self._derived[(symbol, interval)] = self._update_tail(rows, base, interval)
+
+    def _symbol_lock(self, symbol):
+        with self._lock:
+            return self._symbol_locks.setdefault(symbol, threading.Lock())
+
+    def _store_base(self, symbol, state):
+        """Replace a symbol's base series, dropping its derived series and evicting the least recently used symbols"""
+        self._base[symbol] = state
+        self._base.move_to_end(symbol)
+        evicted = []
+        while len(self._base) > self.max_symbols:
+            evicted.append(self._base.popitem(last=False)[0])
+        # A deeper history invalidates derived series built from the shorter one
+        stale = {symbol, *evicted}
+        for key in [k for k in self._derived if k[0] in stale]:
+            del self._derived[key]
+
+    def _ensure_base(self, symbol, needed):
+        """Load or refresh a symbol's base series; called with the symbol lock held, fetches without the shared lock"""
+        with self._lock:
+            state = self._base.get(symbol)
+        if state is None or state['requested'] < needed:
+            klines = self.trader.get_market_history(symbol, '1m', max(needed, state['requested'] if state else 0))
+            if not klines:
+                return False
+            with self._lock:
+                self._store_base(symbol, {'data': klines_to_numeric(klines), 'requested': needed,
+                                          'refreshed': time.monotonic()})
+            return True
+        if time.monotonic() - state['refreshed'] >= self.refresh_seconds:
+            if not self.refresh(symbol):
+                logging.warning(f"Could not refresh 1m base series for {symbol}; serving cached candles")
+        return True
+
+    def _derived_rows(self, symbol, interval):
+        key = (symbol, interval)
+        rows = self._derived.get(key)
+        if rows is None:
+            base = self._base[symbol]['data']
+            interval_ms = INTERVAL_MS[interval]
+            offset_ms = INTERVAL_OFFSET_MS.get(interval, 0)
+            # Skip 1m rows before the first full candle boundary so no derived candle is truncated
+            first_bucket = bucket_open_times(base[0, OPEN_TIME], interval_ms, offset_ms)
+            start = 0 if first_bucket == base[0, OPEN_TIME] else np.searchsorted(base[:, OPEN_TIME], first_bucket + interval_ms)
+            rows = aggregate(base[start:], interval_ms, offset_ms)
+            self._derived[key] = rows
+        return rows
+
+    def _update_tail(self, rows, base, interval):
+        """Rebuild the last derived candle and append new ones from the 1m base"""
+        if len(rows) == 0:
+            return rows
+        interval_ms = INTERVAL_MS[interval]
+        last_open = rows[-1, OPEN_TIME]
+        start = np.searchsorted(base[:, OPEN_TIME], last_open)
+        tail = aggregate(base[start:], interval_ms, INTERVAL_OFFSET_MS.get(interval, 0))
+        max_rows = self.max_base_candles // (interval_ms // MINUTE_MS) + 1
+        return np.concatenate([rows[:-1], tail])[-max_rows:]
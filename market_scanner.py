@@ -0,0 +1,77 @@
+import numpy as np
+
+# Ranking keys accepted by scan()
+SORT_KEYS = ('quote_volume', 'change_pct', 'abs_change_pct', 'spread_bps', 'volatility_pct', 'trades')
+
+
+def ticker_arrays(tickers):
+    """Load a bulk 24hr ticker response into column arrays"""
+    def column(name):
+        return np.array([t[name] for t in tickers], dtype=np.float64)
+
+    last = column('lastPrice')
+    bid = column('bidPrice')
+    ask = column('askPrice')
+    high = column('highPrice')
+    low = column('lowPrice')
+    mid = (bid + ask) / 2
+    with np.errstate(divide='ignore', invalid='ignore'):
+        spread_bps = np.where(mid > 0, (ask - bid) / mid * 10000, np.inf)
+        volatility_pct = np.where(last > 0, (high - low) / last * 100, 0.0)
+    change_pct = column('priceChangePercent')
+    return {
+        'symbol': np.array([t['symbol'] for t in tickers]),
+        'last': last,
+        'change_pct': change_pct,
+        'abs_change_pct': np.abs(change_pct),
+        'quote_volume': column('quoteVolume'),
+        'spread_bps': spread_bps,
+        'volatility_pct': volatility_pct,
+        'trades': column('count'),
+    }
+
+
+def scan(tickers, quote_asset='USDT', sort_by='quote_volume', top_n=20, ascending=False,
+         min_quote_volume=0.0, max_spread_bps=0.0, min_abs_change_pct=0.0):
+    """Filter and rank all symbols of a bulk 24hr ticker response.
+    Returns up to top_n rows as dicts, best first.
+    """
+    if sort_by not in SORT_KEYS:
+        raise ValueError(f"sort_by must be one of {', '.join(SORT_KEYS)}")
+    columns = ticker_arrays(tickers)
+
+    # Pairs with no trades in 24h are halted or delisted
+    mask = (columns['last'] > 0) & (columns['trades'] > 0)
+    if quote_asset:
+        mask &= np.char.endswith(columns['symbol'], quote_asset)
+    if min_quote_volume:
+        mask &= columns['quote_volume'] >= min_quote_volume
+    if max_spread_bps:
+        mask &= columns['spread_bps'] <= max_spread_bps
+    if min_abs_change_pct:
+        mask &= columns['abs_change_pct'] >= min_abs_change_pct
+
+    candidates = np.flatnonzero(mask)
+    keys = columns[sort_by][candidates]
+    if not ascending:
+        keys = -keys
+    # Partial sort: only the top_n candidates need ordering
+    if 0 < top_n < len(candidates):
+        head = np.argpartition(keys, top_n - 1)[:top_n]
+        order = head[np.argsort(keys[head], kind='stable')]
+    else:
+        order = np.argsort(keys, kind='stable')
+    selected = candidates[order]
+
+    return [
+        {
+            'symbol': str(columns['symbol'][i]),
+            'last': float(columns['last'][i]),
+            'change_pct': float(columns['change_pct'][i]),
+            'quote_volume': round(float(columns['quote_volume'][i]), 2),
+            'spread_bps': round(float(columns['spread_bps'][i]), 3),
+            'volatility_pct': round(float(columns['volatility_pct'][i]), 3),
+            'trades': int(columns['trades'][i]),
+        }
+        for i in selected
+    ]
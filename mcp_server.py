@@ -1,14 +1,40 @@
-from mcp.server.fastmcp import FastMCP
+from mcp.server.fastmcp import FastMCP, Context
 from binance_client import BinanceTrader
 from base_client import BaseClient
+from request_coalescer import RequestCoalescer
+from account_registry import AccountRegistry
+from order_tracker import OrderTracker
+from trade_journal import TradeJournal
+from agg_trades import AggTradeStore
+import agg_trades
+from downsampling import klines_to_array, downsample
+from kline_resampler import KlineResampler, INTERVAL_MS
+from indicators import IndicatorEngine
+from condition_watcher import ConditionWatcher
+import strategy_optimizer
+import market_scanner
+import portfolio_analytics as analytics
+import traffic_recorder
+import flight_recorder
+import config
+import asyncio
 import logging
+from concurrent.futures import ThreadPoolExecutor
 import os
+import time
 import pandas as pd
-import numpy as np
 
 # Initialize the MCP Server
 mcp = FastMCP("CryptoTradingBot")
 
+# Record or replay upstream HTTP traffic before any client opens a connection
+if config.UPSTREAM_TRAFFIC_MODE:
+    traffic_recorder.install(config.UPSTREAM_TRAFFIC_MODE, config.UPSTREAM_CASSETTE,
+                             latency=config.UPSTREAM_REPLAY_LATENCY)
+
+# Per-call span trees for slow tool calls (see flight_recorder.py); wraps the recorder above if any
+flight_recorder.install()
+
 # Initialize Binance Client
 try:
     trader = BinanceTrader()
@@ -23,23 +49,66 @@ except Exception as e:
     logging.error(f"Failed to initialize BaseClient: {e}")
     base_client = None
 
+# Concurrent identical reads share one upstream call (see request_coalescer.py)
+coalescer = RequestCoalescer()
+
+# Named accounts; 'default' is the trader above, sub-accounts come from BINANCE_ACCOUNTS
+accounts = AccountRegistry(trader, coalescer, trader_factory=BinanceTrader)
+
+# Orders return on acknowledgement; balance reconciliation continues here
+order_tracker = OrderTracker(max_orders=config.ORDER_TRACKER_MAX_ORDERS, max_events=config.ORDER_TRACKER_MAX_EVENTS)
+
+# Trade journal; the database file is only created once an order is journaled or queried
+journal = TradeJournal(config.TRADE_JOURNAL_PATH)
+
+# Aggregate trades are paged into per-symbol memory-mapped files (see agg_trades.py)
+trade_store = AggTradeStore(trader.client) if trader else None
+
+# Higher intervals are derived from one 1m series per symbol (see kline_resampler.py)
+resampler = KlineResampler(trader) if trader and config.RESAMPLE_FROM_1M else None
+
+def _fetch_klines(symbol, interval, limit):
+    if resampler:
+        klines = resampler.get_klines(symbol, interval, limit)
+        if klines:
+            return klines
+    return trader.get_market_history(symbol, interval, limit)
+
+# Registered triggers are evaluated on streamed 1m klines (see condition_watcher.py)
+watcher = ConditionWatcher(resampler or KlineResampler(trader)) if trader else None
+
+def _get_klines(symbol, interval, limit):
+    return coalescer.call(('klines', symbol, interval, limit), _fetch_klines,
+                          symbol, interval, limit, ttl=config.COALESCE_TTL_SECONDS['klines'])
+
+def _get_symbol_info(symbol):
+    return coalescer.call(('symbol_info', symbol), trader.get_symbol_info,
+                          symbol, ttl=config.COALESCE_TTL_SECONDS['symbol_info'])
+
 @mcp.tool()
-def get_account_balance(asset: str = "USDT") -> str:
+@flight_recorder.traced
+async def get_account_balance(asset: str = "USDT", account: str = "") -> str:
     """
     Get the current balance of a specific asset (e.g., USDT, BTC).
     Returns a formatted string with free, locked, and total balance.
+    account: Account name from list_accounts (empty for the default account).
     """
-    if not trader:
+    if not trader and not account:
         return "Error: BinanceTrader not initialized."
-    
-    balance = trader.get_account_balance(asset)
+    try:
+        balance = await asyncio.to_thread(lambda: accounts.get(account).get_balance(asset))
+    except KeyError as e:
+        return f"Error: {e.args[0]}"
+    except Exception as e:
+        return f"Error fetching balance: {str(e)}"
     if balance:
         return f"{asset} Balance: Free={balance['free']}, Locked={balance['locked']}, Total={balance['total']}"
     else:
         return f"Could not retrieve balance for {asset}"
 
 @mcp.tool()
-def get_market_price(symbol: str) -> str:
+@flight_recorder.traced
+async def get_market_price(symbol: str) -> str:
     """
     Get the current price for a trading pair (e.g., BTCUSDT).
     """
@@ -47,7 +116,8 @@ def get_market_price(symbol: str) -> str:
         return "Error: BinanceTrader not initialized."
     
     try:
-        ticker = trader.client.get_symbol_ticker(symbol=symbol)
+        ticker = await asyncio.to_thread(coalescer.call, ('price', symbol), trader.client.get_symbol_ticker,
+                                         symbol=symbol, ttl=config.COALESCE_TTL_SECONDS['price'])
         if ticker:
             return f"Price of {symbol}: {ticker['price']}"
         else:
@@ -56,7 +126,8 @@ def get_market_price(symbol: str) -> str:
         return f"Error fetching price: {str(e)}"
 
 @mcp.tool()
-def fetch_chart_data(symbol: str, interval: str = "1h", limit: int = 100) -> str:
+@flight_recorder.traced
+async def fetch_chart_data(symbol: str, interval: str = "1h", limit: int = 100, max_points: int = 0, method: str = "ohlc") -> str:
     """
     Fetch historical OHLCV (Open, High, Low, Close, Volume) data for a symbol.
     Useful for technical analysis and backtesting.
@@ -64,7 +135,12 @@ def fetch_chart_data(symbol: str, interval: str = "1h", limit: int = 100) -> str
     Args:
         symbol: Trading pair (e.g., 'BTCUSDT')
         interval: Candle interval (e.g., '1m', '5m', '1h', '4h', '1d')
-        limit: Number of data points to retrieve (max 500 suggested for context limits)
+        limit: Number of candles to retrieve (more than 1000 is fetched in pages, at most MAX_KLINE_LIMIT)
+        max_points: If > 0, reduce the series server-side to at most this many points.
+                    Use this for large limits to see the shape of the data within context limits.
+        method: Reduction used with max_points: 'ohlc' merges consecutive candles
+                (keeps highs/lows and total volume), 'lttb' keeps the real candles
+                that best preserve the shape of the close line.
         
     Returns:
         A formatted string of list of dictionaries containing:
@@ -72,25 +148,35 @@ def fetch_chart_data(symbol: str, interval: str = "1h", limit: int = 100) -> str
     """
     if not trader:
         return "Error: BinanceTrader not initialized."
+    if method not in ("ohlc", "lttb"):
+        return "Error: method must be 'ohlc' or 'lttb'"
+    if limit > config.MAX_KLINE_LIMIT:
+        return f"Error: limit must be at most {config.MAX_KLINE_LIMIT}"
         
     try:
-        klines = trader.get_market_data(symbol, interval, limit)
+        klines = await asyncio.to_thread(_get_klines, symbol, interval, limit)
         if not klines:
             return f"No market data found for {symbol}"
             
-        # Format klines into a readable list of dicts
         # Binance kline format: 
         # [0: Open time, 1: Open, 2: High, 3: Low, 4: Close, 5: Volume, ...]
-        formatted_data = []
-        for k in klines:
-            formatted_data.append({
-                "time": k[0], # Timestamp (ms)
-                "open": float(k[1]),
-                "high": float(k[2]),
-                "low": float(k[3]),
-                "close": float(k[4]),
-                "volume": float(k[5])
-            })
+        def reduce():
+            with flight_recorder.span('downsample', max_points=max_points, method=method):
+                return downsample(klines_to_array(klines), max_points, method)
+        data = await asyncio.to_thread(reduce)
+
+        # Format rows into a readable list of dicts
+        formatted_data = [
+            {
+                "time": int(row[0]), # Timestamp (ms)
+                "open": row[1],
+                "high": row[2],
+                "low": row[3],
+                "close": row[4],
+                "volume": row[5]
+            }
+            for row in data.tolist()
+        ]
             
         # Return as string representation of the list
         return str(formatted_data)
@@ -98,20 +184,36 @@ def fetch_chart_data(symbol: str, interval: str = "1h", limit: int = 100) -> str
     except Exception as e:
         return f"Error fetching chart data: {str(e)}"
 
+# Indicators returned when calculate_indicators is called without a list
+DEFAULT_INDICATORS = ["rsi:14", "macd:12,26,9", "bbands:20,2", "ema:50", "sma:200"]
+
 @mcp.tool()
-def calculate_indicators(symbol: str, interval: str = "1h", limit: int = 100) -> str:
+@flight_recorder.traced
+async def calculate_indicators(symbol: str, interval: str = "1h", limit: int = 100, indicators: list[str] | None = None) -> str:
     """
-    Calculate technical indicators (RSI, MACD, Bollinger Bands, EMA, SMA) for a symbol.
+    Calculate technical indicators for a symbol. Only the requested indicators are computed.
     Use this to determine if the market is Trending or Ranging.
     
+    Args:
+        symbol: Trading pair (e.g., 'BTCUSDT')
+        interval: Candle interval (e.g., '1h', '4h')
+        limit: Number of candles to compute over
+        indicators: List of specs 'name' or 'name:params'. Defaults to
+            ["rsi:14", "macd:12,26,9", "bbands:20,2", "ema:50", "sma:200"].
+            Available: rsi:period, macd:fast,slow,signal, bbands:window,width,
+            ema:span, sma:window, atr:period, adx:period, vwap:window (0 = all candles),
+            stoch:period,smooth_k,smooth_d
+    
     Returns:
         A dictionary with the latest indicator values.
     """
     if not trader:
         return "Error: BinanceTrader not initialized."
+    if limit > config.MAX_KLINE_LIMIT:
+        return f"Error: limit must be at most {config.MAX_KLINE_LIMIT}"
         
     try:
-        klines = trader.get_market_data(symbol, interval, limit)
+        klines = await asyncio.to_thread(_get_klines, symbol, interval, limit)
         if not klines:
             return f"No market data found for {symbol}"
 
@@ -127,64 +229,40 @@ def calculate_indicators(symbol: str, interval: str = "1h", limit: int = 100) ->
             df[col] = df[col].astype(float)
             
         # --- Calculate Indicators ---
-        
-        # 1. RSI (14)
-        delta = df['close'].diff()
-        gain = (delta.where(delta > 0, 0)).rolling(window=14).mean()
-        loss = (-delta.where(delta < 0, 0)).rolling(window=14).mean()
-        rs = gain / loss
-        df['rsi'] = 100 - (100 / (1 + rs))
-        
-        # 2. MACD (12, 26, 9)
-        exp12 = df['close'].ewm(span=12, adjust=False).mean()
-        exp26 = df['close'].ewm(span=26, adjust=False).mean()
-        df['macd'] = exp12 - exp26
-        df['signal'] = df['macd'].ewm(span=9, adjust=False).mean()
-        df['hist'] = df['macd'] - df['signal']
-        
-        # 3. Bollinger Bands (20, 2)
-        df['sma20'] = df['close'].rolling(window=20).mean()
-        df['std20'] = df['close'].rolling(window=20).std()
-        df['bb_upper'] = df['sma20'] + (df['std20'] * 2)
-        df['bb_lower'] = df['sma20'] - (df['std20'] * 2)
-        
-        # 4. Moving Averages
-        df['ema50'] = df['close'].ewm(span=50, adjust=False).mean()
-        df['sma200'] = df['close'].rolling(window=200).mean()
-        
-        # Get latest values (last closed candle usually, but here we take the very last one available)
-        latest = df.iloc[-1]
+        # Shared intermediates (EMAs, true range, rolling std) are computed once per call
+        def compute():
+            with flight_recorder.span('indicators', rows=len(df)):
+                engine = IndicatorEngine(df)
+                return dict(engine.latest(spec) for spec in (indicators or DEFAULT_INDICATORS))
+        values = await asyncio.to_thread(compute)
         
         # Determine Market State (Simple Heuristic)
-        # Trending: Price > EMA50 (Uptrend) or Price < EMA50 (Downtrend) AND ADX > 25 (not calc here, but RSI can hint)
-        # Ranging: RSI between 40-60, Price near SMA20 (Middle BB)
+        # Trending: ADX > 25 when ADX was requested, otherwise RSI outside 40-60 hints at a trend
+        # Ranging: ADX < 20, or RSI between 40-60
         
         market_state = "Unknown"
-        if 40 < latest['rsi'] < 60:
-            market_state = "Likely Ranging"
-        elif latest['rsi'] > 70 or latest['rsi'] < 30:
-            market_state = "Likely Trending/Overextended"
-        else:
-            market_state = "Neutral/Trending"
+        adx = next((v for k, v in values.items() if k.startswith("ADX_")), None)
+        rsi = next((v for k, v in values.items() if k.startswith("RSI_")), None)
+        if isinstance(adx, dict) and not isinstance(adx['adx'], str):
+            if adx['adx'] > 25:
+                direction = "Up" if adx['plus_di'] > adx['minus_di'] else "Down"
+                market_state = f"Trending ({direction})"
+            elif adx['adx'] < 20:
+                market_state = "Ranging"
+            else:
+                market_state = "Weak Trend/Transition"
+        elif rsi is not None and not isinstance(rsi, str):
+            if 40 < rsi < 60:
+                market_state = "Likely Ranging"
+            elif rsi > 70 or rsi < 30:
+                market_state = "Likely Trending/Overextended"
+            else:
+                market_state = "Neutral/Trending"
             
         result = {
             "symbol": symbol,
-            "current_price": latest['close'],
-            "indicators": {
-                "RSI_14": round(latest['rsi'], 2),
-                "MACD": {
-                    "macd": round(latest['macd'], 4),
-                    "signal": round(latest['signal'], 4),
-                    "hist": round(latest['hist'], 4)
-                },
-                "Bollinger_Bands": {
-                    "upper": round(latest['bb_upper'], 2),
-                    "middle_sma20": round(latest['sma20'], 2),
-                    "lower": round(latest['bb_lower'], 2)
-                },
-                "EMA_50": round(latest['ema50'], 2),
-                "SMA_200": round(latest['sma200'], 2) if not np.isnan(latest['sma200']) else "Not enough data"
-            },
+            "current_price": float(df['close'].iloc[-1]),
+            "indicators": values,
             "market_state_heuristic": market_state
         }
         
@@ -194,7 +272,321 @@ def calculate_indicators(symbol: str, interval: str = "1h", limit: int = 100) ->
         return f"Error calculating indicators: {str(e)}"
 
 @mcp.tool()
-def get_symbol_rules(symbol: str) -> str:
+@flight_recorder.traced
+async def optimize_strategy(symbol: str, strategy: str = "rsi_reversion", interval: str = "4h", limit: int = 1000,
+                            param_grid: dict[str, list[float]] | None = None, samples: int = 0,
+                            top_n: int = 5, folds: int = 4) -> str:
+    """
+    Sweep strategy parameters over historical klines in parallel and rank them
+    with walk-forward out-of-sample scores. Use this instead of comparing
+    parameter sets one tool call at a time.
+    
+    Args:
+        symbol: Trading pair (e.g., 'BTCUSDT')
+        strategy: 'rsi_reversion' (params: rsi_period, rsi_low, rsi_high, stop_loss_pct, take_profit_pct)
+                  or 'ema_cross' (params: fast_span, slow_span, stop_loss_pct, take_profit_pct)
+        interval: Candle interval (e.g., '1h', '4h')
+        limit: Number of candles to test over
+        param_grid: Optional values per parameter overriding the defaults (unknown names are rejected),
+                    e.g. {"rsi_low": [25, 30], "take_profit_pct": [1, 2, 3]}
+        samples: If > 0, test this many random combinations instead of the full grid
+        top_n: Number of parameter sets to return
+        folds: Number of walk-forward folds (in-sample segment i, out-of-sample segment i + 1)
+        
+    Returns:
+        Top-N parameter sets ranked on the first `folds` segments, with their return
+        on the held-out last segment (fees included), plus the per-fold walk-forward selection.
+    """
+    if not trader:
+        return "Error: BinanceTrader not initialized."
+    if folds < 1:
+        return "Error: folds must be at least 1"
+    if limit > config.MAX_KLINE_LIMIT:
+        return f"Error: limit must be at most {config.MAX_KLINE_LIMIT}"
+        
+    try:
+        klines = await asyncio.to_thread(_get_klines, symbol, interval, limit)
+        if not klines:
+            return f"No market data found for {symbol}"
+        with flight_recorder.span('optimize', strategy=strategy, candles=len(klines)):
+            result = await asyncio.to_thread(strategy_optimizer.optimize, klines, strategy, param_grid,
+                                             samples, top_n, folds, config.OPTIMIZER_WORKERS)
+        result["symbol"] = symbol
+        result["interval"] = interval
+        return str(result)
+    except Exception as e:
+        return f"Error optimizing strategy: {str(e)}"
+
+def _latest_indicators(symbol, interval, specs):
+    """Latest values of the given indicator specs, using the coalesced kline path"""
+    klines = _get_klines(symbol, interval, 100)
+    if not klines:
+        return None
+    df = pd.DataFrame([k[:6] for k in klines], columns=['timestamp', 'open', 'high', 'low', 'close', 'volume'])
+    for col in ['open', 'high', 'low', 'close', 'volume']:
+        df[col] = df[col].astype(float)
+    with flight_recorder.span('indicators', symbol=symbol, rows=len(df)):
+        engine = IndicatorEngine(df)
+        return dict(engine.latest(spec) for spec in specs)
+
+@mcp.tool()
+@flight_recorder.traced
+async def scan_market(quote_asset: str = "USDT", sort_by: str = "quote_volume", top_n: int = 20,
+                      ascending: bool = False, min_quote_volume: float = 0, max_spread_bps: float = 0,
+                      min_abs_change_pct: float = 0, with_indicators: bool = False, interval: str = "1h") -> str:
+    """
+    Scan every trading pair at once from a single bulk 24h ticker request and return the top-N.
+    Use this to find candidates instead of checking pairs one by one.
+    
+    Args:
+        quote_asset: Only pairs quoted in this asset (e.g., 'USDT'); empty for all
+        sort_by: 'quote_volume', 'change_pct', 'abs_change_pct', 'spread_bps', 'volatility_pct' or 'trades'
+        top_n: Number of pairs to return
+        ascending: Sort ascending (e.g., tightest spread first) instead of descending
+        min_quote_volume: Minimum 24h volume in the quote asset
+        max_spread_bps: Maximum bid/ask spread in basis points (0 = no limit)
+        min_abs_change_pct: Minimum absolute 24h price change in percent
+        with_indicators: Also attach RSI_14 and ATR_14 on `interval` for the returned pairs
+        interval: Candle interval used when with_indicators is set
+    """
+    if not trader:
+        return "Error: BinanceTrader not initialized."
+        
+    def scan():
+        tickers = coalescer.call(('ticker_24h',), trader.client.get_ticker,
+                                 ttl=config.COALESCE_TTL_SECONDS['ticker_24h'])
+        if not tickers:
+            return None
+        with flight_recorder.span('scan', tickers=len(tickers)):
+            results = market_scanner.scan(tickers, quote_asset, sort_by, top_n, ascending,
+                                          min_quote_volume, max_spread_bps, min_abs_change_pct)
+
+        if with_indicators and results:
+            latest = flight_recorder.bind(_latest_indicators)
+
+            def attach(row):
+                # One symbol's failure is reported in its row instead of failing the scan
+                try:
+                    row['indicators'] = latest(row['symbol'], interval, ["rsi:14", "atr:14"])
+                except Exception as e:
+                    logging.warning(f"Could not compute indicators for {row['symbol']}: {e}")
+                    row['indicators'] = None
+                    row['error'] = str(e)
+
+            with ThreadPoolExecutor(max_workers=8) as pool:
+                list(pool.map(attach, results))
+        return results
+
+    try:
+        results = await asyncio.to_thread(scan)
+        if results is None:
+            return "Could not retrieve 24h tickers"
+        return str(results)
+    except Exception as e:
+        return f"Error scanning market: {str(e)}"
+
+def _portfolio_analytics(symbols, interval, limit, window, benchmark):
+    """Fetch all symbols concurrently through the kline path and analyze the aligned closes"""
+    fetch = flight_recorder.bind(_get_klines)
+    with ThreadPoolExecutor(max_workers=config.PORTFOLIO_FETCH_WORKERS) as pool:
+        klines = dict(zip(symbols, pool.map(lambda s: fetch(s, interval, limit), symbols)))
+    missing = [s for s, k in klines.items() if not k]
+    if benchmark in missing:
+        raise ValueError(f"No market data found for benchmark {benchmark}")
+    with flight_recorder.span('portfolio_analytics', symbols=len(symbols), candles=limit):
+        times, closes, aligned = analytics.align_closes({s: k for s, k in klines.items() if k})
+        result = analytics.analyze(times, closes, aligned, benchmark, window, INTERVAL_MS[interval])
+    result['interval'] = interval
+    result['missing'] = missing
+    return result
+
+@mcp.tool()
+@flight_recorder.traced
+async def portfolio_analytics(symbols: list[str] | None = None, interval: str = "1h", limit: int = 500,
+                              window: int = 50, benchmark: str = "BTCUSDT", include_matrix: bool = True) -> str:
+    """
+    How a set of pairs moves together: per-symbol annualized volatility, beta and correlation
+    against the benchmark (full period and rolling over `window` candles, latest/min/max),
+    return, max and current drawdown, plus the correlation matrix of the latest window.
+    
+    Args:
+        symbols: Trading pairs (default: config.TRADING_PAIRS). The benchmark is added if missing.
+        interval: Candle interval (e.g., '1h', '4h', '1d')
+        limit: Candles per symbol; series are aligned on common timestamps, so newer listings shorten the period
+        window: Rolling window in candles
+        benchmark: Pair to compute beta and correlation against
+        include_matrix: Include the NxN correlation matrix
+    
+    Results are cached per (symbols, interval, limit, window) for a short time.
+    """
+    if not trader:
+        return "Error: BinanceTrader not initialized."
+    if interval not in INTERVAL_MS:
+        return f"Error: Unsupported interval '{interval}'"
+    if window < 2:
+        return "Error: window must be at least 2"
+    if limit > config.MAX_KLINE_LIMIT:
+        return f"Error: limit must be at most {config.MAX_KLINE_LIMIT}"
+    symbols = list(dict.fromkeys(s.upper() for s in (symbols or config.TRADING_PAIRS)))
+    benchmark = benchmark.upper()
+    if benchmark not in symbols:
+        symbols.append(benchmark)
+
+    try:
+        result = await asyncio.to_thread(coalescer.call, ('portfolio', tuple(symbols), interval, limit, window, benchmark),
+                                         _portfolio_analytics, symbols, interval, limit, window, benchmark,
+                                         ttl=config.COALESCE_TTL_SECONDS['portfolio'])
+        if not include_matrix:
+            result = {k: v for k, v in result.items() if k != 'correlation_matrix'}
+        return str(result)
+    except Exception as e:
+        return f"Error computing portfolio analytics: {str(e)}"
+
+def _trade_window(symbol, minutes, start_time, end_time, refresh):
+    """Stored aggregate trades for a window, after catching up with the exchange if refresh is set.
+    Without explicit times the window is the last `minutes` before the newest stored trade, and a
+    warning is returned when that trade is older than `minutes` (the store has fallen behind).
+    Explicit times reaching outside the stored trades also get a warning, since the result then
+    covers only part of the window.
+    Returns (trades, warning).
+    """
+    symbol = symbol.upper()
+    if refresh:
+        trade_store.ingest(symbol, backfill_minutes=minutes)
+    trades = trade_store.load(symbol)
+    if not len(trades):
+        return trades, ""
+    warning = ""
+    first, last = int(trades['time'][0]), int(trades['time'][-1])
+    if not start_time and not end_time:
+        end_time = last
+        start_time = end_time - minutes * 60 * 1000
+        behind_minutes = (time.time() * 1000 - end_time) / 60000
+        if behind_minutes > minutes:
+            warning = (f"\nWarning: the newest stored trade for {symbol} is {behind_minutes:.0f} minutes old, "
+                       f"so this window is stale. Call ingest_agg_trades to catch up.")
+    else:
+        if start_time and start_time < first:
+            warning += (f"\nWarning: start_time is before the oldest stored trade for {symbol} ({first}); "
+                        f"the result only covers trades from then on.")
+        if end_time and end_time > last:
+            warning += (f"\nWarning: end_time is after the newest stored trade for {symbol} ({last}); "
+                        f"the result only covers trades up to then. Call ingest_agg_trades to catch up.")
+    return agg_trades.window_slice(trades, start_time or None, end_time or None), warning
+
+@mcp.tool()
+@flight_recorder.traced
+async def ingest_agg_trades(symbol: str, backfill_minutes: int = 60, max_pages: int = 0) -> str:
+    """
+    Page aggregate trades for a symbol into the local on-disk trade store.
+    Continues from the last stored trade; a new symbol is backfilled from `backfill_minutes` ago.
+    max_pages: Requests of 1000 trades to make (0 = AGG_TRADES_MAX_PAGES). Call again to catch up further.
+    """
+    if not trade_store:
+        return "Error: BinanceTrader not initialized."
+    try:
+        added = await asyncio.to_thread(trade_store.ingest, symbol, backfill_minutes, max_pages or None)
+        trades = trade_store.load(symbol)
+        if not len(trades):
+            return f"No aggregate trades stored for {symbol}"
+        return str({'symbol': symbol.upper(), 'added': added, 'stored': len(trades),
+                    'first_time': int(trades['time'][0]), 'last_time': int(trades['time'][-1])})
+    except Exception as e:
+        return f"Error ingesting aggregate trades: {str(e)}"
+
+@mcp.tool()
+@flight_recorder.traced
+async def get_vwap(symbol: str, minutes: int = 60, start_time: int = 0, end_time: int = 0, refresh: bool = True) -> str:
+    """
+    VWAP, volume and taker buy/sell volume with imbalance ((buy - sell) / volume) from aggregate trades.
+    minutes: Window length ending at the newest stored trade, used when start_time/end_time (ms) are 0.
+             The result carries a warning if that trade is older than `minutes`.
+    refresh: Fetch new trades first (bounded by AGG_TRADES_MAX_PAGES; see ingest_agg_trades).
+    """
+    if not trade_store:
+        return "Error: BinanceTrader not initialized."
+    try:
+        def compute():
+            trades, warning = _trade_window(symbol, minutes, start_time, end_time, refresh)
+            with flight_recorder.span('vwap', trades=len(trades)):
+                return agg_trades.vwap(trades), warning
+        result, warning = await asyncio.to_thread(compute)
+        if not result:
+            return f"No aggregate trades found for {symbol} in this window"
+        return str(dict(result, symbol=symbol.upper())) + warning
+    except Exception as e:
+        return f"Error computing VWAP: {str(e)}"
+
+@mcp.tool()
+@flight_recorder.traced
+async def get_volume_profile(symbol: str, minutes: int = 60, buckets: int = 50, bucket_size: float = 0,
+                             start_time: int = 0, end_time: int = 0, refresh: bool = True) -> str:
+    """
+    Volume traded per price bucket (taker buys and sells) from aggregate trades, with the
+    point of control (the price bucket with the most volume).
+    buckets: Number of equal price buckets over the window's range (ignored if bucket_size > 0).
+    bucket_size: Fixed bucket width in quote currency (at most AGG_TRADES_MAX_BUCKETS buckets per window).
+    minutes / start_time / end_time / refresh: As for get_vwap.
+    """
+    if not trade_store:
+        return "Error: BinanceTrader not initialized."
+    if buckets < 1:
+        return "Error: buckets must be at least 1"
+    try:
+        def compute():
+            trades, warning = _trade_window(symbol, minutes, start_time, end_time, refresh)
+            with flight_recorder.span('volume_profile', trades=len(trades)):
+                return agg_trades.volume_profile(trades, buckets, bucket_size), warning
+        profile, warning = await asyncio.to_thread(compute)
+        if profile is None:
+            return f"No aggregate trades found for {symbol} in this window"
+        prices, buy, sell = profile
+        volume = buy + sell
+        poc = int(volume.argmax())
+        rows = [
+            {'price': round(float(p), 8), 'volume': round(float(b + s), 8),
+             'buy_volume': round(float(b), 8), 'sell_volume': round(float(s), 8)}
+            for p, b, s in zip(prices, buy, sell) if b + s > 0
+        ]
+        return str({'symbol': symbol.upper(), 'bucket_size': float(prices[1] - prices[0]) if len(prices) > 1 else None,
+                    'poc_price': float(prices[poc]), 'total_volume': float(volume.sum()), 'profile': rows}) + warning
+    except Exception as e:
+        return f"Error computing volume profile: {str(e)}"
+
+@mcp.tool()
+@flight_recorder.traced
+async def get_trade_imbalance(symbol: str, minutes: int = 60, resolution: str = "1m",
+                              start_time: int = 0, end_time: int = 0, refresh: bool = True) -> str:
+    """
+    Taker buy/sell volume, imbalance and VWAP per `resolution` bucket (e.g. '1m', '5m', '1h')
+    from aggregate trades. Positive imbalance means aggressive buying.
+    minutes / start_time / end_time / refresh: As for get_vwap.
+    """
+    if not trade_store:
+        return "Error: BinanceTrader not initialized."
+    if resolution not in INTERVAL_MS:
+        return f"Error: Unsupported resolution '{resolution}'"
+    try:
+        def compute():
+            trades, warning = _trade_window(symbol, minutes, start_time, end_time, refresh)
+            with flight_recorder.span('trade_imbalance', trades=len(trades)):
+                return agg_trades.imbalance_series(trades, INTERVAL_MS[resolution]), warning
+        series, warning = await asyncio.to_thread(compute)
+        if series is None:
+            return f"No aggregate trades found for {symbol} in this window"
+        rows = []
+        for t, b, s, v in zip(*series):
+            total = b + s
+            rows.append({'time': int(t), 'buy_volume': round(float(b), 8), 'sell_volume': round(float(s), 8),
+                         'imbalance': round(float((b - s) / total), 4) if total else None,
+                         'vwap': round(float(v), 8) if total else None})
+        return str(rows) + warning
+    except Exception as e:
+        return f"Error computing trade imbalance: {str(e)}"
+
+@mcp.tool()
+@flight_recorder.traced
+async def get_symbol_rules(symbol: str) -> str:
     """
     Get specific trading rules (Exchange Info) for a symbol.
     Returns details like LOT_SIZE (step size), MIN_NOTIONAL, etc.
@@ -204,7 +596,7 @@ def get_symbol_rules(symbol: str) -> str:
         return "Error: BinanceTrader not initialized."
     
     try:
-        info = trader.get_symbol_info(symbol)
+        info = await asyncio.to_thread(_get_symbol_info, symbol)
         if not info:
             return f"Could not retrieve info for {symbol}"
 
@@ -245,7 +637,8 @@ def get_symbol_rules(symbol: str) -> str:
         return f"Error getting symbol rules: {str(e)}"
 
 @mcp.tool()
-def adjust_leverage(symbol: str, leverage: int) -> str:
+@flight_recorder.traced
+async def adjust_leverage(symbol: str, leverage: int) -> str:
     """
     Adjust the leverage for a specific symbol (Futures only).
     Useful for verifying API connectivity without placing an order.
@@ -261,7 +654,9 @@ def adjust_leverage(symbol: str, leverage: int) -> str:
         return "Error: BinanceTrader not initialized."
         
     try:
-        result = trader.change_leverage(symbol, leverage)
+        result = await asyncio.to_thread(trader.change_leverage, symbol, leverage)
+        if result and result.get('unchanged'):
+            return f"Success: Leverage for {symbol} is already {leverage}x (no request sent)."
         if result:
             return f"Success: Leverage for {symbol} changed to {leverage}x. Response: {result}"
         else:
@@ -270,13 +665,117 @@ def adjust_leverage(symbol: str, leverage: int) -> str:
         return f"Error changing leverage: {str(e)}"
 
 @mcp.tool()
-def place_order(symbol: str, side: str, quantity: float) -> str:
+@flight_recorder.traced
+async def set_margin_type(symbol: str, margin_type: str) -> str:
+    """
+    Set the futures margin type for a symbol: 'ISOLATED' or 'CROSSED'.
+    No request is sent if the symbol already uses that margin type.
+    """
+    if not trader:
+        return "Error: BinanceTrader not initialized."
+    
+    result = await asyncio.to_thread(trader.futures.change_margin_type, symbol, margin_type)
+    if result and result.get('unchanged'):
+        return f"Success: Margin type for {symbol} is already {result['marginType']} (no request sent)."
+    if result:
+        return f"Success: Margin type for {symbol} changed to {margin_type.upper()}. Response: {result}"
+    return f"Failed to change margin type for {symbol}. Check logs (open positions/orders block changes)."
+
+@mcp.tool()
+@flight_recorder.traced
+async def get_futures_positions(symbol: str = "", include_flat: bool = False) -> str:
+    """
+    Get open USD-M futures positions (amount, entry price, unrealized PnL).
+    Served from a cache kept current by the futures user data stream.
+    symbol: Filter to one symbol, or empty for all.
+    """
+    if not trader:
+        return "Error: BinanceTrader not initialized."
+    
+    def fetch():
+        if config.FUTURES_USER_STREAM:
+            trader.futures.start_user_stream()
+        return trader.futures.get_positions(symbol or None, include_flat)
+    positions = await asyncio.to_thread(fetch)
+    if positions is None:
+        return "Could not retrieve futures positions. Check logs (Futures enabled?)."
+    return str(positions)
+
+@mcp.tool()
+@flight_recorder.traced
+async def place_futures_order(symbol: str, side: str, quantity: float, order_type: str = "MARKET",
+                              price: float = 0, reduce_only: bool = False) -> str:
+    """
+    Place a USD-M futures order. Quantity is checked locally against step size,
+    min/max quantity, minimum notional and the current leverage bracket, and LIMIT
+    prices against the tick size, before sending.
+    side: 'BUY' or 'SELL'
+    order_type: 'MARKET' or 'LIMIT' (LIMIT requires price)
+    reduce_only: Only reduce an existing position
+    """
+    if not trader:
+        return "Error: BinanceTrader not initialized."
+    
+    side = side.upper()
+    order_type = order_type.upper()
+    if side not in ['BUY', 'SELL']:
+        return "Error: Side must be BUY or SELL"
+    if order_type not in ['MARKET', 'LIMIT']:
+        return "Error: order_type must be MARKET or LIMIT"
+    if order_type == 'LIMIT' and price <= 0:
+        return "Error: LIMIT orders require a price"
+        
+    order = await asyncio.to_thread(trader.futures.place_order, symbol, side, quantity, order_type,
+                                    price or None, reduce_only)
+    if order:
+        return f"Futures order placed: {order}"
+    return "Futures order failed. Check logs for details."
+
+async def _report_progress(ctx, progress, total, message):
+    """Send an MCP progress notification, ignoring calls made outside of a request"""
+    try:
+        await ctx.report_progress(progress, total, message)
+    except ValueError:
+        pass
+
+def _session_notifier(ctx):
+    """Build a thread-safe callback that forwards messages to the calling MCP session as log notifications"""
+    try:
+        session = ctx.session
+    except ValueError:
+        # Called outside of an MCP request (e.g. direct mcp.call_tool in tests)
+        return None
+    loop = asyncio.get_running_loop()
+
+    def notify(message):
+        asyncio.run_coroutine_threadsafe(
+            session.send_log_message(level="info", data=message, logger="order_tracker"), loop
+        )
+    return notify
+
+def _journal_balances(state):
+    """Store the balances seen after reconciliation next to the journaled order"""
+    if not journal:
+        return
+    base = trader.get_account_balance('BTC')
+    quote = trader.get_account_balance('USDT')
+    if base and quote:
+        journal.record_balances(state['symbol'], state['orderId'], base['total'], quote['total'])
+
+@mcp.tool()
+@flight_recorder.traced
+async def place_order(symbol: str, side: str, quantity: float, ctx: Context, account: str = "") -> str:
     """
     Place a MARKET order (BUY or SELL).
     side: 'BUY' or 'SELL'
     quantity: Amount of base asset to buy/sell.
+    account: Account name from list_accounts (empty for the default account).
+             Only default-account orders are recorded in the trade journal.
+    
+    Returns as soon as Binance acknowledges the order. Balance reconciliation
+    continues in the background; use get_order_status(order_id) to follow it.
     """
-    if not trader:
+    if not trader and not account:
         return "Error: BinanceTrader not initialized."
     
     # Simple validation
@@ -284,15 +783,237 @@ def place_order(symbol: str, side: str, quantity: float) -> str:
         return "Error: Side must be BUY or SELL"
         
     try:
-        order = trader.place_order(symbol, side.upper(), quantity)
-        if order:
-            return f"Order executed successfully: {order}"
-        else:
+        await _report_progress(ctx, 0, 2, "Validating and submitting order")
+        try:
+            acct = await asyncio.to_thread(accounts.get, account)
+        except KeyError as e:
+            return f"Error: {e.args[0]}"
+        order, expectation = await asyncio.to_thread(acct.trader.submit_order, symbol, side.upper(), quantity)
+        if not order:
             return "Order failed. Check logs for details."
+
+        # The journal tracks the default account's positions only
+        is_default = acct.trader is trader
+        if journal and is_default:
+            try:
+                journal.record_order(order, expectation)
+            except Exception as e:
+                logging.error(f"Failed to journal order {order['orderId']}: {e}")
+
+        order_tracker.track(order, expectation, acct.trader.reconcile_balances, notify=_session_notifier(ctx),
+                            on_complete=_journal_balances if is_default else None)
+        await _report_progress(ctx, 2, 2, f"Order {order['orderId']} acknowledged with status {order['status']}")
+        return (f"Order executed successfully: {order}\n"
+                f"Balance reconciliation is running in the background; "
+                f"check get_order_status(order_id={order['orderId']}).")
     except Exception as e:
         return f"Error executing order: {str(e)}"
 
 @mcp.tool()
+@flight_recorder.traced
+async def list_accounts() -> str:
+    """
+    List configured Binance accounts. Connected accounts also show their clock offset,
+    the request weight Binance last reported and time spent waiting on the local rate budget.
+    """
+    def status(name):
+        try:
+            return accounts.get(name).status()
+        except Exception as e:
+            return {'account': name, 'error': str(e)}
+
+    # Accounts not used yet connect here (ping and clock sync)
+    rows = await asyncio.to_thread(lambda: [status(name) for name in accounts.names()])
+    return str(rows)
+
+@mcp.tool()
+@flight_recorder.traced
+async def get_all_balances(assets: list[str] | None = None) -> str:
+    """
+    Get balances of the given assets (default USDT and BTC) for every account at once.
+    Accounts are queried concurrently; totals sum the accounts that answered.
+    """
+    assets = assets or ["USDT", "BTC"]
+
+    def balances(acct):
+        return {asset: acct.get_balance(asset) for asset in assets}
+
+    results = await asyncio.to_thread(accounts.fan_out, balances)
+    totals = {asset: 0.0 for asset in assets}
+    for per_asset in results.values():
+        if isinstance(per_asset, dict):
+            for asset, balance in per_asset.items():
+                if balance:
+                    totals[asset] += balance['total']
+    return str({'accounts': results, 'totals': totals})
+
+@mcp.tool()
+@flight_recorder.traced
+def get_order_status(order_id: int = 0) -> str:
+    """
+    Get the tracked state of an order placed through place_order, including
+    background balance reconciliation progress
+    (PENDING, RUNNING, DONE, TIMEOUT, FAILED or SKIPPED).
+    order_id: Binance order id. Use 0 to list the most recent orders.
+    """
+    if order_id:
+        state = order_tracker.get(order_id)
+        if not state:
+            return f"Order {order_id} is not tracked by this server."
+        return str(state)
+    return str(order_tracker.recent())
+
+@mcp.tool()
+@flight_recorder.traced
+def get_realized_pnl(symbol: str = "", days: int = 30, group_by: str = "symbol") -> str:
+    """
+    Realized profit and loss (in the quote asset, fees included) from the local trade journal.
+    symbol: Trading pair to filter on, or empty for all symbols.
+    days: Look-back period in days (0 = all history).
+    group_by: 'symbol', 'day' or 'month'.
+    """
+    if not journal:
+        return "Error: Trade journal not available."
+    try:
+        return str(journal.realized_pnl(symbol or None, days, group_by))
+    except Exception as e:
+        return f"Error querying realized PnL: {str(e)}"
+
+@mcp.tool()
+@flight_recorder.traced
+def get_fee_totals(symbol: str = "", days: int = 30) -> str:
+    """
+    Total trading commissions from the local trade journal, per symbol and commission asset,
+    with the quote-asset equivalent where it can be derived.
+    """
+    if not journal:
+        return "Error: Trade journal not available."
+    try:
+        return str(journal.fee_totals(symbol or None, days))
+    except Exception as e:
+        return f"Error querying fees: {str(e)}"
+
+@mcp.tool()
+@flight_recorder.traced
+def get_slippage_stats(symbol: str = "", days: int = 30) -> str:
+    """
+    Average and worst execution slippage versus the price seen before each order,
+    in basis points (positive = worse than expected), from the local trade journal.
+    """
+    if not journal:
+        return "Error: Trade journal not available."
+    try:
+        return str(journal.slippage_stats(symbol or None, days))
+    except Exception as e:
+        return f"Error querying slippage: {str(e)}"
+
+# Session notifiers of the clients that registered each trigger, for push delivery
+_trigger_notifiers = {}
+
+def _notify_trigger(event):
+    if event['repeat']:
+        notify = _trigger_notifiers.get(event['trigger_id'])
+    else:
+        notify = _trigger_notifiers.pop(event['trigger_id'], None)
+    if notify:
+        notify(f"Trigger {event['trigger_id']} fired: {event['symbol']} {event['condition']} "
+               f"{event['value'] if event['value'] is not None else ''} (observed {event['observed']})")
+
+def _run_trigger_action(event):
+    """Place the market order attached to a fired trigger"""
+    action = event['action']
+    order, expectation = trader.submit_order(event['symbol'], action['side'].upper(), float(action['quantity']))
+    if not order:
+        return "Order failed. Check logs for details."
+    if journal:
+        try:
+            journal.record_order(order, expectation)
+        except Exception as e:
+            logging.error(f"Failed to journal order {order['orderId']}: {e}")
+    order_tracker.track(order, expectation, trader.reconcile_balances, on_complete=_journal_balances)
+    return f"Order {order['orderId']} placed with status {order['status']}"
+
+if watcher:
+    watcher.listeners.append(_notify_trigger)
+    if config.WATCHER_EXECUTE_ACTIONS:
+        watcher.action_handler = _run_trigger_action
+
+@mcp.tool()
+@flight_recorder.traced
+async def register_trigger(symbol: str, condition: str, value: float | None = None, interval: str = "1m",
+                           period: int = 14, repeat: bool = False, action_side: str = "",
+                           action_quantity: float = 0.0, ctx: Context = None) -> str:
+    """
+    Register a server-side trigger evaluated on the live kline stream, instead of polling.
+    condition: 'price_crosses_above', 'price_crosses_below' (value = price level),
+               'rsi_above', 'rsi_below' (value = RSI threshold, checked when an `interval` candle closes)
+               or 'candle_close' (fires when an `interval` candle closes).
+    period: RSI period.
+    repeat: Keep the trigger after it fires (default: fire once).
+    action_side / action_quantity: Optional MARKET order to queue when the trigger fires. It is only
+               executed when WATCHER_EXECUTE_ACTIONS is enabled; otherwise it is reported in the event.
+    Fired triggers are pushed as log notifications to this session and listed by get_trigger_events.
+    With multi_worker.py only one worker evaluates triggers; sessions on other workers poll get_trigger_events.
+    """
+    if not watcher:
+        return "Error: BinanceTrader not initialized."
+    action = None
+    if action_side:
+        if action_side.upper() not in ['BUY', 'SELL'] or action_quantity <= 0:
+            return "Error: action_side must be BUY or SELL with a positive action_quantity"
+        action = {'side': action_side.upper(), 'quantity': action_quantity}
+    try:
+        trigger = watcher.add_trigger(symbol, condition, value, interval, period, repeat, action)
+    except ValueError as e:
+        return f"Error: {str(e)}"
+
+    notify = _session_notifier(ctx) if ctx else None
+    if notify:
+        _trigger_notifiers[trigger['id']] = notify
+    if await asyncio.to_thread(watcher.start) == 'standby':
+        note = "\nNote: another server process evaluates triggers; this session gets no push notification, " \
+               "use get_trigger_events."
+    elif not watcher.streaming:
+        return f"Trigger registered: {trigger}\nWarning: the kline stream could not be started; retrying, check logs."
+    else:
+        note = ""
+    if action and not config.WATCHER_EXECUTE_ACTIONS:
+        note += "\nNote: action execution is disabled (WATCHER_EXECUTE_ACTIONS); the action will only be reported."
+    return f"Trigger registered: {trigger}{note}"
+
+@mcp.tool()
+@flight_recorder.traced
+def list_triggers() -> str:
+    """List registered triggers, including how often each has fired."""
+    if not watcher:
+        return "Error: BinanceTrader not initialized."
+    return str(watcher.list_triggers())
+
+@mcp.tool()
+@flight_recorder.traced
+def remove_trigger(trigger_id: str) -> str:
+    """Remove a registered trigger by id."""
+    if not watcher:
+        return "Error: BinanceTrader not initialized."
+    if not watcher.remove_trigger(trigger_id):
+        return f"Trigger {trigger_id} not found."
+    _trigger_notifiers.pop(trigger_id, None)
+    return f"Trigger {trigger_id} removed."
+
+@mcp.tool()
+@flight_recorder.traced
+def get_trigger_events(after_id: int = 0, limit: int = 50) -> str:
+    """
+    Get fired trigger events, oldest first.
+    after_id: Only return events with a higher id (pass the last id seen to poll for new events).
+    Each event includes the observed price or RSI, the queued action and, when executed, its result.
+    """
+    if not watcher:
+        return "Error: BinanceTrader not initialized."
+    return str(watcher.get_events(after_id, limit))
+
+@mcp.tool()
+@flight_recorder.traced
 def get_base_network_status() -> str:
     """Get the current status of the Base network (Block number and Gas price)."""
     if not base_client or not base_client.check_connection():
@@ -306,6 +1027,42 @@ def get_base_network_status() -> str:
         return f"Error fetching network status: {str(e)}"
 
 @mcp.tool()
+@flight_recorder.traced
+def get_coalescer_stats() -> str:
+    """
+    Get request coalescing counters for upstream market/account reads.
+    calls: tool-level reads, upstream: requests actually sent to Binance,
+    shared: callers that joined an in-flight request, cache_hits: micro-TTL reuses.
+    dedup_ratio is calls per upstream request.
+    """
+    return str(coalescer.stats())
+
+@mcp.tool()
+def get_slow_calls(limit: int = 20, tool: str = "") -> str:
+    """
+    Get recent tool calls slower than SLOW_CALL_THRESHOLD_MS, slowest first, with their span tree:
+    upstream HTTP requests, time syncs, retry/poll sleeps and compute sections (offsets and durations in ms).
+    tool: Only calls of this tool; empty for all.
+    """
+    return str(flight_recorder.slow_calls(limit, tool or None))
+
+@mcp.tool()
+async def run_profiler(seconds: float = 5.0, interval_ms: float = 5.0, top: int = 50) -> str:
+    """
+    Admin: sample the stacks of all server threads for N seconds and return the hottest
+    collapsed stacks ('thread;file:function;...' followed by the sample count).
+    Requires PROFILER_ENABLED.
+    """
+    if not config.PROFILER_ENABLED:
+        return "Error: Profiler is disabled. Set PROFILER_ENABLED=true to allow it."
+    if not 0 < seconds <= config.PROFILER_MAX_SECONDS:
+        return f"Error: seconds must be between 0 and {config.PROFILER_MAX_SECONDS}"
+    stacks, samples = await asyncio.to_thread(flight_recorder.profile, seconds, interval_ms / 1000)
+    lines = [f"{stack} {count}" for stack, count in stacks.most_common(top)]
+    return f"{samples} samples over {seconds}s\n" + "\n".join(lines)
+
+@mcp.tool()
+@flight_recorder.traced
 def read_bot_logs(lines: int = 20, log_type: str = "general") -> str:
     """
     Read the last N lines from the bot logs.
@@ -343,4 +1100,7 @@ if __name__ == "__main__":
     # Use PORT environment variable if supported by the underlying implementation.
     os.environ["PORT"] = "8080"
     os.environ["HOST"] = "127.0.0.1"
+    # Resume streaming for triggers persisted by a previous run
+    if watcher and watcher.list_triggers():
+        watcher.start()
     mcp.run(transport='sse')
@@ -0,0 +1,108 @@
+"""
+Run several MCP server processes behind one listening socket.
+
+Each worker builds its own BinanceTrader/BaseClient (own HTTP connections and
+clock offset) but reads exchange info, prices and klines through one cache
+served by a manager process. Once any worker has fetched a key, the others
+reuse it until its TTL expires. Single-flight sharing of calls still in
+progress is per worker: if several workers miss the same key at the same
+moment, each of them fetches it once.
+
+Condition triggers live in the shared TRIGGERS_PATH file. Every worker can
+register, list and remove them, but only one worker (whichever holds the
+owner lock) streams klines, fires triggers and runs their actions; if it
+exits another worker takes over. Push notifications for fired triggers only
+reach sessions on the owning worker, so clients should poll
+get_trigger_events.
+
+Workers serve the stateless streamable-HTTP transport at /mcp: SSE sessions
+are pinned to the process that opened them, and the kernel spreads
+connections from one socket across workers, so SSE cannot be load-balanced
+this way.
+
+Usage:
+    python multi_worker.py --workers 4 --host 127.0.0.1 --port 8080
+"""
+import argparse
+import logging
+import multiprocessing
+import os
+import signal
+import socket
+from multiprocessing.managers import BaseManager
+
+import config
+from request_coalescer import LocalTTLCache
+
+
+class CacheManager(BaseManager):
+    """Manager process hosting the market data cache shared by all workers"""
+
+
+CacheManager.register('LocalTTLCache', LocalTTLCache)
+
+
+def _bind_socket(host, port):
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+    return sock
+
+
+def _run_worker(sock, shared_cache, index):
+    # Imported after fork so every worker creates its own clients and connections
+    import uvicorn
+    import mcp_server
+
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    mcp_server.coalescer.cache = shared_cache
+    mcp_server.mcp.settings.stateless_http = True
+    app = mcp_server.mcp.streamable_http_app()
+    if mcp_server.watcher and mcp_server.watcher.list_triggers():
+        mcp_server.watcher.start()
+
+    logging.info(f"Worker {index} (pid {os.getpid()}) serving {mcp_server.mcp.settings.streamable_http_path}")
+    server = uvicorn.Server(uvicorn.Config(app, log_level=mcp_server.mcp.settings.log_level.lower()))
+    server.run(sockets=[sock])
+
+
+def serve(workers=config.MCP_WORKERS, host=config.MCP_HOST, port=config.MCP_PORT):
+    """Start the cache manager and the worker processes, then wait for them"""
+    sock = _bind_socket(host, port)
+    manager = CacheManager()
+    manager.start()
+    shared_cache = manager.LocalTTLCache(config.SHARED_CACHE_MAX_ENTRIES)
+
+    ctx = multiprocessing.get_context('fork')
+    processes = []
+    for index in range(workers):
+        process = ctx.Process(target=_run_worker, args=(sock, shared_cache, index), name=f"mcp-worker-{index}")
+        process.start()
+        processes.append(process)
+    logging.info(f"Started {workers} MCP workers on http://{host}:{port}")
+
+    try:
+        for process in processes:
+            process.join()
+    except KeyboardInterrupt:
+        logging.info("Shutting down MCP workers")
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            process.join()
+    finally:
+        sock.close()
+        manager.shutdown()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the MCP server as several worker processes sharing one socket.")
+    parser.add_argument("--workers", type=int, default=config.MCP_WORKERS, help="Number of worker processes")
+    parser.add_argument("--host", default=config.MCP_HOST)
+    parser.add_argument("--port", type=int, default=config.MCP_PORT)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    serve(args.workers, args.host, args.port)
@@ -0,0 +1,105 @@
+import threading
+import time
+import logging
+from collections import OrderedDict
+
+
+class OrderTracker:
+    """Tracks placed orders while their balance reconciliation runs in the background.
+
+    place_order hands the acknowledged order here and returns immediately; a
+    daemon thread then waits for balances to reflect the fill. State is kept
+    in memory for the most recent orders and read back by get_order_status.
+    """
+
+    def __init__(self, max_orders=200, max_events=50):
+        self.max_orders = max_orders
+        self.max_events = max_events
+        self._orders = OrderedDict()
+        self._lock = threading.Lock()
+
+    def track(self, order, expectation, reconcile_fn, notify=None, on_complete=None):
+        """Record an acknowledged order and start reconciling its balances.
+        reconcile_fn(expectation, progress_callback=...) should block until done.
+        notify, if given, receives every progress message as a string.
+        on_complete, if given, is called with the final state once reconciliation ends.
+        """
+        order_id = order['orderId']
+        now = time.time()
+        state = {
+            'orderId': order_id,
+            'symbol': order.get('symbol'),
+            'side': order.get('side'),
+            'status': order.get('status'),
+            'executedQty': order.get('executedQty'),
+            'cummulativeQuoteQty': order.get('cummulativeQuoteQty'),
+            'reconciliation': 'PENDING' if expectation else 'SKIPPED',
+            'expectation': expectation,
+            'balances_matched': None,
+            'events': [],
+            'submitted_at': now,
+            'updated_at': now,
+        }
+        with self._lock:
+            self._orders[order_id] = state
+            while len(self._orders) > self.max_orders:
+                self._orders.popitem(last=False)
+
+        if not expectation:
+            return state
+
+        def progress(message):
+            self._add_event(order_id, message)
+            if notify:
+                try:
+                    notify(f"Order {order_id}: {message}")
+                except Exception as e:
+                    logging.debug(f"Could not deliver progress for order {order_id}: {e}")
+
+        def run():
+            self._update(order_id, reconciliation='RUNNING')
+            try:
+                matched = reconcile_fn(expectation, progress_callback=progress)
+                done = all(matched.values()) if matched else False
+                self._update(order_id, reconciliation='DONE' if done else 'TIMEOUT', balances_matched=matched)
+                progress("reconciliation finished" if done else "reconciliation timed out; check balances manually")
+            except Exception as e:
+                logging.error(f"Error reconciling order {order_id}: {e}")
+                self._update(order_id, reconciliation='FAILED')
+                progress(f"reconciliation failed: {e}")
+            if on_complete:
+                try:
+                    on_complete(self.get(order_id))
+                except Exception as e:
+                    logging.error(f"Error in completion callback for order {order_id}: {e}")
+
+        threading.Thread(target=run, name=f"reconcile-{order_id}", daemon=True).start()
+        return state
+
+    def get(self, order_id):
+        """Return a copy of the tracked state for an order, or None"""
+        with self._lock:
+            state = self._orders.get(order_id)
+            return dict(state, events=list(state['events'])) if state else None
+
+    def recent(self, limit=10):
+        """Return copies of the most recently tracked orders, newest first"""
+        with self._lock:
+            states = list(self._orders.values())[-limit:]
+            return [dict(s, events=list(s['events'])) for s in reversed(states)]
+
+    def _add_event(self, order_id, message):
+        with self._lock:
+            state = self._orders.get(order_id)
+            if state:
+                state['events'].append(message)
+                # Keep the latest progress messages of a long reconciliation
+                del state['events'][:-self.max_events]
+                state['updated_at'] = time.time()
+
+    def _update(self, order_id, **fields):
+        with self._lock:
+            state = self._orders.get(order_id)
+            if state:
+                state.update(fields)
+                state['updated_at'] = time.time()
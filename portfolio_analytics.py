@@ -0,0 +1,110 @@
+import warnings
+
+import numpy as np
+
+YEAR_MS = 365 * 24 * 60 * 60 * 1000
+
+
+def align_closes(series):
+    """Put the close prices of {symbol: klines} on one timestamp grid.
+    Gaps are forward-filled and the grid starts at the first candle where every
+    symbol has a price. Returns (open_times, closes[T, N], symbols).
+    """
+    symbols = list(series)
+    times = [np.array([k[0] for k in series[s]], dtype=np.int64) for s in symbols]
+    grid = np.unique(np.concatenate(times))
+
+    closes = np.full((len(grid), len(symbols)), np.nan)
+    for j, (symbol, symbol_times) in enumerate(zip(symbols, times)):
+        closes[np.searchsorted(grid, symbol_times), j] = np.array([k[4] for k in series[symbol]], dtype=np.float64)
+
+    # Forward fill: each cell takes the row index of the latest price at or above it
+    present = ~np.isnan(closes)
+    rows = np.where(present, np.arange(len(grid))[:, None], 0)
+    np.maximum.accumulate(rows, axis=0, out=rows)
+    closes = closes[rows, np.arange(len(symbols))]
+
+    start = int(np.argmax(present, axis=0).max())
+    return grid[start:], closes[start:], symbols
+
+
+def _windowed(values, window):
+    """Sums of every trailing `window` rows, from cumulative sums"""
+    sums = np.cumsum(values, axis=0)
+    sums = np.concatenate([np.zeros((1,) + values.shape[1:]), sums])
+    return sums[window:] - sums[:-window]
+
+
+def _clean(value, decimals=4):
+    value = float(value)
+    return None if np.isnan(value) or np.isinf(value) else round(value, decimals)
+
+
+def analyze(times, closes, symbols, benchmark, window, interval_ms):
+    """Volatility, beta and correlation against the benchmark (full period and rolling
+    over `window` candles), drawdowns and the latest-window correlation matrix, all
+    computed over the whole [T, N] close matrix at once.
+    """
+    if len(closes) < window + 1:
+        raise ValueError(f"Need at least {window + 1} aligned candles, got {len(closes)}")
+    b = symbols.index(benchmark)
+    annualize = np.sqrt(YEAR_MS / interval_ms)
+    returns = np.diff(np.log(closes), axis=0)
+    bench = returns[:, b:b + 1]
+
+    with np.errstate(divide='ignore', invalid='ignore'), warnings.catch_warnings():
+        # Flat (forward-filled) windows give NaN betas/correlations, reported as None
+        warnings.simplefilter('ignore', RuntimeWarning)
+        # Full period
+        volatility = returns.std(axis=0, ddof=1) * annualize
+        centered = returns - returns.mean(axis=0)
+        cov_b = (centered * centered[:, b:b + 1]).sum(axis=0) / (len(returns) - 1)
+        var = centered.var(axis=0, ddof=0) * len(returns) / (len(returns) - 1)
+        beta = cov_b / var[b]
+        corr_b = cov_b / np.sqrt(var * var[b])
+
+        # Rolling over `window` returns, from cumulative sums (one pass per statistic)
+        sum_x = _windowed(returns, window)
+        sum_xx = _windowed(returns * returns, window)
+        sum_xb = _windowed(returns * bench, window)
+        roll_var = np.maximum((sum_xx - sum_x * sum_x / window) / (window - 1), 0)
+        roll_cov = (sum_xb - sum_x * sum_x[:, b:b + 1] / window) / (window - 1)
+        roll_beta = roll_cov / roll_var[:, b:b + 1]
+        roll_corr = roll_cov / np.sqrt(roll_var * roll_var[:, b:b + 1])
+        roll_vol = np.sqrt(roll_var[-1]) * annualize
+        beta_range = np.nanmin(roll_beta, axis=0), np.nanmax(roll_beta, axis=0)
+        corr_range = np.nanmin(roll_corr, axis=0), np.nanmax(roll_corr, axis=0)
+
+        # Drawdown from the running peak close
+        drawdown = closes / np.maximum.accumulate(closes, axis=0) - 1
+        max_drawdown = drawdown.min(axis=0)
+        total_return = closes[-1] / closes[0] - 1
+
+        matrix = np.corrcoef(returns[-window:], rowvar=False)
+
+    stats = {}
+    for j, symbol in enumerate(symbols):
+        stats[symbol] = {
+            'return_pct': _clean(total_return[j] * 100, 2),
+            'volatility_ann_pct': _clean(volatility[j] * 100, 2),
+            'rolling_volatility_ann_pct': _clean(roll_vol[j] * 100, 2),
+            'beta': _clean(beta[j]),
+            'rolling_beta': {'latest': _clean(roll_beta[-1, j]), 'min': _clean(beta_range[0][j]),
+                             'max': _clean(beta_range[1][j])},
+            'correlation': _clean(corr_b[j]),
+            'rolling_correlation': {'latest': _clean(roll_corr[-1, j]), 'min': _clean(corr_range[0][j]),
+                                    'max': _clean(corr_range[1][j])},
+            'max_drawdown_pct': _clean(max_drawdown[j] * 100, 2),
+            'current_drawdown_pct': _clean(drawdown[-1, j] * 100, 2),
+        }
+
+    return {
+        'benchmark': benchmark,
+        'candles': len(closes),
+        'start': int(times[0]),
+        'end': int(times[-1]),
+        'window': window,
+        'symbols': stats,
+        'correlation_matrix': {s: {t: _clean(matrix[i, k], 3) for k, t in enumerate(symbols)}
+                               for i, s in enumerate(symbols)},
+    }
@@ -0,0 +1,129 @@
+"""
+Replay a recorded upstream cassette through every MCP tool and report per-tool timings.
+
+Record a cassette against live Binance/Base first:
+    UPSTREAM_TRAFFIC_MODE=record UPSTREAM_CASSETTE=run.jsonl.gz python replay_bench.py --live
+
+Then profile deterministically, with the original or zero upstream latency:
+    python replay_bench.py --cassette run.jsonl.gz --latency zero --iterations 20
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import time
+
+# Tool arguments used for each run; mirrors tests/test_mcp_registration.py
+DEFAULT_TOOL_ARGS = {
+    "get_market_price": {"symbol": "BTCUSDT"},
+    "get_account_balance": {"asset": "USDT"},
+    "read_bot_logs": {"lines": 5, "log_type": "general"},
+    "fetch_chart_data": {"symbol": "BTCUSDT", "interval": "1h", "limit": 5},
+    "calculate_indicators": {"symbol": "BTCUSDT", "interval": "1h", "limit": 100},
+    "optimize_strategy": {"symbol": "BTCUSDT", "interval": "4h", "limit": 500, "samples": 20},
+    "scan_market": {"quote_asset": "USDT", "top_n": 10},
+    "portfolio_analytics": {"symbols": ["BTCUSDT", "ETHUSDT"], "interval": "1h", "limit": 200},
+    # refresh=False reads the local trade store only; catching up is ingest_agg_trades' job
+    "get_vwap": {"symbol": "BTCUSDT", "refresh": False},
+    "get_volume_profile": {"symbol": "BTCUSDT", "refresh": False},
+    "get_trade_imbalance": {"symbol": "BTCUSDT", "refresh": False},
+    "get_symbol_rules": {"symbol": "BTCUSDT"},
+    "get_futures_positions": {"symbol": "BTCUSDT"},
+    "adjust_leverage": {"symbol": "BTCUSDT", "leverage": 7},
+    "set_margin_type": {"symbol": "BTCUSDT", "margin_type": "ISOLATED"},
+    "place_futures_order": {"symbol": "BTCUSDT", "side": "BUY", "quantity": 0.001},
+    "place_order": {"symbol": "BTCUSDT", "side": "BUY", "quantity": 0.0001},
+    "register_trigger": {"symbol": "BTCUSDT", "condition": "price_crosses_above", "value": 1_000_000},
+    "ingest_agg_trades": {"symbol": "BTCUSDT", "max_pages": 1},
+    "run_profiler": {"seconds": 1.0},
+}
+
+# Tools that change exchange or server state (or, like run_profiler, just wait);
+# only run when explicitly requested. A --live record run must not move leverage or place orders.
+STATE_CHANGING_TOOLS = {
+    "place_order", "place_futures_order", "adjust_leverage", "set_margin_type",
+    "register_trigger", "remove_trigger", "ingest_agg_trades", "run_profiler",
+}
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Replay upstream traffic through all MCP tools and time them.")
+    parser.add_argument("--cassette", default="upstream_cassette.jsonl.gz", help="Cassette file to replay")
+    parser.add_argument("--latency", choices=["original", "zero"], default="original",
+                        help="Serve responses with their recorded latency or instantly")
+    parser.add_argument("--iterations", type=int, default=5, help="Calls per tool")
+    parser.add_argument("--tools", default="", help="Comma-separated subset of tools to run")
+    parser.add_argument("--args", default="", help="JSON object overriding tool arguments, keyed by tool name")
+    parser.add_argument("--include-state-changing", "--include-orders", dest="include_state_changing",
+                        action="store_true", help="Also run tools that place orders or change account/server state")
+    parser.add_argument("--live", action="store_true",
+                        help="Do not force replay mode (use with UPSTREAM_TRAFFIC_MODE=record to capture a cassette)")
+    return parser.parse_args()
+
+
+async def run(args):
+    # Imported here so the traffic mode is configured before clients are created
+    from mcp_server import mcp
+
+    tool_args = dict(DEFAULT_TOOL_ARGS)
+    if args.args:
+        tool_args.update(json.loads(args.args))
+    selected = set(t for t in args.tools.split(",") if t)
+
+    timings = {}
+    errors = {}
+    for tool in await mcp.list_tools():
+        if selected and tool.name not in selected:
+            continue
+        if tool.name in STATE_CHANGING_TOOLS and not args.include_state_changing:
+            continue
+        kwargs = tool_args.get(tool.name, {})
+        timings[tool.name] = []
+        errors[tool.name] = 0
+        for _ in range(args.iterations):
+            start = time.perf_counter()
+            try:
+                results = await mcp.call_tool(tool.name, arguments=kwargs)
+                contents = results[0] if isinstance(results, tuple) else results
+                text = "".join(getattr(c, "text", "") for c in contents)
+                if text.startswith("Error"):
+                    errors[tool.name] += 1
+            except Exception:
+                errors[tool.name] += 1
+            timings[tool.name].append((time.perf_counter() - start) * 1000)
+    return timings, errors
+
+
+def report(timings, errors):
+    print(f"{'tool':<28}{'calls':>6}{'errors':>8}{'min ms':>10}{'median ms':>11}{'p95 ms':>10}{'max ms':>10}")
+    for name, samples in timings.items():
+        ordered = sorted(samples)
+        p95 = ordered[min(len(ordered) - 1, int(round(0.95 * (len(ordered) - 1))))]
+        print(f"{name:<28}{len(samples):>6}{errors[name]:>8}{ordered[0]:>10.2f}"
+              f"{statistics.median(ordered):>11.2f}{p95:>10.2f}{ordered[-1]:>10.2f}")
+
+
+def main():
+    args = parse_args()
+    if not args.live:
+        if not os.path.exists(args.cassette):
+            print(f"Cassette {args.cassette} not found.")
+            sys.exit(1)
+        os.environ["UPSTREAM_TRAFFIC_MODE"] = "replay"
+        os.environ["UPSTREAM_CASSETTE"] = args.cassette
+        os.environ["UPSTREAM_REPLAY_LATENCY"] = args.latency
+
+    timings, errors = asyncio.run(run(args))
+    report(timings, errors)
+
+    import traffic_recorder
+    replayer = traffic_recorder.active()
+    if isinstance(replayer, traffic_recorder.TrafficReplayer):
+        print(f"\nReplay misses (requests not found in cassette): {replayer.misses}")
+    traffic_recorder.uninstall()
+
+
+if __name__ == "__main__":
+    main()
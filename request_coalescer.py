@@ -0,0 +1,138 @@
+import threading
+import time
+import logging
+
+
+class LocalTTLCache:
+    """Result cache with a per-entry expiry time.
+
+    Used in-process by default; multi_worker.py also serves one instance from a
+    manager process so every server worker shares the same entries.
+    """
+
+    def __init__(self, max_entries=10000):
+        self.max_entries = max_entries
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            return value
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            now = time.monotonic()
+            if len(self._entries) >= self.max_entries:
+                # Drop expired entries first; if still full, evict the oldest inserted
+                for k in [k for k, (expires_at, _) in self._entries.items() if expires_at < now]:
+                    del self._entries[k]
+                if len(self._entries) >= self.max_entries:
+                    del self._entries[next(iter(self._entries))]
+            self._entries[key] = (now + ttl, value)
+
+    def size(self):
+        with self._lock:
+            return len(self._entries)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class _InFlight:
+    """A single upstream call that concurrent callers wait on"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+
+
+class RequestCoalescer:
+    """Single-flight layer for read-only upstream calls.
+
+    Concurrent calls with the same key share one upstream request and its
+    result. When a ttl is given, successful results are also reused for that
+    many seconds so bursts arriving back-to-back don't hit the exchange again.
+    """
+
+    def __init__(self, cache=None):
+        self.cache = cache if cache is not None else LocalTTLCache()
+        self._in_flight = {}
+        self._lock = threading.Lock()
+        self._stats = {
+            'calls': 0,
+            'upstream': 0,
+            'shared': 0,
+            'cache_hits': 0,
+            'errors': 0,
+        }
+
+    def call(self, key, fn, *args, ttl=0, **kwargs):
+        """Run fn(*args, **kwargs) once per key, sharing the result with concurrent callers"""
+        with self._lock:
+            self._stats['calls'] += 1
+
+        if ttl > 0:
+            cached = self.cache.get(key)
+            if cached is not None:
+                with self._lock:
+                    self._stats['cache_hits'] += 1
+                return cached
+
+        with self._lock:
+            flight = self._in_flight.get(key)
+            leader = flight is None
+            if leader:
+                flight = _InFlight()
+                self._in_flight[key] = flight
+                self._stats['upstream'] += 1
+            else:
+                flight.waiters += 1
+                self._stats['shared'] += 1
+
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.result
+
+        try:
+            flight.result = fn(*args, **kwargs)
+            # Failed lookups in this codebase come back as None; never reuse those
+            if ttl > 0 and flight.result is not None:
+                self.cache.set(key, flight.result, ttl)
+            return flight.result
+        except Exception as e:
+            flight.error = e
+            with self._lock:
+                self._stats['errors'] += 1
+            raise
+        finally:
+            with self._lock:
+                self._in_flight.pop(key, None)
+            flight.done.set()
+            if flight.waiters:
+                logging.debug(f"Coalesced {flight.waiters} concurrent call(s) for {key}")
+
+    def stats(self):
+        """Return call counters and the resulting dedup ratio"""
+        with self._lock:
+            stats = dict(self._stats)
+        # Dedup ratio: logical calls served per upstream request
+        stats['dedup_ratio'] = round(stats['calls'] / stats['upstream'], 2) if stats['upstream'] else 0.0
+        stats['in_flight'] = len(self._in_flight)
+        return stats
+
+    def reset_stats(self):
+        with self._lock:
+            for name in self._stats:
+                self._stats[name] = 0
@@ -0,0 +1,275 @@
+import contextlib
+import itertools
+import logging
+import os
+import sys
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import shared_memory
+from multiprocessing.context import ForkServerContext, ForkServerProcess
+
+import numpy as np
+import pandas as pd
+
+import config
+
+# Columns of the shared price array
+HIGH, LOW, CLOSE = range(3)
+
+# Default parameter grids; SL/TP percentages are centred on the values in config
+DEFAULT_GRIDS = {
+    'rsi_reversion': {
+        'rsi_period': [7, 14, 21],
+        'rsi_low': [20, 25, 30, 35],
+        'rsi_high': [60, 65, 70, 75],
+        'stop_loss_pct': [config.STOP_LOSS_PERCENTAGE * f for f in (0.5, 1, 2)],
+        'take_profit_pct': [config.TAKE_PROFIT_PERCENTAGE * f for f in (0.5, 1, 2)],
+    },
+    'ema_cross': {
+        'fast_span': [5, 9, 12, 20],
+        'slow_span': [26, 50, 100],
+        'stop_loss_pct': [config.STOP_LOSS_PERCENTAGE * f for f in (0.5, 1, 2)],
+        'take_profit_pct': [config.TAKE_PROFIT_PERCENTAGE * f for f in (0.5, 1, 2)],
+    },
+}
+
+# One pool reused across optimize calls, replaced only when the worker count changes
+_pool = None
+_pool_workers = None
+_pool_lock = threading.Lock()
+
+
+def _signals(strategy, close, params):
+    """Boolean entry/exit arrays for a long-only strategy"""
+    series = pd.Series(close)
+    if strategy == 'rsi_reversion':
+        # Same RSI definition as indicators.rsi
+        change = series.diff()
+        period = int(params['rsi_period'])
+        gain = change.where(change > 0, 0).rolling(window=period).mean()
+        loss = (-change.where(change < 0, 0)).rolling(window=period).mean()
+        rsi = (100 - (100 / (1 + gain / loss))).to_numpy()
+        return rsi < params['rsi_low'], rsi > params['rsi_high']
+    if strategy == 'ema_cross':
+        fast = series.ewm(span=int(params['fast_span']), adjust=False).mean().to_numpy()
+        slow = series.ewm(span=int(params['slow_span']), adjust=False).mean().to_numpy()
+        above = fast > slow
+        crossed_up = above & ~np.r_[False, above[:-1]]
+        crossed_down = ~above & np.r_[False, above[:-1]]
+        return crossed_up, crossed_down
+    raise ValueError(f"Unknown strategy: {strategy}")
+
+
+def backtest_segments(prices, strategy, params, bounds):
+    """Simulate the strategy on each [start, end) segment and return per-segment stats.
+    Indicators are computed over the whole series so every segment has warmed-up values.
+    """
+    entries, exits = _signals(strategy, prices[:, CLOSE], params)
+    fee = config.TRADING_FEE_PERCENTAGE / 100
+    stop_loss = params['stop_loss_pct'] / 100
+    take_profit = params['take_profit_pct'] / 100
+    high, low, close = prices[:, HIGH], prices[:, LOW], prices[:, CLOSE]
+
+    results = []
+    for start, end in bounds:
+        equity = 1.0
+        peak = 1.0
+        max_drawdown = 0.0
+        trades = wins = 0
+        entry = None
+        for t in range(start, end):
+            if entry is None:
+                if entries[t]:
+                    entry = close[t]
+                continue
+            exit_price = None
+            if low[t] <= entry * (1 - stop_loss):
+                exit_price = entry * (1 - stop_loss)
+            elif high[t] >= entry * (1 + take_profit):
+                exit_price = entry * (1 + take_profit)
+            elif exits[t] or t == end - 1:
+                exit_price = close[t]
+            if exit_price is not None:
+                trade_return = (exit_price / entry) * (1 - fee) ** 2
+                equity *= trade_return
+                trades += 1
+                wins += trade_return > 1
+                peak = max(peak, equity)
+                max_drawdown = max(max_drawdown, 1 - equity / peak)
+                entry = None
+        results.append({
+            'return_pct': float((equity - 1) * 100),
+            'trades': trades,
+            'win_rate': float(wins / trades) if trades else 0.0,
+            'max_drawdown_pct': float(max_drawdown * 100),
+        })
+    return results
+
+
+def _run_batch(name, shape, strategy, param_sets, bounds):
+    """Map the shared price array without copying it and backtest a batch of parameter sets"""
+    shm = shared_memory.SharedMemory(name=name)
+    try:
+        prices = np.ndarray(shape, dtype=np.float64, buffer=shm.buf)
+        results = [backtest_segments(prices, strategy, params, bounds) for params in param_sets]
+        del prices  # close() fails while a view of the buffer is alive
+        return results
+    finally:
+        shm.close()
+
+
+@contextlib.contextmanager
+def _as_main_module():
+    """Make this module __main__ while a worker's start-up data is captured.
+
+    Workers re-import whatever __main__ is. Run as `python mcp_server.py`, that
+    would repeat the server's import-time setup (client, journal, recorders,
+    watcher) in every worker; this module has no such side effects.
+    """
+    main = sys.modules['__main__']
+    sys.modules['__main__'] = sys.modules[__name__]
+    try:
+        yield
+    finally:
+        sys.modules['__main__'] = main
+
+
+class _WorkerProcess(ForkServerProcess):
+    def start(self):
+        with _as_main_module():
+            super().start()
+
+
+class _WorkerContext(ForkServerContext):
+    """Forkserver context whose workers import only this module.
+
+    The server runs other threads (event loop, streams, reconcilers); forking it
+    could copy a held lock into the workers, so they start from the
+    single-threaded fork server instead.
+    """
+    Process = _WorkerProcess
+
+
+def _get_pool(workers):
+    global _pool, _pool_workers
+    with _pool_lock:
+        if _pool is None or _pool_workers != workers:
+            if _pool is not None:
+                _pool.shutdown(wait=False)
+            context = _WorkerContext()
+            context.set_forkserver_preload([__name__])
+            _pool = ProcessPoolExecutor(max_workers=workers, mp_context=context)
+            _pool_workers = workers
+        return _pool
+
+
+def _reset_pool(pool):
+    """Drop a pool whose worker died so the next call starts a fresh one"""
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+
+
+def parameter_sets(grid, samples=0, seed=0):
+    """Expand a grid into parameter dicts; if samples > 0, draw that many at random"""
+    names = list(grid)
+    combos = [dict(zip(names, values)) for values in itertools.product(*(grid[n] for n in names))]
+    # EMA crosses need the fast average to be faster than the slow one
+    combos = [c for c in combos if c.get('fast_span', 0) < c.get('slow_span', 1)]
+    if samples and samples < len(combos):
+        rng = np.random.default_rng(seed)
+        combos = [combos[i] for i in sorted(rng.choice(len(combos), size=samples, replace=False))]
+    return combos
+
+
+def walk_forward_bounds(length, folds):
+    """Split range(length) into folds + 1 consecutive segments"""
+    edges = np.linspace(0, length, folds + 2).astype(int)
+    return list(zip(edges[:-1].tolist(), edges[1:].tolist()))
+
+
+def summarize(param_sets, segment_results, folds, top_n):
+    """Rank parameter sets on the first `folds` segments and score them on the last.
+
+    The last segment is never used to rank or select, so each set's
+    out_of_sample_return_pct is a true holdout. The walk-forward section picks
+    the best set on segment i and reports its return on segment i + 1.
+    """
+    ranked = []
+    for params, segments in zip(param_sets, segment_results):
+        returns = [s['return_pct'] for s in segments]
+        ranked.append({
+            'params': params,
+            'in_sample_return_pct': round(float(np.mean(returns[:folds])), 3),
+            'out_of_sample_return_pct': round(float(returns[folds]), 3),
+            'trades': sum(s['trades'] for s in segments),
+            'worst_drawdown_pct': round(max(s['max_drawdown_pct'] for s in segments), 3),
+        })
+    ranked.sort(key=lambda r: r['in_sample_return_pct'], reverse=True)
+
+    walk_forward = []
+    for fold in range(folds):
+        best = max(range(len(param_sets)), key=lambda i: segment_results[i][fold]['return_pct'])
+        walk_forward.append({
+            'fold': fold + 1,
+            'params': param_sets[best],
+            'in_sample_return_pct': round(segment_results[best][fold]['return_pct'], 3),
+            'out_of_sample_return_pct': round(segment_results[best][fold + 1]['return_pct'], 3),
+        })
+
+    return {
+        'top': ranked[:top_n],
+        'walk_forward': walk_forward,
+        'walk_forward_oos_return_pct': round(float(np.mean([w['out_of_sample_return_pct'] for w in walk_forward])), 3),
+    }
+
+
+def optimize(klines, strategy, grid=None, samples=0, top_n=5, folds=4, workers=None):
+    """Sweep parameter sets for a strategy over klines across a process pool.
+
+    The series is cut into folds + 1 segments. Parameter sets are ranked by
+    mean return over the first `folds` segments and reported with their
+    return on the held-out last segment. The walk-forward section picks the
+    best set on segment i and reports how that choice did on segment i + 1.
+    """
+    if strategy not in DEFAULT_GRIDS:
+        raise ValueError(f"Unknown strategy '{strategy}'. Available: {', '.join(DEFAULT_GRIDS)}")
+    unknown = set(grid or {}) - set(DEFAULT_GRIDS[strategy])
+    if unknown:
+        raise ValueError(f"Unknown parameters for {strategy}: {', '.join(sorted(unknown))}. "
+                         f"Available: {', '.join(DEFAULT_GRIDS[strategy])}")
+    grid = dict(DEFAULT_GRIDS[strategy], **(grid or {}))
+    param_sets = parameter_sets(grid, samples)
+    if not param_sets:
+        raise ValueError("Parameter grid is empty")
+
+    prices = np.array([k[2:5] for k in klines], dtype=np.float64)
+    bounds = walk_forward_bounds(len(prices), folds)
+    workers = workers or os.cpu_count() or 1
+
+    shm = shared_memory.SharedMemory(create=True, size=prices.nbytes)
+    try:
+        np.ndarray(prices.shape, dtype=np.float64, buffer=shm.buf)[:] = prices
+        # Several batches per worker keep every core busy until the end
+        batch_size = max(1, len(param_sets) // (workers * 4))
+        batches = [param_sets[i:i + batch_size] for i in range(0, len(param_sets), batch_size)]
+        pool = _get_pool(workers)
+        try:
+            futures = [pool.submit(_run_batch, shm.name, prices.shape, strategy, batch, bounds) for batch in batches]
+            segment_results = [r for f in futures for r in f.result()]
+        except BrokenProcessPool:
+            _reset_pool(pool)
+            raise
+    finally:
+        shm.close()
+        shm.unlink()
+    logging.info(f"Optimized {strategy}: {len(param_sets)} parameter sets x {len(bounds)} segments on {workers} workers")
+
+    return {
+        'strategy': strategy,
+        'candles': len(prices),
+        'parameter_sets': len(param_sets),
+        **summarize(param_sets, segment_results, folds, top_n),
+    }
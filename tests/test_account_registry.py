@@ -0,0 +1,106 @@
+import sys
+import os
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from account_registry import AccountRegistry, BudgetedAdapter, RequestBudget, parse_accounts
+
+
+class FakeClient:
+    def __init__(self):
+        self.session = requests.Session()
+        self.timestamp_offset = 0
+
+
+class FakeTrader:
+    def __init__(self, api_key, api_secret):
+        self.api_key = api_key
+        self.client = FakeClient()
+
+    def get_account_balance(self, asset):
+        if self.api_key == 'broken':
+            raise RuntimeError("invalid key")
+        time.sleep(0.05)
+        return {'free': 1.0, 'locked': 0.0, 'total': 1.0}
+
+
+def test_parse_accounts_reads_per_account_keys():
+    env = {
+        'BINANCE_ACCOUNTS': 'alpha, sub-2,missing',
+        'BINANCE_API_KEY_ALPHA': 'ka', 'BINANCE_SECRET_KEY_ALPHA': 'sa',
+        'BINANCE_API_KEY_SUB_2': 'kb', 'BINANCE_SECRET_KEY_SUB_2': 'sb',
+    }
+    assert parse_accounts(env) == {'alpha': ('ka', 'sa'), 'sub-2': ('kb', 'sb')}
+
+
+def test_accounts_connect_lazily_with_their_own_session():
+    default = FakeTrader('main', 'secret')
+    registry = AccountRegistry(default, credentials={'alpha': ('ka', 'sa')}, trader_factory=FakeTrader)
+    assert registry.names() == ['default', 'alpha']
+
+    alpha = registry.get('alpha')
+    assert registry.get('alpha') is alpha
+    assert registry.get('').trader is default
+    assert alpha.trader.client.session is not default.client.session
+    assert isinstance(alpha.trader.client.session.get_adapter('https://api.binance.com'), BudgetedAdapter)
+
+    try:
+        registry.get('nope')
+        assert False, "expected KeyError"
+    except KeyError:
+        pass
+
+
+def test_fan_out_runs_concurrently_and_reports_errors():
+    credentials = {f'sub{i}': (f'k{i}', 's') for i in range(4)}
+    credentials['bad'] = ('broken', 's')
+    registry = AccountRegistry(FakeTrader('main', 'secret'), credentials=credentials, trader_factory=FakeTrader)
+
+    start = time.perf_counter()
+    results = registry.fan_out(lambda account: account.get_balance('USDT'))
+    elapsed = time.perf_counter() - start
+
+    assert set(results) == {'default', 'bad', 'sub0', 'sub1', 'sub2', 'sub3'}
+    assert results['sub2']['total'] == 1.0
+    assert results['bad'].startswith("Error:")
+    # Six 50 ms balance reads overlap instead of running back to back
+    assert elapsed < 0.25
+
+
+def test_request_budget_delays_requests_over_the_rate():
+    budget = RequestBudget(rate=50, burst=2)
+    start = time.perf_counter()
+    for _ in range(5):
+        budget.acquire()
+    # Two requests fit the burst; the other three wait 20 ms each
+    assert time.perf_counter() - start >= 0.05
+    assert budget.waited_seconds > 0
+
+
+def test_only_signed_requests_spend_the_budget(monkeypatch):
+    def send(self, request, **kwargs):
+        response = requests.Response()
+        response.status_code = 200
+        response.headers['x-mbx-used-weight-1m'] = '7'
+        return response
+
+    monkeypatch.setattr(HTTPAdapter, 'send', send)
+    budget = RequestBudget(rate=100, burst=1)
+    adapter = BudgetedAdapter(budget, pool_size=1)
+    public = requests.Request('GET', 'https://api.binance.com/api/v3/klines?symbol=BTCUSDT').prepare()
+    signed = requests.Request('GET', 'https://api.binance.com/api/v3/account?timestamp=1&signature=ab').prepare()
+    order = requests.Request('POST', 'https://api.binance.com/api/v3/order',
+                             data={'symbol': 'BTCUSDT', 'signature': 'ab'}).prepare()
+
+    for _ in range(5):
+        adapter.send(public)
+    assert budget.waited_seconds == 0
+    assert budget.used_weight_1m == 7
+
+    adapter.send(signed)
+    adapter.send(order)
+    assert budget.waited_seconds > 0
@@ -0,0 +1,128 @@
+import sys
+import os
+import time
+
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import agg_trades
+from agg_trades import AggTradeStore, TRADE_DTYPE
+
+
+def make_trades(count, start_id=0, start_time=None):
+    start_time = start_time or int(time.time() * 1000) - count * 100
+    rng = np.random.default_rng(start_id)
+    prices = 100 + np.cumsum(rng.normal(0, 0.05, count))
+    return [{'a': start_id + i, 'p': f"{prices[i]:.2f}", 'q': f"{rng.uniform(0.1, 2):.4f}",
+             'T': start_time + i * 100, 'm': bool(i % 3 == 0)} for i in range(count)]
+
+
+class FakeClient:
+    def __init__(self, trades):
+        self.trades = trades
+        self.requests = []
+
+    def get_aggregate_trades(self, symbol, limit, fromId=None, startTime=None, endTime=None):
+        self.requests.append({'fromId': fromId, 'startTime': startTime, 'endTime': endTime})
+        if fromId is not None:
+            page = [t for t in self.trades if t['a'] >= fromId]
+        else:
+            page = [t for t in self.trades if startTime <= t['T'] <= endTime]
+        return page[:limit]
+
+
+def test_ingest_backfills_then_pages_by_id(tmp_path):
+    client = FakeClient(make_trades(2500))
+    store = AggTradeStore(client, str(tmp_path))
+
+    assert store.ingest('btcusdt', backfill_minutes=60) == 2500
+    assert client.requests[0]['startTime'] is not None
+    assert [r['fromId'] for r in client.requests[1:]] == [1000, 2000]
+
+    client.trades += make_trades(10, start_id=2500, start_time=client.trades[-1]['T'] + 100)
+    assert store.ingest('BTCUSDT') == 10
+    trades = store.load('BTCUSDT')
+    assert isinstance(trades, np.memmap)
+    assert trades['id'].tolist() == list(range(2510))
+
+
+def test_ingest_drops_partial_trailing_record(tmp_path):
+    client = FakeClient(make_trades(5))
+    store = AggTradeStore(client, str(tmp_path))
+    store.ingest('BTCUSDT')
+    with open(store.path('BTCUSDT'), 'ab') as f:
+        f.write(b'\x00' * 7)
+    assert len(store.load('BTCUSDT')) == 5
+
+    client.trades += make_trades(3, start_id=5, start_time=client.trades[-1]['T'] + 100)
+    assert store.ingest('BTCUSDT') == 3
+    assert os.path.getsize(store.path('BTCUSDT')) == 8 * TRADE_DTYPE.itemsize
+
+
+def test_chunked_analytics_match_in_memory_results():
+    trades = agg_trades.trades_to_records(make_trades(10_000))
+    qty, price, maker = trades['qty'], trades['price'], trades['maker']
+
+    result = agg_trades.vwap(trades, chunk_size=777)
+    assert abs(result['vwap'] - (price * qty).sum() / qty.sum()) < 1e-9
+    assert abs(result['sell_volume'] - qty[maker].sum()) < 1e-9
+
+    prices, buy, sell = agg_trades.volume_profile(trades, buckets=20, chunk_size=777)
+    assert len(prices) == 20
+    assert abs(buy.sum() - qty[~maker].sum()) < 1e-9
+    assert abs(sell.sum() - qty[maker].sum()) < 1e-9
+
+    times, buy, sell, bucket_vwap = agg_trades.imbalance_series(trades, 60_000, chunk_size=777)
+    assert times[0] <= trades['time'][0] < times[0] + 60_000
+    assert abs((buy + sell).sum() - qty.sum()) < 1e-9
+    first = trades[trades['time'] < times[1]]
+    assert abs(bucket_vwap[0] - (first['price'] * first['qty']).sum() / first['qty'].sum()) < 1e-9
+
+
+def test_window_slice_is_inclusive():
+    trades = np.zeros(5, dtype=TRADE_DTYPE)
+    trades['time'] = [10, 20, 20, 30, 40]
+    assert agg_trades.window_slice(trades, 20, 30)['time'].tolist() == [20, 20, 30]
+    assert len(agg_trades.window_slice(trades)) == 5
+
+
+def test_bucket_count_is_capped(monkeypatch):
+    trades = np.zeros(2, dtype=TRADE_DTYPE)
+    trades['time'] = [0, 10 * 60_000]
+    trades['price'] = [60_000, 61_000]
+    trades['qty'] = 1.0
+    monkeypatch.setattr(agg_trades.config, 'AGG_TRADES_MAX_BUCKETS', 1000)
+
+    assert len(agg_trades.volume_profile(trades, bucket_size=2.0)[0]) == 501
+    assert len(agg_trades.imbalance_series(trades, 60_000)[0]) == 11
+    for compute in [lambda: agg_trades.volume_profile(trades, bucket_size=1e-6),
+                    lambda: agg_trades.volume_profile(trades, buckets=1001),
+                    lambda: agg_trades.imbalance_series(trades, 100)]:
+        try:
+            compute()
+            assert False, 'expected ValueError'
+        except ValueError:
+            pass
+
+
+def test_ingest_drops_trades_older_than_the_retention(tmp_path):
+    now = int(time.time() * 1000)
+    # Two hours of trades, one every minute
+    client = FakeClient([dict(t, T=now - 120 * 60_000 + i * 60_000) for i, t in enumerate(make_trades(100))])
+    AggTradeStore(client, str(tmp_path), max_age_hours=0).ingest('BTCUSDT', backfill_minutes=121)
+    store = AggTradeStore(client, str(tmp_path), max_age_hours=1)
+    before = store.load('BTCUSDT')
+
+    client.trades += make_trades(5, start_id=100, start_time=now)
+    assert store.ingest('BTCUSDT') == 5
+    trades = store.load('BTCUSDT')
+    assert trades['time'][0] >= now - 60 * 60_000
+    assert trades['id'][-1] == 104
+    # A view mapped before the rewrite still reads the old copy
+    assert before['id'].tolist() == list(range(100))
+
+    # Appends after the swap go to the new file
+    client.trades += make_trades(1, start_id=105, start_time=now + 100)
+    assert store.ingest('BTCUSDT') == 1
+    assert store.load('BTCUSDT')['id'][-1] == 105
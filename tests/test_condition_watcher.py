@@ -0,0 +1,205 @@
+import sys
+import os
+import threading
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from condition_watcher import ConditionWatcher
+from kline_resampler import KlineResampler, INTERVAL_MS, MINUTE_MS
+
+# 2024-01-01 00:00 UTC
+START_MS = 1704067200000
+
+
+def minute_kline(i, close):
+    open_time = START_MS + i * MINUTE_MS
+    return [open_time, str(close), str(close + 1), str(close - 1), str(close), "1.0",
+            open_time + MINUTE_MS - 1, str(close), 1, "0.5", str(close / 2), "0"]
+
+
+class FakeTrader:
+    def __init__(self, closes, interval_closes=None):
+        self.closes = closes
+        self.interval_closes = interval_closes or {}
+        self.requests = []
+
+    def get_market_history(self, symbol, interval, limit):
+        self.requests.append((interval, limit))
+        if interval != '1m':
+            # Candles of `interval` up to the one opening at START_MS
+            interval_ms = INTERVAL_MS[interval]
+            closes = self.interval_closes[interval]
+            rows = []
+            for j, close in enumerate(closes):
+                open_time = START_MS + (j - len(closes) + 1) * interval_ms
+                rows.append([open_time, str(close), str(close + 1), str(close - 1), str(close), "1.0",
+                             open_time + interval_ms - 1, str(close), 1, "0.5", str(close / 2), "0"])
+            return rows[-limit:]
+        rows = [minute_kline(i, c) for i, c in enumerate(self.closes)]
+        return rows[-limit:]
+
+
+def stream_message(i, close, closed):
+    k = minute_kline(i, close)
+    return {'e': 'kline', 'E': k[6], 's': 'BTCUSDT',
+            'k': {'t': k[0], 'o': k[1], 'h': k[2], 'l': k[3], 'c': k[4], 'v': k[5], 'T': k[6],
+                  'q': k[7], 'n': k[8], 'V': k[9], 'Q': k[10], 'x': closed}}
+
+
+def make_watcher(tmp_path, closes=()):
+    return ConditionWatcher(KlineResampler(FakeTrader(list(closes))), path=str(tmp_path / 'triggers.json'))
+
+
+def test_price_cross_fires_once_and_is_removed(tmp_path):
+    watcher = make_watcher(tmp_path)
+    trigger = watcher.add_trigger('btcusdt', 'price_crosses_above', 100.0)
+
+    watcher.evaluate('BTCUSDT', 99.0)
+    watcher.evaluate('BTCUSDT', 99.5)
+    assert watcher.get_events() == []
+
+    watcher.evaluate('BTCUSDT', 100.5)
+    watcher.evaluate('BTCUSDT', 99.0)
+    watcher.evaluate('BTCUSDT', 101.0)
+    events = watcher.get_events()
+    assert [e['trigger_id'] for e in events] == [trigger['id']]
+    assert events[0]['observed'] == 100.5
+    assert watcher.list_triggers() == []
+
+
+def test_triggers_persist_across_restarts(tmp_path):
+    watcher = make_watcher(tmp_path)
+    trigger = watcher.add_trigger('BTCUSDT', 'candle_close', interval='5m', repeat=True)
+
+    reloaded = make_watcher(tmp_path)
+    assert [t['id'] for t in reloaded.list_triggers()] == [trigger['id']]
+    assert reloaded.remove_trigger(trigger['id'])
+    assert make_watcher(tmp_path).list_triggers() == []
+
+
+def test_candle_close_fires_on_interval_boundary(tmp_path):
+    watcher = make_watcher(tmp_path)
+    watcher.add_trigger('BTCUSDT', 'candle_close', interval='5m', repeat=True)
+
+    for i in range(10):
+        watcher.on_kline(stream_message(i, 100.0 + i, closed=False))
+        watcher.on_kline(stream_message(i, 100.0 + i, closed=True))
+
+    # Minutes 4 and 9 close the 00:00 and 00:05 candles
+    assert [e['observed'] for e in watcher.get_events()] == [104.0, 109.0]
+
+
+def test_rsi_threshold_uses_resampled_candles(tmp_path):
+    # Steadily rising 5m closes push RSI to 100
+    closes = [100.0 + i for i in range(5 * 60)]
+    watcher = make_watcher(tmp_path, closes)
+    watcher.add_trigger('BTCUSDT', 'rsi_above', 70, interval='5m', period=14)
+    watcher.add_trigger('BTCUSDT', 'rsi_below', 30, interval='5m', period=14)
+
+    last = len(closes) - 1
+    watcher.on_kline(stream_message(last, closes[-1], closed=True))
+
+    events = watcher.get_events()
+    assert [e['condition'] for e in events] == ['rsi_above']
+    assert events[0]['observed'] > 70
+
+
+def test_rsi_on_intervals_beyond_the_base_window_uses_rest(tmp_path):
+    # 4h x 42 candles does not fit the 1m base window, so the watcher fetches 4h candles directly.
+    # The final 50.0 candle opens at START_MS, after the boundary being evaluated, and must be ignored.
+    closes = [100.0 + j for j in range(60)] + [50.0]
+    trader = FakeTrader([], {'4h': closes})
+    resampler = KlineResampler(trader)
+    assert not resampler.can_derive('4h', 42)
+    watcher = ConditionWatcher(resampler, path=str(tmp_path / 'triggers.json'))
+    watcher.add_trigger('BTCUSDT', 'rsi_above', 70, interval='4h', period=14)
+
+    # The 1m candle closing at START_MS - 1 also closes a 4h candle
+    watcher.on_kline(stream_message(-1, 159.0, closed=True))
+
+    events = watcher.get_events()
+    assert [e['condition'] for e in events] == ['rsi_above']
+    assert events[0]['observed'] > 70
+    assert ('4h', 43) in trader.requests
+
+
+def test_watchers_sharing_a_file_merge_and_elect_one_owner(tmp_path, monkeypatch):
+    # Two server processes: registrations from both survive and only one streams
+    monkeypatch.setattr(ConditionWatcher, '_open_stream', lambda self: False)
+    first, second = make_watcher(tmp_path), make_watcher(tmp_path)
+    a = first.add_trigger('BTCUSDT', 'price_crosses_above', 100.0)
+    b = second.add_trigger('ETHUSDT', 'price_crosses_below', 10.0)
+    assert {t['id'] for t in first.list_triggers()} == {a['id'], b['id']}
+
+    try:
+        assert first.start() == 'owner'
+        assert second.start() == 'standby'
+        first.evaluate('BTCUSDT', 99.0)
+        first.evaluate('BTCUSDT', 101.0)
+        assert [e['trigger_id'] for e in second.get_events()] == [a['id']]
+        assert [t['id'] for t in second.list_triggers()] == [b['id']]
+
+        # The owner lock is released on stop and the standby takes over
+        first.stop()
+        second._step()
+        assert second.role() == 'owner'
+    finally:
+        first.stop()
+        second.stop()
+
+
+def test_stream_messages_are_evaluated_off_the_socket_thread_and_idle_sockets_close(tmp_path, monkeypatch):
+    class FakeStream:
+        def __init__(self):
+            self.callbacks = {}
+            self.stopped = []
+
+        def start_kline_socket(self, callback, symbol, interval):
+            self.callbacks[symbol] = callback
+            return f"{symbol.lower()}@kline_1m"
+
+        def stop_socket(self, conn_key):
+            self.stopped.append(conn_key)
+
+        def stop(self):
+            pass
+
+    stream = FakeStream()
+
+    def open_stream(self):
+        self._stream = stream
+        return True
+
+    monkeypatch.setattr(ConditionWatcher, '_open_stream', open_stream)
+    watcher = make_watcher(tmp_path)
+    watcher.add_trigger('BTCUSDT', 'price_crosses_above', 100.0)
+    kept = watcher.add_trigger('ETHUSDT', 'candle_close', interval='5m', repeat=True)
+    handled = []
+    monkeypatch.setattr(watcher, 'on_kline', lambda msg: handled.append(threading.current_thread().name))
+    try:
+        assert watcher.start() == 'owner'
+        assert set(stream.callbacks) == {'BTCUSDT', 'ETHUSDT'}
+        stream.callbacks['BTCUSDT'](stream_message(0, 99.0, closed=False))
+        deadline = time.monotonic() + 5
+        while not handled and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert handled == ['condition-evaluator']
+
+        # The one-shot BTCUSDT trigger fires, leaving no triggers for that symbol
+        watcher.evaluate('BTCUSDT', 99.0)
+        watcher.evaluate('BTCUSDT', 101.0)
+        assert stream.stopped == ['btcusdt@kline_1m']
+        watcher.remove_trigger(kept['id'])
+        assert stream.stopped == ['btcusdt@kline_1m', 'ethusdt@kline_1m']
+    finally:
+        watcher.stop()
+
+
+def test_trigger_file_is_only_locked_on_first_use(tmp_path):
+    make_watcher(tmp_path).add_trigger('BTCUSDT', 'candle_close')
+    (tmp_path / 'triggers.json.lock').unlink()
+
+    watcher = make_watcher(tmp_path)
+    assert not (tmp_path / 'triggers.json.lock').exists()
+    assert len(watcher.list_triggers()) == 1
@@ -0,0 +1,49 @@
+import sys
+import os
+
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from downsampling import klines_to_array, ohlc_buckets, lttb, downsample
+
+
+def make_klines(n):
+    closes = 100 + np.sin(np.arange(n) / 10.0) * 10
+    return [
+        [1700000000000 + i * 60000, str(c - 0.5), str(c + 1), str(c - 1), str(c), "2.0",
+         1700000059999 + i * 60000, "0", 1, "0", "0", "0"]
+        for i, c in enumerate(closes)
+    ]
+
+
+def test_ohlc_buckets_preserve_range_and_volume():
+    data = klines_to_array(make_klines(5000))
+    reduced = ohlc_buckets(data, 200)
+
+    assert reduced.shape == (200, 6)
+    assert reduced[0, 0] == data[0, 0]
+    assert reduced[0, 1] == data[0, 1]
+    assert reduced[-1, 4] == data[-1, 4]
+    assert reduced[:, 2].max() == data[:, 2].max()
+    assert reduced[:, 3].min() == data[:, 3].min()
+    assert np.isclose(reduced[:, 5].sum(), data[:, 5].sum())
+
+
+def test_lttb_keeps_endpoints_and_real_candles():
+    data = klines_to_array(make_klines(5000))
+    reduced = lttb(data, 200)
+
+    assert reduced.shape == (200, 6)
+    assert reduced[0, 0] == data[0, 0]
+    assert reduced[-1, 0] == data[-1, 0]
+    assert np.all(np.diff(reduced[:, 0]) > 0)
+    assert np.isin(reduced[:, 0], data[:, 0]).all()
+    # The extremes of a smooth series are picked up by the triangle areas
+    assert np.isclose(reduced[:, 4].max(), data[:, 4].max(), atol=0.05)
+
+
+def test_small_series_are_returned_unchanged():
+    data = klines_to_array(make_klines(50))
+    assert downsample(data, 0) is data
+    assert downsample(data, 100, 'lttb') is data
@@ -0,0 +1,82 @@
+import sys
+import os
+import asyncio
+import inspect
+import threading
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import config
+import flight_recorder
+
+
+def test_slow_calls_keep_span_tree(monkeypatch):
+    monkeypatch.setattr(config, 'SLOW_CALL_THRESHOLD_MS', 0)
+    flight_recorder.clear()
+
+    @flight_recorder.traced
+    def tool(symbol: str, limit: int = 5) -> str:
+        with flight_recorder.span('indicators', rows=limit):
+            flight_recorder.sleep(0.01)
+        return symbol
+
+    assert tool('BTCUSDT') == 'BTCUSDT'
+    assert list(inspect.signature(tool).parameters) == ['symbol', 'limit']
+
+    [call] = flight_recorder.slow_calls()
+    assert call['name'] == 'tool'
+    [compute] = call['children']
+    assert compute['name'] == 'indicators' and compute['attrs'] == {'rows': 5}
+    [sleep] = compute['children']
+    assert sleep['kind'] == 'sleep' and sleep['duration_ms'] >= 10
+
+
+def test_fast_calls_and_untraced_spans_are_not_kept(monkeypatch):
+    monkeypatch.setattr(config, 'SLOW_CALL_THRESHOLD_MS', 10_000)
+    flight_recorder.clear()
+
+    @flight_recorder.traced
+    async def tool():
+        # to_thread copies the context, so the span still joins this call
+        await asyncio.to_thread(flight_recorder.sleep, 0)
+
+    asyncio.run(tool())
+    with flight_recorder.span('outside') as s:
+        assert s is None
+    assert flight_recorder.slow_calls() == []
+
+
+def test_span_tree_is_bounded(monkeypatch):
+    monkeypatch.setattr(config, 'SLOW_CALL_THRESHOLD_MS', 0)
+    monkeypatch.setattr(config, 'SLOW_CALL_MAX_SPANS', 3)
+    flight_recorder.clear()
+
+    @flight_recorder.traced
+    def tool():
+        for _ in range(5):
+            with flight_recorder.span('step'):
+                pass
+
+    tool()
+    [call] = flight_recorder.slow_calls()
+    assert len(call['children']) == 3
+    assert call['attrs']['dropped_spans'] == 2
+
+
+def test_profile_collapses_other_thread_stacks():
+    stop = threading.Event()
+
+    def busy_worker():
+        while not stop.is_set():
+            time.sleep(0.001)
+
+    thread = threading.Thread(target=busy_worker, name='busy')
+    thread.start()
+    try:
+        stacks, samples = flight_recorder.profile(0.1, interval=0.005)
+    finally:
+        stop.set()
+        thread.join()
+    assert samples > 0
+    assert any(stack.startswith('busy;') and 'busy_worker' in stack for stack in stacks)
@@ -0,0 +1,190 @@
+import sys
+import os
+import threading
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import futures_trader
+from futures_trader import FuturesTrader
+
+BRACKETS = [
+    {'bracket': 1, 'initialLeverage': 20, 'notionalCap': 5000},
+    {'bracket': 2, 'initialLeverage': 10, 'notionalCap': 25000},
+    {'bracket': 3, 'initialLeverage': 5, 'notionalCap': 100000},
+]
+
+
+class FakeClient:
+    def __init__(self, leverage=5, margin_type='CROSSED', mark_price=100.0):
+        self.leverage = leverage
+        self.margin_type = margin_type
+        self.mark_price = mark_price
+        self.calls = []
+
+    def futures_leverage_bracket(self, symbol):
+        return [{'symbol': symbol, 'brackets': BRACKETS}]
+
+    def futures_symbol_config(self, symbol):
+        self.calls.append('symbol_config')
+        return [{'symbol': symbol, 'leverage': self.leverage, 'marginType': self.margin_type}]
+
+    def futures_change_leverage(self, symbol, leverage):
+        self.calls.append(('change_leverage', leverage))
+        self.leverage = leverage
+        return {'symbol': symbol, 'leverage': leverage}
+
+    def futures_change_margin_type(self, symbol, marginType):
+        self.calls.append(('change_margin_type', marginType))
+        self.margin_type = marginType
+        return {'code': 200}
+
+    def futures_exchange_info(self):
+        return {'symbols': [{'symbol': 'BTCUSDT', 'filters': [
+            {'filterType': 'LOT_SIZE', 'stepSize': '0.001', 'minQty': '0.001', 'maxQty': '1000'},
+            {'filterType': 'MARKET_LOT_SIZE', 'stepSize': '0.001', 'minQty': '0.001', 'maxQty': '1000'},
+            {'filterType': 'MIN_NOTIONAL', 'notional': '5'},
+            {'filterType': 'PRICE_FILTER', 'tickSize': '0.10', 'minPrice': '0.10', 'maxPrice': '1000000'},
+        ]}]}
+
+    def futures_mark_price(self, symbol):
+        return {'markPrice': str(self.mark_price)}
+
+    def futures_create_order(self, **params):
+        self.calls.append(('create_order', params['quantity']))
+        return {'orderId': 1, **params}
+
+    def futures_position_information(self, **params):
+        self.calls.append('position_information')
+        return []
+
+
+class FakeTrader:
+    recv_window = 5000
+
+    def __init__(self, client):
+        self.client = client
+
+    def _force_time_sync(self):
+        pass
+
+
+def make_futures(**kwargs):
+    client = FakeClient(**kwargs)
+    return FuturesTrader(FakeTrader(client)), client
+
+
+def test_unchanged_leverage_and_margin_type_skip_the_request():
+    futures, client = make_futures(leverage=5, margin_type='CROSSED')
+
+    assert futures.change_leverage('BTCUSDT', 5)['unchanged']
+    assert futures.change_margin_type('BTCUSDT', 'CROSS')['unchanged']
+    assert client.calls == ['symbol_config']
+
+    futures.change_leverage('BTCUSDT', 10)
+    assert futures.change_leverage('BTCUSDT', 10)['unchanged']
+    assert client.calls == ['symbol_config', ('change_leverage', 10)]
+
+
+def test_leverage_outside_the_brackets_is_rejected_locally():
+    futures, client = make_futures()
+    assert futures.change_leverage('BTCUSDT', 50) is None
+    assert client.calls == []
+
+
+def test_symbol_config_expires_after_the_ttl(monkeypatch):
+    futures, client = make_futures(leverage=5)
+    assert futures.change_leverage('BTCUSDT', 5)['unchanged']
+
+    # Changed outside the server: the cached 5x is trusted until the TTL passes
+    client.leverage = 7
+    assert futures.change_leverage('BTCUSDT', 5)['unchanged']
+    monkeypatch.setattr(futures_trader.config, 'FUTURES_CONFIG_TTL', 0)
+    assert futures.change_leverage('BTCUSDT', 5) == {'symbol': 'BTCUSDT', 'leverage': 5}
+    assert client.calls[-1] == ('change_leverage', 5)
+
+
+def test_orders_above_the_leverage_bracket_cap_are_rejected():
+    futures, client = make_futures(leverage=10, mark_price=100.0)
+
+    # At 10x the cap is 25000 USDT of notional
+    assert futures.place_order('BTCUSDT', 'BUY', 300) is None
+    assert futures.place_order('BTCUSDT', 'BUY', 200)['quantity'] == '200.0'
+    assert futures.place_order('BTCUSDT', 'BUY', 0.01) is None  # Below the 5 USDT minimum notional
+    assert [c for c in client.calls if c[0] == 'create_order'] == [('create_order', '200.0')]
+
+
+def test_user_events_update_positions_config_and_orders():
+    futures, client = make_futures(leverage=5, margin_type='CROSSED')
+    futures.get_symbol_config('BTCUSDT')
+    futures._stream_ready = True
+
+    futures._handle_user_event({'e': 'ACCOUNT_UPDATE', 'E': 1, 'a': {'P': [
+        {'s': 'BTCUSDT', 'ps': 'BOTH', 'pa': '0.5', 'ep': '100.0', 'up': '1.5', 'mt': 'isolated'}]}})
+    futures._handle_user_event({'e': 'ACCOUNT_CONFIG_UPDATE', 'E': 2, 'ac': {'s': 'BTCUSDT', 'l': 12}})
+    futures._handle_user_event({'e': 'ORDER_TRADE_UPDATE', 'E': 3, 'o': {
+        'i': 42, 's': 'BTCUSDT', 'S': 'BUY', 'o': 'MARKET', 'X': 'FILLED', 'z': '0.5', 'ap': '100.0'}})
+
+    positions = futures.get_positions('BTCUSDT')
+    assert [(p['positionAmt'], p['marginType']) for p in positions] == [(0.5, 'ISOLATED')]
+    assert futures.get_symbol_config('BTCUSDT') == {'leverage': 12, 'marginType': 'ISOLATED'}
+    assert futures.get_order(42)['status'] == 'FILLED'
+
+    futures._handle_user_event({'e': 'listenKeyExpired'})
+    assert not futures._stream_ready
+
+
+def test_limit_prices_must_match_the_tick_size():
+    futures, client = make_futures(leverage=10)
+
+    assert futures.place_order('BTCUSDT', 'BUY', 1, 'LIMIT', 100.05) is None
+    assert futures.place_order('BTCUSDT', 'BUY', 1, 'LIMIT', 0.05) is None  # Below minPrice
+    assert futures.place_order('BTCUSDT', 'BUY', 1, 'LIMIT', 100.3)['price'] == '100.3'
+    assert [c for c in client.calls if c[0] == 'create_order'] == [('create_order', '1.0')]
+
+
+def test_expired_listen_key_restarts_the_user_stream(monkeypatch):
+    import binance
+
+    class FakeStream:
+        started = []
+
+        def __init__(self, api_key, api_secret):
+            self.stopped = threading.Event()
+
+        def start(self):
+            FakeStream.started.append(self)
+
+        def start_futures_user_socket(self, callback):
+            pass
+
+        def stop(self):
+            self.stopped.set()
+
+    monkeypatch.setattr(binance, 'ThreadedWebsocketManager', FakeStream)
+    futures, client = make_futures()
+    client.API_KEY = client.API_SECRET = 'key'
+    assert futures.start_user_stream()
+    first = FakeStream.started[0]
+
+    futures._handle_user_event({'e': 'listenKeyExpired'})
+    assert first.stopped.wait(5)
+    futures.get_positions()
+    assert client.calls.count('position_information') == 2  # Seed, then REST while the stream is down
+
+    assert futures.start_user_stream()
+    assert len(FakeStream.started) == 2 and futures._stream_ready
+
+
+def test_no_user_stream_is_opened_while_replaying(monkeypatch):
+    import binance
+
+    def live_stream(*args):
+        raise AssertionError("websocket opened during replay")
+
+    monkeypatch.setattr(binance, 'ThreadedWebsocketManager', live_stream)
+    monkeypatch.setattr(futures_trader.traffic_recorder, 'replaying', lambda: True)
+    futures, client = make_futures()
+
+    assert not futures.start_user_stream()
+    assert futures.get_positions() == []
+    assert client.calls == ['position_information']
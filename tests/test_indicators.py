@@ -0,0 +1,71 @@
+import sys
+import os
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from indicators import IndicatorEngine, parse_spec
+
+
+def make_df(n=300):
+    rng = np.random.default_rng(7)
+    close = 100 + np.cumsum(rng.normal(0, 1, n))
+    return pd.DataFrame({
+        'open': close,
+        'high': close + rng.uniform(0.1, 1.0, n),
+        'low': close - rng.uniform(0.1, 1.0, n),
+        'close': close,
+        'volume': rng.uniform(1, 10, n),
+    })
+
+
+def test_shared_intermediates_are_computed_once():
+    engine = IndicatorEngine(make_df())
+    for spec in ['macd:12,26,9', 'ema:12', 'ema:26', 'atr:14', 'adx:14', 'bbands:20,2', 'sma:20']:
+        engine.latest(spec)
+
+    assert engine.computed.count(('ema', (12,))) == 1
+    assert engine.computed.count(('ema', (26,))) == 1
+    assert engine.computed.count(('tr', ())) == 1
+    assert engine.computed.count(('atr', (14,))) == 1
+    assert engine.computed.count(('sma', (20,))) == 1
+
+
+def test_only_requested_indicators_are_computed():
+    engine = IndicatorEngine(make_df())
+    label, value = engine.latest('rsi')
+
+    assert label == 'RSI_14'
+    assert 0 <= value <= 100
+    assert {name for name, _ in engine.computed} == {'rsi', 'delta'}
+
+
+def test_default_labels_and_values_match_previous_output():
+    df = make_df()
+    engine = IndicatorEngine(df)
+
+    label, bands = engine.latest('bbands')
+    middle = df['close'].rolling(window=20).mean().iloc[-1]
+    assert label == 'Bollinger_Bands'
+    assert bands['middle_sma20'] == round(middle, 2)
+
+    label, value = engine.latest('macd')
+    line = df['close'].ewm(span=12, adjust=False).mean() - df['close'].ewm(span=26, adjust=False).mean()
+    assert label == 'MACD'
+    assert value['macd'] == round(line.iloc[-1], 4)
+
+    assert engine.latest('sma:500') == ('SMA_500', 'Not enough data')
+
+
+def test_parse_spec_fills_defaults_and_rejects_unknown():
+    assert parse_spec('macd:8') == ('macd', (8, 26, 9))
+    assert parse_spec('BBANDS:20,2.5') == ('bbands', (20, 2.5))
+    assert parse_spec('vwap:0') == ('vwap', (0,))
+    for bad in ['foo', 'tr', 'rsi:1,2', 'atr:0', 'rsi:-3', 'sma:2.5', 'ema:abc', 'bbands:20,0', 'stoch:14,-1']:
+        try:
+            parse_spec(bad)
+            assert False, f'expected ValueError for {bad}'
+        except ValueError:
+            pass
@@ -0,0 +1,158 @@
+import sys
+import os
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from kline_resampler import KlineResampler, MINUTE_MS
+
+# 2024-01-01 00:00 UTC plus 17 minutes, so the series starts mid-candle
+START_MS = 1704067200000 + 17 * MINUTE_MS
+
+
+def minute_kline(i):
+    open_time = START_MS + i * MINUTE_MS
+    price = 100.0 + i
+    return [open_time, str(price), str(price + 2), str(price - 1), str(price + 1), "1.5",
+            open_time + MINUTE_MS - 1, str(150.0), 3, "0.5", "50.0", "0"]
+
+
+class FakeTrader:
+    def __init__(self, minutes):
+        self.minutes = minutes
+        self.calls = 0
+        self.paged = 0
+
+    def get_market_history(self, symbol, interval, limit):
+        self.calls += 1
+        assert interval == '1m'
+        return [minute_kline(i) for i in range(max(0, self.minutes - limit), self.minutes)]
+
+    def get_market_data(self, symbol, interval, limit, start_time=None):
+        self.calls += 1
+        self.paged += 1
+        first = (start_time - START_MS) // MINUTE_MS
+        return [minute_kline(i) for i in range(first, min(self.minutes, first + limit))]
+
+
+def test_derived_candles_align_to_utc_boundaries():
+    trader = FakeTrader(minutes=600)
+    resampler = KlineResampler(trader, refresh_seconds=3600)
+
+    hourly = resampler.get_klines('BTCUSDT', '1h', 5)
+
+    assert len(hourly) == 5
+    assert all(k[0] % (60 * MINUTE_MS) == 0 for k in hourly)
+    first = hourly[0]
+    i0 = (first[0] - START_MS) // MINUTE_MS
+    assert first[1] == 100.0 + i0
+    assert first[2] == 100.0 + i0 + 59 + 2
+    assert first[3] == 100.0 + i0 - 1
+    assert first[4] == 100.0 + i0 + 59 + 1
+    assert np.isclose(first[5], 60 * 1.5)
+    assert first[8] == 60 * 3
+    assert first[6] == first[0] + 60 * MINUTE_MS - 1
+
+
+def test_other_intervals_reuse_the_same_base_series():
+    trader = FakeTrader(minutes=2000)
+    resampler = KlineResampler(trader, refresh_seconds=3600)
+
+    resampler.get_klines('BTCUSDT', '1h', 20)
+    calls = trader.calls
+    resampler.get_klines('BTCUSDT', '15m', 20)
+    resampler.get_klines('BTCUSDT', '5m', 50)
+
+    assert trader.calls == calls
+
+
+def test_ingest_updates_partial_candle_and_appends_new_ones():
+    trader = FakeTrader(minutes=600)
+    resampler = KlineResampler(trader, refresh_seconds=3600)
+    before = resampler.get_klines('BTCUSDT', '1h', 3)
+
+    last = before[-1]
+    minutes_in_last = (START_MS + 600 * MINUTE_MS - last[0]) // MINUTE_MS
+    # Finish the current hour and start the next one
+    resampler.ingest('BTCUSDT', [minute_kline(i) for i in range(600, 600 + 61 - minutes_in_last)])
+    after = resampler.get_klines('BTCUSDT', '1h', 3)
+
+    assert after[-2][0] == last[0]
+    assert after[-2][4] > last[4]
+    assert np.isclose(after[-2][5], 60 * 1.5)
+    assert after[-1][0] == last[0] + 60 * MINUTE_MS
+    assert np.isclose(after[-1][5], 1.5)
+
+
+def test_requests_beyond_the_base_window_are_not_derived():
+    resampler = KlineResampler(FakeTrader(minutes=600), max_base_candles=1000)
+    assert resampler.get_klines('BTCUSDT', '1d', 10) is None
+    assert resampler.get_klines('BTCUSDT', '1M', 10) is None
+
+
+def test_symbols_load_concurrently_and_least_recently_used_are_evicted():
+    # Both fetches must be in flight at once to pass the barrier
+    barrier = threading.Barrier(2, timeout=5)
+
+    class SlowTrader(FakeTrader):
+        def get_market_history(self, symbol, interval, limit):
+            barrier.wait()
+            return super().get_market_history(symbol, interval, limit)
+
+    resampler = KlineResampler(SlowTrader(minutes=600), refresh_seconds=3600, max_symbols=2)
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        results = list(pool.map(lambda s: resampler.get_klines(s, '1h', 5), ['BTCUSDT', 'ETHUSDT']))
+    assert all(len(r) == 5 for r in results)
+
+    barrier = threading.Barrier(1)
+    resampler.get_klines('BTCUSDT', '1h', 5)  # Most recently used
+    resampler.get_klines('SOLUSDT', '1h', 5)
+    assert list(resampler._base) == ['BTCUSDT', 'SOLUSDT']
+    assert all(symbol != 'ETHUSDT' for symbol, _ in resampler._derived)
+
+
+def test_streamed_gap_is_backfilled_over_rest(monkeypatch):
+    monkeypatch.setattr(time, 'time', lambda: (START_MS + 606 * MINUTE_MS) / 1000)
+    trader = FakeTrader(minutes=600)
+    resampler = KlineResampler(trader, refresh_seconds=3600)
+    resampler.get_klines('BTCUSDT', '1m', 10)
+    # Symbols without a base series are not started from a single streamed candle
+    resampler.ingest('ETHUSDT', [minute_kline(600)])
+    assert 'ETHUSDT' not in resampler._base
+
+    # The stream reconnects after missing minutes 600-604
+    trader.minutes = 606
+    resampler.ingest('BTCUSDT', [minute_kline(605)])
+    calls = trader.calls
+    latest = resampler.get_klines('BTCUSDT', '1m', 10)
+
+    assert trader.paged == 1 and trader.calls == calls + 1
+    assert [k[0] for k in latest] == [START_MS + i * MINUTE_MS for i in range(596, 606)]
+
+
+def test_streamed_candles_do_not_postpone_rest_refreshes():
+    trader = FakeTrader(minutes=600)
+    resampler = KlineResampler(trader, refresh_seconds=0)
+    resampler.get_klines('BTCUSDT', '1m', 10)
+    resampler.ingest('BTCUSDT', [minute_kline(600)])
+    calls = trader.calls
+    resampler.get_klines('BTCUSDT', '1m', 10)
+    assert trader.calls == calls + 1
+
+
+def test_series_idle_longer_than_the_base_window_is_reloaded(monkeypatch):
+    trader = FakeTrader(minutes=600)
+    resampler = KlineResampler(trader, max_base_candles=1000, refresh_seconds=0)
+    resampler.get_klines('BTCUSDT', '1h', 5)
+
+    # A month later: reload the 1m window instead of paging through ~44 000 minutes
+    trader.minutes = 600 + 30 * 1440
+    monkeypatch.setattr(time, 'time', lambda: (START_MS + trader.minutes * MINUTE_MS) / 1000)
+    hourly = resampler.get_klines('BTCUSDT', '1h', 5)
+
+    assert trader.paged == 0 and trader.calls == 2
+    assert hourly[-1][0] <= START_MS + trader.minutes * MINUTE_MS < hourly[-1][0] + 60 * MINUTE_MS
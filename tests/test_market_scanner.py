@@ -0,0 +1,51 @@
+import sys
+import os
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from market_scanner import scan
+
+
+def ticker(symbol, quote_volume, change_pct=0.0, bid=99.0, ask=101.0, count=100, last=100.0):
+    return {'symbol': symbol, 'lastPrice': str(last), 'bidPrice': str(bid), 'askPrice': str(ask),
+            'highPrice': str(last * 1.1), 'lowPrice': str(last * 0.9), 'priceChangePercent': str(change_pct),
+            'quoteVolume': str(quote_volume), 'count': count}
+
+
+TICKERS = [
+    ticker('BTCUSDT', 900, change_pct=1.0, bid=99.99, ask=100.01),
+    ticker('ETHUSDT', 700, change_pct=-6.0, bid=99.9, ask=100.1),
+    ticker('SOLUSDT', 800, change_pct=4.0, bid=99.8, ask=100.2),
+    ticker('XRPUSDT', 100, change_pct=9.0, bid=99.5, ask=100.5),
+    ticker('ADAUSDT', 500, change_pct=-2.0, bid=99.0, ask=101.0),
+    ticker('ETHBTC', 1000, change_pct=0.5),
+    ticker('OLDUSDT', 2000, count=0),  # No trades in 24h: delisted
+]
+
+
+def test_filters_by_quote_asset_volume_spread_and_change():
+    assert [r['symbol'] for r in scan(TICKERS, top_n=0)] == ['BTCUSDT', 'SOLUSDT', 'ETHUSDT', 'ADAUSDT', 'XRPUSDT']
+    assert [r['symbol'] for r in scan(TICKERS, quote_asset='BTC')] == ['ETHBTC']
+    assert [r['symbol'] for r in scan(TICKERS, min_quote_volume=600, top_n=0)] == ['BTCUSDT', 'SOLUSDT', 'ETHUSDT']
+    assert [r['symbol'] for r in scan(TICKERS, max_spread_bps=30)] == ['BTCUSDT', 'ETHUSDT']
+    assert [r['symbol'] for r in scan(TICKERS, min_abs_change_pct=5)] == ['ETHUSDT', 'XRPUSDT']
+
+
+def test_partial_sort_matches_a_full_sort():
+    for sort_by in ['quote_volume', 'change_pct', 'abs_change_pct', 'spread_bps']:
+        for ascending in (False, True):
+            full = [r['symbol'] for r in scan(TICKERS, sort_by=sort_by, top_n=0, ascending=ascending)]
+            for top_n in (1, 2, 3, 4):
+                top = scan(TICKERS, sort_by=sort_by, top_n=top_n, ascending=ascending)
+                assert [r['symbol'] for r in top] == full[:top_n], (sort_by, ascending, top_n)
+
+    assert [r['symbol'] for r in scan(TICKERS, sort_by='change_pct', top_n=2)] == ['XRPUSDT', 'SOLUSDT']
+    assert [r['symbol'] for r in scan(TICKERS, sort_by='change_pct', top_n=2, ascending=True)] == ['ETHUSDT', 'ADAUSDT']
+
+
+def test_unknown_sort_key_is_rejected():
+    try:
+        scan(TICKERS, sort_by='price')
+        assert False, 'expected ValueError'
+    except ValueError:
+        pass
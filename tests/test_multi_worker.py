@@ -0,0 +1,41 @@
+import sys
+import os
+import socket
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from multi_worker import CacheManager, _bind_socket
+from request_coalescer import RequestCoalescer
+
+
+def test_bind_socket_listens_on_the_requested_port():
+    sock = _bind_socket('127.0.0.1', 0)
+    try:
+        host, port = sock.getsockname()
+        with socket.create_connection((host, port), timeout=2):
+            conn, _ = sock.accept()
+            conn.close()
+    finally:
+        sock.close()
+
+
+def test_coalescers_share_results_through_the_manager_cache():
+    manager = CacheManager()
+    manager.start()
+    try:
+        shared = manager.LocalTTLCache(100)
+        # Two workers: the second reuses what the first fetched
+        first, second = RequestCoalescer(shared), RequestCoalescer(shared)
+        fetches = []
+
+        def fetch(symbol):
+            fetches.append(symbol)
+            return {'symbol': symbol, 'price': '100.0'}
+
+        assert first.call(('price', 'BTCUSDT'), fetch, 'BTCUSDT', ttl=5)['price'] == '100.0'
+        assert second.call(('price', 'BTCUSDT'), fetch, 'BTCUSDT', ttl=5)['price'] == '100.0'
+        assert fetches == ['BTCUSDT']
+        assert second.stats()['cache_hits'] == 1
+        assert shared.size() == 1
+    finally:
+        manager.shutdown()
@@ -0,0 +1,101 @@
+import sys
+import os
+import threading
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import order_tracker
+from order_tracker import OrderTracker
+
+
+def order(order_id):
+    return {'orderId': order_id, 'symbol': 'BTCUSDT', 'side': 'BUY', 'status': 'FILLED',
+            'executedQty': '0.001', 'cummulativeQuoteQty': '100.0'}
+
+
+def track_and_wait(tracker, order_id, reconcile_fn, **kwargs):
+    finished = threading.Event()
+    completed = []
+
+    def on_complete(state):
+        completed.append(state)
+        finished.set()
+
+    state = tracker.track(order(order_id), {'USDT': 900.0}, reconcile_fn, on_complete=on_complete, **kwargs)
+    assert finished.wait(2)
+    return state, completed[0]
+
+
+def test_reconciliation_runs_then_completes():
+    tracker = OrderTracker()
+    release = threading.Event()
+    seen = []
+
+    def reconcile(expectation, progress_callback):
+        seen.append(tracker.get(1)['reconciliation'])
+        progress_callback('waiting for USDT')
+        release.wait(2)
+        return {'USDT': True}
+
+    release.set()
+    _, final = track_and_wait(tracker, 1, reconcile, notify=seen.append)
+    assert seen == ['RUNNING', 'Order 1: waiting for USDT', 'Order 1: reconciliation finished']
+    assert final['reconciliation'] == 'DONE'
+    assert final['balances_matched'] == {'USDT': True}
+    assert final['events'] == ['waiting for USDT', 'reconciliation finished']
+
+
+def test_orders_are_pending_until_the_reconcile_thread_runs(monkeypatch):
+    started = []
+
+    class HeldThread:
+        def __init__(self, target, **kwargs):
+            self.target = target
+
+        def start(self):
+            started.append(self.target)
+
+    monkeypatch.setattr(order_tracker.threading, 'Thread', HeldThread)
+    tracker = OrderTracker()
+    tracker.track(order(1), {'USDT': 900.0}, lambda e, progress_callback: {'USDT': True})
+    assert tracker.get(1)['reconciliation'] == 'PENDING'
+
+    started[0]()
+    assert tracker.get(1)['reconciliation'] == 'DONE'
+
+
+def test_unmatched_balances_time_out_and_errors_fail():
+    tracker = OrderTracker()
+    _, timed_out = track_and_wait(tracker, 1, lambda e, progress_callback: {'USDT': False})
+    assert timed_out['reconciliation'] == 'TIMEOUT'
+
+    def broken(expectation, progress_callback):
+        raise RuntimeError('account endpoint down')
+
+    _, failed = track_and_wait(tracker, 2, broken)
+    assert failed['reconciliation'] == 'FAILED'
+    assert failed['events'] == ['reconciliation failed: account endpoint down']
+
+
+def test_orders_without_expectation_are_skipped():
+    tracker = OrderTracker()
+    calls = []
+    state = tracker.track(order(1), None, lambda *a, **k: calls.append(a))
+    assert state['reconciliation'] == 'SKIPPED'
+    assert calls == []
+
+
+def test_oldest_orders_and_events_are_evicted():
+    tracker = OrderTracker(max_orders=2, max_events=3)
+    for order_id in (1, 2, 3):
+        tracker.track(order(order_id), None, None)
+    assert tracker.get(1) is None
+    assert [s['orderId'] for s in tracker.recent()] == [3, 2]
+
+    def chatty(expectation, progress_callback):
+        for i in range(10):
+            progress_callback(f'poll {i}')
+        return {'USDT': True}
+
+    _, final = track_and_wait(tracker, 4, chatty)
+    assert final['events'] == ['poll 8', 'poll 9', 'reconciliation finished']
@@ -0,0 +1,78 @@
+import sys
+import os
+import time
+
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from portfolio_analytics import align_closes, analyze
+
+HOUR_MS = 3600 * 1000
+
+
+def klines(times, closes):
+    return [[int(t), "0", "0", "0", str(c), "0"] for t, c in zip(times, closes)]
+
+
+def test_align_closes_forward_fills_and_trims_to_common_start():
+    series = {
+        'BTCUSDT': klines([0, 1, 2, 3, 4], [10, 11, 12, 13, 14]),
+        'NEWUSDT': klines([2, 4], [5, 6]),  # listed later, missing candle 3
+    }
+    times, closes, symbols = align_closes(series)
+    assert symbols == ['BTCUSDT', 'NEWUSDT']
+    assert times.tolist() == [2, 3, 4]
+    assert closes.tolist() == [[12, 5], [13, 5], [14, 6]]
+
+
+def test_beta_correlation_and_drawdown_match_constructed_series():
+    rng = np.random.default_rng(7)
+    bench_returns = rng.normal(0, 0.01, 400)
+    bench = 100 * np.exp(np.cumsum(bench_returns))
+    levered = 50 * np.exp(np.cumsum(2 * bench_returns))
+    times = np.arange(401) * HOUR_MS
+    series = {
+        'BTCUSDT': klines(times, np.concatenate([[100], bench])),
+        'LEVUSDT': klines(times, np.concatenate([[50], levered])),
+    }
+    result = analyze(*align_closes(series), 'BTCUSDT', 50, HOUR_MS)
+
+    lev = result['symbols']['LEVUSDT']
+    assert lev['beta'] == 2.0
+    assert lev['correlation'] == 1.0
+    assert lev['rolling_beta']['min'] == lev['rolling_beta']['max'] == 2.0
+    assert result['correlation_matrix']['BTCUSDT']['LEVUSDT'] == 1.0
+    assert abs(lev['volatility_ann_pct'] - 2 * result['symbols']['BTCUSDT']['volatility_ann_pct']) < 0.05
+
+    closes = np.concatenate([[100], bench])
+    expected_drawdown = (closes / np.maximum.accumulate(closes) - 1).min() * 100
+    assert result['symbols']['BTCUSDT']['max_drawdown_pct'] == round(expected_drawdown, 2)
+
+
+def test_rolling_beta_matches_direct_window():
+    rng = np.random.default_rng(1)
+    closes = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, (300, 3)), axis=0))
+    times = np.arange(300) * HOUR_MS
+    series = {s: klines(times, closes[:, j]) for j, s in enumerate(['BTCUSDT', 'AUSDT', 'BUSDT'])}
+    result = analyze(*align_closes(series), 'BTCUSDT', 30, HOUR_MS)
+
+    returns = np.diff(np.log(closes), axis=0)[-30:]
+    expected = np.cov(returns[:, 1], returns[:, 0])[0, 1] / returns[:, 0].var(ddof=1)
+    assert abs(result['symbols']['AUSDT']['rolling_beta']['latest'] - expected) < 1e-4
+
+
+def test_hundred_symbols_by_ten_thousand_candles_is_interactive():
+    rng = np.random.default_rng(3)
+    closes = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, (10_000, 100)), axis=0))
+    symbols = ['BTCUSDT'] + [f'S{j}USDT' for j in range(1, 100)]
+    times = np.arange(10_000) * HOUR_MS
+
+    # Numeric rather than string fields keep building the fixture cheap
+    series = {s: [[t, 0, 0, 0, c, 0] for t, c in zip(times.tolist(), closes[:, j].tolist())]
+              for j, s in enumerate(symbols)}
+
+    start = time.perf_counter()
+    result = analyze(*align_closes(series), 'BTCUSDT', 200, HOUR_MS)
+    assert time.perf_counter() - start < 2.0
+    assert len(result['symbols']) == 100
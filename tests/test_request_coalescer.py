@@ -0,0 +1,98 @@
+import asyncio
+import sys
+import os
+import threading
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from request_coalescer import RequestCoalescer
+
+
+def test_concurrent_calls_share_one_upstream_request():
+    coalescer = RequestCoalescer()
+    calls = []
+    release = threading.Event()
+
+    def slow_fetch(symbol):
+        calls.append(symbol)
+        release.wait(2)
+        return {'symbol': symbol, 'price': '100.0'}
+
+    results = []
+    threads = [
+        threading.Thread(target=lambda: results.append(coalescer.call(('price', 'BTCUSDT'), slow_fetch, 'BTCUSDT')))
+        for _ in range(5)
+    ]
+    for t in threads:
+        t.start()
+    # Give the followers time to attach to the in-flight call
+    time.sleep(0.2)
+    release.set()
+    for t in threads:
+        t.join()
+
+    assert calls == ['BTCUSDT']
+    assert len(results) == 5
+    stats = coalescer.stats()
+    assert stats['upstream'] == 1
+    assert stats['shared'] == 4
+    assert stats['dedup_ratio'] == 5.0
+
+
+def test_ttl_reuses_result_but_not_failures():
+    coalescer = RequestCoalescer()
+    values = iter([None, 'first', 'second'])
+    fetch = lambda: next(values)
+
+    assert coalescer.call('k', fetch, ttl=5) is None
+    assert coalescer.call('k', fetch, ttl=5) == 'first'
+    assert coalescer.call('k', fetch, ttl=5) == 'first'
+    assert coalescer.stats()['cache_hits'] == 1
+
+
+def test_errors_propagate_to_all_waiters():
+    coalescer = RequestCoalescer()
+    release = threading.Event()
+
+    def broken():
+        release.wait(2)
+        raise RuntimeError('upstream down')
+
+    errors = []
+
+    def call():
+        try:
+            coalescer.call('k', broken)
+        except RuntimeError as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=call) for _ in range(3)]
+    for t in threads:
+        t.start()
+    time.sleep(0.2)
+    release.set()
+    for t in threads:
+        t.join()
+
+    assert [str(e) for e in errors] == ['upstream down'] * 3
+    stats = coalescer.stats()
+    assert stats['errors'] == 1
+    assert stats['shared'] == 2
+
+
+def test_async_tools_share_a_flight_through_worker_threads():
+    # Tools await asyncio.to_thread(coalescer.call, ...), so calls from the event loop overlap
+    coalescer = RequestCoalescer()
+    calls = []
+
+    def slow_fetch():
+        calls.append(1)
+        time.sleep(0.2)
+        return 'price'
+
+    async def burst():
+        return await asyncio.gather(*[asyncio.to_thread(coalescer.call, 'k', slow_fetch) for _ in range(4)])
+
+    assert asyncio.run(burst()) == ['price'] * 4
+    assert len(calls) == 1
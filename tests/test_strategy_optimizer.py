@@ -0,0 +1,110 @@
+import subprocess
+import sys
+import os
+
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import config
+import strategy_optimizer
+from strategy_optimizer import backtest_segments, summarize, walk_forward_bounds
+
+
+def make_prices(close):
+    close = np.asarray(close, dtype=np.float64)
+    return np.column_stack([close * 1.001, close * 0.999, close])
+
+
+def test_walk_forward_bounds_cover_the_series_in_order():
+    bounds = walk_forward_bounds(100, 4)
+    assert len(bounds) == 5
+    assert bounds[0][0] == 0 and bounds[-1][1] == 100
+    assert all(end == next_start for (_, end), (next_start, _) in zip(bounds, bounds[1:]))
+    assert {end - start for start, end in bounds} == {20}
+
+
+def test_backtest_segments_takes_profit_once_the_trend_turns():
+    # Flat, then a steady rise: the fast EMA crosses the slow one once
+    prices = make_prices([100.0] * 20 + [100.0 + i for i in range(1, 21)])
+    params = {'fast_span': 2, 'slow_span': 5, 'stop_loss_pct': 1.0, 'take_profit_pct': 5.0}
+    flat, trend = backtest_segments(prices, 'ema_cross', params, [(0, 20), (0, 40)])
+
+    assert flat == {'return_pct': 0.0, 'trades': 0, 'win_rate': 0.0, 'max_drawdown_pct': 0.0}
+    fee = config.TRADING_FEE_PERCENTAGE / 100
+    assert trend['trades'] == 1 and trend['win_rate'] == 1.0
+    assert abs(trend['return_pct'] - (1.05 * (1 - fee) ** 2 - 1) * 100) < 1e-9
+
+
+def test_backtest_segments_stops_out_on_a_drop():
+    prices = make_prices([100.0] * 20 + [101.0, 102.0, 90.0, 90.0])
+    params = {'fast_span': 2, 'slow_span': 5, 'stop_loss_pct': 1.0, 'take_profit_pct': 50.0}
+    result, = backtest_segments(prices, 'ema_cross', params, [(0, 24)])
+    fee = config.TRADING_FEE_PERCENTAGE / 100
+    assert result['trades'] == 1 and result['win_rate'] == 0.0
+    assert abs(result['return_pct'] - (0.99 * (1 - fee) ** 2 - 1) * 100) < 1e-9
+
+
+def test_summarize_ranks_in_sample_and_scores_the_holdout():
+    def segments(*returns):
+        return [{'return_pct': r, 'trades': 1, 'win_rate': 1.0, 'max_drawdown_pct': 0.0} for r in returns]
+
+    param_sets = [{'name': 'overfit'}, {'name': 'steady'}]
+    # 'overfit' wins in sample but loses on the last, held-out segment
+    results = [segments(10, 10, -5), segments(2, 2, 3)]
+    summary = summarize(param_sets, results, folds=2, top_n=2)
+
+    top = summary['top']
+    assert [r['params']['name'] for r in top] == ['overfit', 'steady']
+    assert top[0]['in_sample_return_pct'] == 10 and top[0]['out_of_sample_return_pct'] == -5
+    assert [w['out_of_sample_return_pct'] for w in summary['walk_forward']] == [10, -5]
+    assert summary['walk_forward_oos_return_pct'] == 2.5
+
+
+def test_optimize_runs_on_a_process_pool():
+    rng = np.random.default_rng(5)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, 300)))
+    klines = [[i, c, c * 1.005, c * 0.995, c] for i, c in enumerate(close)]
+    grid = {'fast_span': [5, 9], 'slow_span': [26], 'stop_loss_pct': [1.0], 'take_profit_pct': [2.0]}
+    result = strategy_optimizer.optimize(klines, 'ema_cross', grid, folds=2, workers=2)
+
+    assert result['parameter_sets'] == 2
+    assert len(result['walk_forward']) == 2
+    # The pool workers read the same prices through shared memory
+    prices = np.column_stack([close * 1.005, close * 0.995, close])
+    params = dict(fast_span=5, slow_span=26, stop_loss_pct=1.0, take_profit_pct=2.0)
+    expected = backtest_segments(prices, 'ema_cross', params, walk_forward_bounds(300, 2))
+    ranked = next(r for r in result['top'] if r['params']['fast_span'] == 5)
+    assert ranked['out_of_sample_return_pct'] == round(expected[-1]['return_pct'], 3)
+
+
+def test_optimize_rejects_unknown_parameters():
+    klines = [[i, 100.0, 101.0, 99.0, 100.0] for i in range(50)]
+    try:
+        strategy_optimizer.optimize(klines, 'ema_cross', {'rsi_low': [20]})
+    except ValueError as e:
+        assert 'rsi_low' in str(e)
+    else:
+        assert False, "unknown parameter accepted"
+
+
+def test_optimize_reuses_one_pool_that_does_not_import_main(tmp_path):
+    # Run as a script whose import-time code leaves a marker, like mcp_server's setup
+    marker = tmp_path / 'imports.txt'
+    script = tmp_path / 'server.py'
+    script.write_text(
+        "import os, sys\n"
+        f"sys.path.insert(0, {os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))!r})\n"
+        f"open({str(marker)!r}, 'a').write(str(os.getpid()) + '\\n')\n"
+        "import strategy_optimizer\n"
+        "if __name__ == '__main__':\n"
+        "    klines = [[i, 100.0 + i % 7, 101.0 + i % 7, 99.0 + i % 7, 100.0 + i % 7] for i in range(200)]\n"
+        "    grid = {'fast_span': [5, 9], 'slow_span': [26], 'stop_loss_pct': [1.0], 'take_profit_pct': [2.0]}\n"
+        "    strategy_optimizer.optimize(klines, 'ema_cross', grid, folds=2, workers=2)\n"
+        "    pool = strategy_optimizer._pool\n"
+        "    strategy_optimizer.optimize(klines, 'ema_cross', grid, folds=2, workers=2)\n"
+        "    assert strategy_optimizer._pool is pool\n"
+    )
+    subprocess.run([sys.executable, str(script)], check=True, timeout=120)
+
+    assert len(marker.read_text().split()) == 1
@@ -0,0 +1,66 @@
+import sys
+import os
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from trade_journal import TradeJournal
+
+
+def make_order(order_id, side, qty, price, commission, commission_asset, transact_time=None):
+    import time
+    return {
+        'symbol': 'BTCUSDT',
+        'orderId': order_id,
+        'side': side,
+        'status': 'FILLED',
+        'transactTime': transact_time or int(time.time() * 1000),
+        'executedQty': str(qty),
+        'cummulativeQuoteQty': str(qty * price),
+        'fills': [{'price': str(price), 'qty': str(qty), 'commission': str(commission),
+                   'commissionAsset': commission_asset, 'tradeId': order_id * 10}],
+    }
+
+
+def test_realized_pnl_uses_average_cost_and_fees(tmp_path):
+    journal = TradeJournal(str(tmp_path / 'journal.db'))
+    journal.record_order(make_order(1, 'BUY', 0.01, 50000, 0.5, 'USDT'), {'price': 49990})
+    journal.record_order(make_order(2, 'BUY', 0.01, 52000, 0.52, 'USDT'), {'price': 52000})
+    journal.record_order(make_order(3, 'SELL', 0.01, 55000, 0.55, 'USDT'), {'price': 55010})
+
+    [row] = journal.realized_pnl()
+    # Average cost of 0.01 BTC is (500 + 0.5 + 520 + 0.52) / 2 = 510.51; proceeds 550 - 0.55
+    assert row['symbol'] == 'BTCUSDT'
+    assert abs(row['realized_pnl'] - (549.45 - 510.51)) < 1e-6
+    assert row['orders'] == 3
+    assert row['sells'] == 1
+
+
+def test_duplicate_orders_are_not_booked_twice(tmp_path):
+    journal = TradeJournal(str(tmp_path / 'journal.db'))
+    order = make_order(1, 'BUY', 0.01, 50000, 0.00001, 'BTC')
+    journal.record_order(order)
+    journal.record_order(order)
+
+    [fees] = journal.fee_totals()
+    assert fees['orders'] == 1
+    assert fees['commission_asset'] == 'BTC'
+    assert abs(fees['fees_quote'] - 0.5) < 1e-9
+
+
+def test_slippage_is_positive_when_adverse(tmp_path):
+    journal = TradeJournal(str(tmp_path / 'journal.db'))
+    journal.record_order(make_order(1, 'BUY', 0.01, 50050, 0.5, 'USDT'), {'price': 50000})
+    journal.record_order(make_order(2, 'SELL', 0.01, 49950, 0.5, 'USDT'), {'price': 50000})
+
+    stats = {row['side']: row for row in journal.slippage_stats()}
+    assert abs(stats['BUY']['avg_slippage_bps'] - 10.0) < 1e-6
+    assert abs(stats['SELL']['avg_slippage_bps'] - 10.0) < 1e-6
+
+
+def test_database_is_created_on_first_use(tmp_path):
+    path = tmp_path / 'journal.db'
+    journal = TradeJournal(str(path))
+    assert not path.exists()
+    assert journal.realized_pnl() == []
+    assert path.exists()
+    journal.close()
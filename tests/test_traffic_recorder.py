@@ -0,0 +1,70 @@
+import sys
+import os
+import gzip
+import json
+
+import requests
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import replay_bench
+from traffic_recorder import TrafficReplayer, request_key
+
+PRICE_URL = 'https://api.binance.com/api/v3/ticker/price?symbol=BTCUSDT'
+
+
+def test_request_key_ignores_signatures_timestamps_and_rpc_ids():
+    signed = request_key('GET', 'https://api.binance.com/api/v3/account?timestamp=1&recvWindow=5000&signature=ab', None)
+    resigned = request_key('GET', 'https://api.binance.com/api/v3/account?signature=cd&timestamp=2', None)
+    assert signed == resigned
+
+    # Query parameter order does not matter; values do
+    assert request_key('GET', 'https://h/p?b=2&a=1', None) == request_key('GET', 'https://h/p?a=1&b=2', None)
+    assert request_key('GET', 'https://h/p?a=1', None) != request_key('GET', 'https://h/p?a=2', None)
+
+    form = request_key('POST', 'https://h/order', 'symbol=BTCUSDT&timestamp=1&signature=x')
+    assert form == request_key('POST', 'https://h/order', b'timestamp=9&symbol=BTCUSDT&signature=y')
+
+    rpc = request_key('POST', 'https://rpc/', '{"jsonrpc": "2.0", "method": "eth_blockNumber", "id": 1}')
+    assert rpc == request_key('POST', 'https://rpc/', '{"id": 7, "method": "eth_blockNumber", "jsonrpc": "2.0"}')
+    batch = request_key('POST', 'https://rpc/', '[{"method": "a", "id": 1}, {"method": "b", "id": 2}]')
+    assert batch == request_key('POST', 'https://rpc/', '[{"method": "a", "id": 3}, {"method": "b", "id": 4}]')
+
+
+def write_cassette(path, bodies):
+    with gzip.open(path, 'wt', encoding='utf-8') as f:
+        for body in bodies:
+            f.write(json.dumps({'key': request_key('GET', PRICE_URL, None), 'method': 'GET', 'url': PRICE_URL,
+                                'status': 200, 'reason': 'OK', 'headers': {'Content-Encoding': 'gzip'},
+                                'body': body, 'elapsed': 0.5}) + '\n')
+
+
+def test_replay_serves_recorded_responses_in_order_then_repeats_the_last(tmp_path):
+    path = str(tmp_path / 'cassette.jsonl.gz')
+    write_cassette(path, ['{"price": "1"}', '{"price": "2"}'])
+    replayer = TrafficReplayer(path, latency='zero')
+    request = requests.Request('GET', PRICE_URL).prepare()
+
+    prices = [replayer.send(None, request).json()['price'] for _ in range(3)]
+    assert prices == ['1', '2', '2']
+    assert replayer.misses == 0
+
+
+def test_replay_miss_raises_instead_of_reaching_the_network(tmp_path):
+    path = str(tmp_path / 'cassette.jsonl.gz')
+    write_cassette(path, ['{"price": "1"}'])
+    replayer = TrafficReplayer(path, latency='zero')
+    request = requests.Request('GET', PRICE_URL.replace('BTCUSDT', 'ETHUSDT')).prepare()
+
+    try:
+        replayer.send(None, request)
+        assert False, 'expected ConnectionError'
+    except requests.ConnectionError:
+        pass
+    assert replayer.misses == 1
+
+
+def test_bench_skips_state_changing_tools_by_default():
+    for tool in ['adjust_leverage', 'set_margin_type', 'place_futures_order', 'place_order',
+                 'register_trigger', 'ingest_agg_trades', 'run_profiler']:
+        assert tool in replay_bench.STATE_CHANGING_TOOLS
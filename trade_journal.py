@@ -0,0 +1,204 @@
+import sqlite3
+import threading
+import time
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS orders (
+    symbol TEXT NOT NULL,
+    order_id INTEGER NOT NULL,
+    side TEXT NOT NULL,
+    time_ms INTEGER NOT NULL,
+    status TEXT,
+    executed_qty REAL,
+    quote_qty REAL,
+    avg_price REAL,
+    expected_price REAL,
+    slippage_bps REAL,
+    commission REAL,
+    commission_asset TEXT,
+    fee_quote REAL,
+    realized_pnl REAL,
+    position_qty REAL,
+    position_cost REAL,
+    initial_base REAL,
+    initial_quote REAL,
+    expected_base REAL,
+    expected_quote REAL,
+    actual_base REAL,
+    actual_quote REAL,
+    PRIMARY KEY (symbol, order_id)
+);
+CREATE INDEX IF NOT EXISTS orders_time ON orders (time_ms);
+CREATE INDEX IF NOT EXISTS orders_symbol_time ON orders (symbol, time_ms);
+
+CREATE TABLE IF NOT EXISTS fills (
+    symbol TEXT NOT NULL,
+    order_id INTEGER NOT NULL,
+    trade_id INTEGER,
+    price REAL,
+    qty REAL,
+    commission REAL,
+    commission_asset TEXT
+);
+CREATE INDEX IF NOT EXISTS fills_order ON fills (symbol, order_id);
+
+CREATE TABLE IF NOT EXISTS positions (
+    symbol TEXT PRIMARY KEY,
+    qty REAL NOT NULL,
+    cost REAL NOT NULL
+);
+"""
+
+GROUPINGS = {
+    'symbol': 'symbol',
+    'day': "strftime('%Y-%m-%d', time_ms / 1000, 'unixepoch')",
+    'month': "strftime('%Y-%m', time_ms / 1000, 'unixepoch')",
+}
+
+
+class TradeJournal:
+    """Append-only SQLite (WAL) journal of orders placed through place_order.
+
+    Realized PnL is booked on insert against a running average-cost position
+    per symbol, so PnL, fee and slippage reports are plain indexed aggregates.
+    The database is opened (and created) on first use.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = None
+
+    @property
+    def _conn(self):
+        """The SQLite connection, opened on first use; called with the lock held"""
+        if self._db is None:
+            conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(SCHEMA)
+            self._db = conn
+        return self._db
+
+    def record_order(self, order, expectation=None):
+        """Journal an order response from Binance along with the expectation from submit_order"""
+        symbol = order['symbol']
+        side = order['side']
+        executed_qty = float(order.get('executedQty', 0))
+        quote_qty = float(order.get('cummulativeQuoteQty', 0))
+        avg_price = quote_qty / executed_qty if executed_qty else None
+        fills = order.get('fills', [])
+        expectation = expectation or {}
+
+        # Commissions, in the commission asset and converted to the quote asset where possible
+        commission = sum(float(f['commission']) for f in fills)
+        commission_asset = fills[0]['commissionAsset'] if fills else None
+        base_fee = quote_fee = 0.0
+        fee_quote = None
+        if commission_asset and symbol.endswith(commission_asset):
+            quote_fee = commission
+            fee_quote = commission
+        elif commission_asset and symbol.startswith(commission_asset):
+            base_fee = commission
+            fee_quote = sum(float(f['commission']) * float(f['price']) for f in fills)
+
+        # Positive slippage is adverse: paid more on a BUY, received less on a SELL
+        expected_price = expectation.get('price')
+        slippage_bps = None
+        if expected_price and avg_price:
+            direction = 1 if side == 'BUY' else -1
+            slippage_bps = direction * (avg_price - expected_price) / expected_price * 10000
+
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                if self._conn.execute("SELECT 1 FROM orders WHERE symbol = ? AND order_id = ?",
+                                      (symbol, order['orderId'])).fetchone():
+                    # Already journaled; booking it again would double-count the position
+                    self._conn.execute("COMMIT")
+                    return
+                row = self._conn.execute("SELECT qty, cost FROM positions WHERE symbol = ?", (symbol,)).fetchone()
+                qty, cost = row if row else (0.0, 0.0)
+                realized_pnl = None
+                if order.get('status') == 'FILLED' or executed_qty:
+                    if side == 'BUY':
+                        qty += executed_qty - base_fee
+                        cost += quote_qty + quote_fee
+                    else:
+                        # Only the part covered by journaled buys has a known cost basis
+                        covered = min(executed_qty + base_fee, qty)
+                        average_cost = cost / qty if qty else 0.0
+                        if executed_qty:
+                            proceeds = (quote_qty - quote_fee) * min(1.0, covered / executed_qty)
+                            realized_pnl = proceeds - average_cost * covered
+                        qty -= covered
+                        cost -= average_cost * covered
+                    self._conn.execute("INSERT OR REPLACE INTO positions (symbol, qty, cost) VALUES (?, ?, ?)",
+                                       (symbol, qty, cost))
+
+                self._conn.execute(
+                    "INSERT INTO orders (symbol, order_id, side, time_ms, status, executed_qty, quote_qty, "
+                    "avg_price, expected_price, slippage_bps, commission, commission_asset, fee_quote, realized_pnl, "
+                    "position_qty, position_cost, initial_base, initial_quote, expected_base, expected_quote) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (symbol, order['orderId'], side, order.get('transactTime', int(time.time() * 1000)),
+                     order.get('status'), executed_qty, quote_qty, avg_price, expected_price, slippage_bps,
+                     commission, commission_asset, fee_quote, realized_pnl, qty, cost,
+                     expectation.get('initial_btc'), expectation.get('initial_usdt'),
+                     expectation.get('expected_btc'), expectation.get('expected_usdt')))
+                self._conn.executemany(
+                    "INSERT INTO fills (symbol, order_id, trade_id, price, qty, commission, commission_asset) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    [(symbol, order['orderId'], f.get('tradeId'), float(f['price']), float(f['qty']),
+                      float(f['commission']), f['commissionAsset']) for f in fills])
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def record_balances(self, symbol, order_id, actual_base, actual_quote):
+        """Store the balances observed after reconciliation"""
+        with self._lock:
+            self._conn.execute("UPDATE orders SET actual_base = ?, actual_quote = ? WHERE symbol = ? AND order_id = ?",
+                               (actual_base, actual_quote, symbol, order_id))
+
+    def _query(self, select, symbol, days, group):
+        sql = f"SELECT {select} FROM orders WHERE time_ms >= ?"
+        params = [int((time.time() - days * 86400) * 1000) if days > 0 else 0]
+        if symbol:
+            sql += " AND symbol = ?"
+            params.append(symbol)
+        sql += f" GROUP BY {group} ORDER BY {group}"
+        with self._lock:
+            cursor = self._conn.execute(sql, params)
+            columns = [c[0] for c in cursor.description]
+            return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+    def realized_pnl(self, symbol=None, days=30, group_by='symbol'):
+        """Realized PnL in the quote asset, grouped by 'symbol', 'day' or 'month'"""
+        if group_by not in GROUPINGS:
+            raise ValueError(f"group_by must be one of {', '.join(GROUPINGS)}")
+        group = GROUPINGS[group_by]
+        return self._query(f"{group} AS {group_by}, ROUND(SUM(COALESCE(realized_pnl, 0)), 8) AS realized_pnl, "
+                           "COUNT(*) AS orders, SUM(side = 'SELL') AS sells, "
+                           "ROUND(SUM(COALESCE(fee_quote, 0)), 8) AS fees_quote",
+                           symbol, days, group)
+
+    def fee_totals(self, symbol=None, days=30):
+        """Commission totals per symbol and commission asset"""
+        return self._query("symbol, commission_asset, ROUND(SUM(commission), 12) AS commission, "
+                           "ROUND(SUM(COALESCE(fee_quote, 0)), 8) AS fees_quote, COUNT(*) AS orders",
+                           symbol, days, "symbol, commission_asset")
+
+    def slippage_stats(self, symbol=None, days=30):
+        """Average and worst slippage versus the pre-trade price, in basis points"""
+        return self._query("symbol, side, ROUND(AVG(slippage_bps), 3) AS avg_slippage_bps, "
+                           "ROUND(MAX(slippage_bps), 3) AS worst_slippage_bps, COUNT(slippage_bps) AS orders",
+                           symbol, days, "symbol, side")
+
+    def close(self):
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+            self._db = None
+
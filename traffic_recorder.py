@@ -0,0 +1,176 @@
+import gzip
+import json
+import logging
+import threading
+import time
+from collections import defaultdict
+from urllib.parse import urlsplit, parse_qsl
+
+import requests
+from requests.structures import CaseInsensitiveDict
+
+# Query/body fields that change on every call and must not affect replay matching
+VOLATILE_PARAMS = {'timestamp', 'signature', 'recvWindow'}
+
+_original_send = requests.Session.send
+_active = None
+
+
+def _body_text(body):
+    if body is None:
+        return ''
+    if isinstance(body, bytes):
+        return body.decode('utf-8', errors='replace')
+    return str(body)
+
+
+def request_key(method, url, body):
+    """Build the match key for an upstream request, ignoring signatures, timestamps and JSON-RPC ids"""
+    parts = urlsplit(url)
+    query = sorted((k, v) for k, v in parse_qsl(parts.query) if k not in VOLATILE_PARAMS)
+    text = _body_text(body)
+    if text.startswith('{') or text.startswith('['):
+        try:
+            payload = json.loads(text)
+            if isinstance(payload, dict):
+                payload.pop('id', None)
+            elif isinstance(payload, list):
+                for item in payload:
+                    if isinstance(item, dict):
+                        item.pop('id', None)
+            text = json.dumps(payload, sort_keys=True)
+        except ValueError:
+            pass
+    else:
+        text = '&'.join(f"{k}={v}" for k, v in sorted(parse_qsl(text)) if k not in VOLATILE_PARAMS)
+    return f"{method} {parts.netloc}{parts.path}?{'&'.join(f'{k}={v}' for k, v in query)} {text}"
+
+
+class TrafficRecorder:
+    """Captures every HTTP exchange made through requests into a gzipped JSON-lines cassette.
+
+    BinanceTrader (python-binance) and BaseClient (web3 HTTPProvider) both talk
+    to their upstreams through requests.Session, so patching Session.send covers
+    all of their traffic, including requests made while the clients are built.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._file = gzip.open(path, 'at', encoding='utf-8')
+        self.count = 0
+
+    def send(self, session, request, **kwargs):
+        start = time.perf_counter()
+        response = _original_send(session, request, **kwargs)
+        elapsed = time.perf_counter() - start
+        entry = {
+            'key': request_key(request.method, request.url, request.body),
+            'method': request.method,
+            'url': request.url,
+            'status': response.status_code,
+            'reason': response.reason,
+            'headers': dict(response.headers),
+            'body': response.content.decode('utf-8', errors='replace'),
+            'elapsed': round(elapsed, 6),
+        }
+        with self._lock:
+            self._file.write(json.dumps(entry, separators=(',', ':')) + '\n')
+            self._file.flush()
+            self.count += 1
+        return response
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+
+class TrafficReplayer:
+    """Serves upstream responses back from a cassette instead of the network.
+
+    Requests are matched by request_key(); repeated identical requests are
+    answered in recorded order and the last response is reused once the
+    recorded ones run out. Unmatched requests raise ConnectionError so a replay
+    run can never reach the live exchange.
+    """
+
+    def __init__(self, path, latency='original'):
+        self.path = path
+        self.latency = latency
+        self._lock = threading.Lock()
+        self._entries = defaultdict(list)
+        self._cursor = defaultdict(int)
+        self.misses = 0
+        with gzip.open(path, 'rt', encoding='utf-8') as f:
+            for line in f:
+                if line.strip():
+                    entry = json.loads(line)
+                    self._entries[entry['key']].append(entry)
+
+    def send(self, session, request, **kwargs):
+        key = request_key(request.method, request.url, request.body)
+        with self._lock:
+            entries = self._entries.get(key)
+            if not entries:
+                self.misses += 1
+                logging.error(f"Replay miss: {request.method} {request.url}")
+                raise requests.ConnectionError(f"No recorded response for {request.method} {request.url}")
+            index = min(self._cursor[key], len(entries) - 1)
+            self._cursor[key] += 1
+            entry = entries[index]
+
+        if self.latency == 'original':
+            time.sleep(entry['elapsed'])
+
+        response = requests.Response()
+        response.status_code = entry['status']
+        response.reason = entry['reason']
+        response.headers = CaseInsensitiveDict(entry['headers'])
+        # The recorded body is already decoded; drop transfer encodings that would re-apply
+        response.headers.pop('Content-Encoding', None)
+        response._content = entry['body'].encode('utf-8')
+        response.encoding = 'utf-8'
+        response.url = request.url
+        response.request = request
+        return response
+
+
+def install(mode, path, latency='original'):
+    """Route all requests.Session traffic through a recorder ('record') or replayer ('replay').
+    Must run before BinanceTrader/BaseClient are created so their startup calls are covered.
+    """
+    global _active
+    if mode == 'record':
+        _active = TrafficRecorder(path)
+    elif mode == 'replay':
+        _active = TrafficReplayer(path, latency=latency)
+    else:
+        raise ValueError(f"Unknown traffic mode: {mode}")
+
+    def send(session, request, **kwargs):
+        return _active.send(session, request, **kwargs)
+
+    requests.Session.send = send
+    logging.info(f"Upstream traffic {mode} enabled using cassette {path}")
+    return _active
+
+
+def active():
+    """Return the installed recorder/replayer, or None when traffic goes to the network"""
+    return _active
+
+
+def replaying():
+    """Whether upstream traffic is served from a cassette. Websocket streams bypass
+    requests.Session and can't be replayed, so callers must not open them then.
+    """
+    return isinstance(_active, TrafficReplayer)
+
+
+def uninstall():
+    """Restore direct network access"""
+    global _active
+    requests.Session.send = _original_send
+    if isinstance(_active, TrafficRecorder):
+        _active.close()
+    _active = None